@@ -0,0 +1,69 @@
+from collections import namedtuple
+
+from passwords import hash_password, verify_missing, verify_password
+from principal import ORGANIZATION, USER
+
+# Password login for users and organizations. Each attempt is one lookup on
+# the unique email index that fetches only the columns login needs; the
+# password, approval and active checks happen here rather than in SQL, so a
+# failed attempt never costs a second query.
+AuthResult = namedtuple("AuthResult", "status account")
+
+OK = "ok"
+INVALID = "invalid"
+PENDING = "pending"
+DEACTIVATED = "deactivated"
+
+TABLES = {USER: "users", ORGANIZATION: "organizations"}
+LOOKUPS = {
+    USER: "SELECT id, name, password, must_change_password FROM users WHERE email = %s",
+    ORGANIZATION: """
+        SELECT id, org_name AS name, password, must_change_password, is_approved, is_active
+        FROM organizations WHERE email = %s
+    """,
+}
+
+
+# Store a fresh hash for a password that was still plaintext or hashed at
+# an outdated cost. Only replaces the exact value that was just verified.
+def upgrade_password(conn, kind, account_id, stored, password):
+    cursor = conn.cursor()
+    cursor.execute(f"UPDATE {TABLES[kind]} SET password = %s WHERE id = %s AND password = %s",
+                   (hash_password(password), account_id, stored))
+    conn.commit()
+
+
+# Replace an account's password with one it chose itself, clearing
+# must_change_password
+def change_password(conn, kind, account_id, password):
+    cursor = conn.cursor()
+    cursor.execute(f"UPDATE {TABLES[kind]} SET password = %s, must_change_password = FALSE WHERE id = %s",
+                   (hash_password(password), account_id))
+    conn.commit()
+
+
+# Check credentials; the account row is only returned with status OK.
+# Unknown emails and wrong passwords are indistinguishable to the caller.
+# An OK account with must_change_password set has to choose a new password
+# (change_password) before it is logged in.
+def authenticate(conn, kind, email, password):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(LOOKUPS[kind], (email.strip(),))
+    account = cursor.fetchone()
+
+    if account is None:
+        verify_missing(password)
+        return AuthResult(INVALID, None)
+
+    matches, needs_rehash = verify_password(password, account["password"])
+    if not matches:
+        return AuthResult(INVALID, None)
+    if needs_rehash:
+        upgrade_password(conn, kind, account["id"], account["password"], password)
+
+    if kind == ORGANIZATION:
+        if not account["is_approved"]:
+            return AuthResult(PENDING, None)
+        if not account["is_active"]:
+            return AuthResult(DEACTIVATED, None)
+    return AuthResult(OK, account)
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connection  # noqa: E402
+from export_memory import organization_id, peak_rss, seed  # noqa: E402
+from loaders import read_frame  # noqa: E402
+
+# Dashboard-style loads into a DataFrame: row dicts from fetchall() versus
+# loaders.read_frame, which parses raw column chunks from an unbuffered
+# cursor.
+#
+#     GIVEBACK_DB_NAME=giveback_bench python benchmarks/dataframe_loader.py --sizes 10000 100000 1000000
+#
+# Both loaders run the organization records query without its LIMIT, each
+# in a fresh child process so RSS peaks are measured independently. Never
+# point this at production.
+
+QUERY = """
+    SELECT d.date, COALESCE(d.amount, 0) AS amount, d.donation_type, d.item_description,
+           u.name as donor_name, u.email as donor_email
+    FROM donations d
+    LEFT JOIN users u ON d.user_id = u.id
+    WHERE d.organization_id = %s
+    ORDER BY d.date DESC
+"""
+
+
+def fetchall_frame(org_id):
+    import pandas as pd
+
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(QUERY, (org_id,))
+        return pd.DataFrame(cursor.fetchall())
+
+
+def columnar_frame(org_id):
+    with connection() as conn:
+        return read_frame(conn, QUERY, (org_id,))
+
+
+LOADERS = {"fetchall": fetchall_frame, "columns": columnar_frame}
+
+
+def child(mode, org_id):
+    frame, peak, elapsed = peak_rss(lambda: LOADERS[mode](org_id))
+    print(json.dumps({
+        "rows": len(frame),
+        "peak": peak,
+        "elapsed": elapsed,
+        "frame": int(frame.memory_usage(deep=True).sum()),
+        "dtypes": {name: str(dtype) for name, dtype in frame.dtypes.items()},
+    }))
+
+
+def run_child(mode, org_id):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--org", str(org_id)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DataFrame loading from MySQL")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="ledger sizes to measure (benchmark donations are added as needed)")
+    parser.add_argument("--dtypes", action="store_true", help="print the column dtypes of each loader")
+    parser.add_argument("--child", choices=sorted(LOADERS), help=argparse.SUPPRESS)
+    parser.add_argument("--org", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.org)
+        sys.exit(0)
+
+    org_id = organization_id()
+    for size in sorted(args.sizes):
+        seed(org_id, size)
+        for mode in ("fetchall", "columns"):
+            result = run_child(mode, org_id)
+            print(f"{mode:9} {result['rows']:>10,} rows  {result['elapsed']:6.2f}s  "
+                  f"peak RSS +{result['peak'] / 2 ** 20:,.1f} MiB  "
+                  f"frame {result['frame'] / 2 ** 20:,.1f} MiB")
+            if args.dtypes:
+                print("          " + ", ".join(f"{k}: {v}" for k, v in result["dtypes"].items()))
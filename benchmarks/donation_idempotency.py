@@ -0,0 +1,171 @@
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import POOL_SIZE, connection  # noqa: E402
+from donations import (DonationResult, NotEnoughRemaining, fulfill_item_request, idempotency_key,  # noqa: E402
+                       mark_answered, record_donation)
+
+# Concurrency stress test for the donation write path.
+#
+#     GIVEBACK_DB_NAME=giveback_bench python benchmarks/donation_idempotency.py
+#
+# Fires --duplicates simultaneous submits for each of --donations
+# idempotency keys, then checks that exactly one row was written per key
+# and that every submit reported that same donation. Rows are written to
+# the first user and organization found and deleted afterwards unless
+# --keep is given. Never point this at production.
+#
+# With --items every key donates the single remaining item of an item
+# request of its own, so all but one duplicate find the request already
+# fulfilled and must still report the donation instead of a refusal.
+#
+# Before the stress run, one browser session is replayed against a plain
+# dict standing in for st.session_state: a click and a second click queued
+# behind it must write one donation, and after a rerun without a click the
+# same click must write a new one.
+
+ITEM_MARKER = "bench-idempotency"
+
+
+def first_id(cursor, table):
+    cursor.execute(f"SELECT MIN(id) FROM {table}")
+    found = cursor.fetchone()[0]
+    if found is None:
+        sys.exit(f"{table} is empty; create at least one row first")
+    return found
+
+
+def submit(user_id, organization_id, key, start_gate, item_request_id=None):
+    start_gate.wait()
+    with connection() as conn:
+        if item_request_id is not None:
+            try:
+                return fulfill_item_request(conn, user_id, item_request_id, 1, key, ITEM_MARKER)
+            except NotEnoughRemaining:
+                # Counted as a failure below: every duplicate must see the donation
+                return DonationResult(None, False)
+        return record_donation(conn, user_id, organization_id, key, amount=10)
+
+
+# Replay the clicks of one session through idempotency_key; returns
+# failure messages
+def check_session(conn, user_id, organization_id):
+    state = {}
+
+    def run(pressed):
+        key = idempotency_key("bench", organization_id, 10, pressed=pressed, state=state)
+        if pressed:
+            result = record_donation(conn, user_id, organization_id, key, amount=10)
+            mark_answered("bench", state=state)
+            return result
+
+    first = run(True)
+    queued = run(True)
+    run(False)
+    again = run(True)
+
+    ids = sorted({first.donation_id, again.donation_id})
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM donations WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+    conn.commit()
+
+    failures = []
+    if not first.created or queued.created or queued.donation_id != first.donation_id:
+        failures.append(f"queued second click: {first} then {queued}, expected one donation")
+    if not again.created or again.donation_id == first.donation_id:
+        failures.append(f"click after a rerun: {again}, expected a new donation")
+    return failures
+
+
+# One open item request with a single item left per key
+def create_item_requests(cursor, organization_id, keys):
+    requests = {}
+    for key in keys:
+        cursor.execute("""
+            INSERT INTO item_requests (organization_id, item_name, quantity, quantity_remaining, description)
+            VALUES (%s, %s, 1, 1, %s)
+        """, (organization_id, ITEM_MARKER, key))
+        requests[key] = cursor.lastrowid
+    return requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress test idempotent donation writes")
+    parser.add_argument("--donations", type=int, default=500, help="distinct idempotency keys")
+    parser.add_argument("--duplicates", type=int, default=8, help="parallel submits per key")
+    parser.add_argument("--threads", type=int, default=POOL_SIZE)
+    parser.add_argument("--items", action="store_true",
+                        help="donate the last item of an item request instead of money")
+    parser.add_argument("--keep", action="store_true", help="leave the donations in place")
+    args = parser.parse_args()
+
+    prefix = uuid.uuid4().hex[:8]
+    keys = [f"{prefix}-{i:027d}" for i in range(args.donations)]
+    results = {key: [] for key in keys}
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        user_id = first_id(cursor, "users")
+        organization_id = first_id(cursor, "organizations")
+        item_requests = create_item_requests(cursor, organization_id, keys) if args.items else {}
+        conn.commit()
+        session_failures = check_session(conn, user_id, organization_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for key in keys:
+            # All duplicates of a key are released together to collide
+            gate = threading.Barrier(min(args.duplicates, args.threads))
+            futures = [pool.submit(submit, user_id, organization_id, key, gate, item_requests.get(key))
+                       for _ in range(min(args.duplicates, args.threads))]
+            futures += [pool.submit(submit, user_id, organization_id, key, threading.Barrier(1),
+                                    item_requests.get(key))
+                        for _ in range(args.duplicates - len(futures))]
+            for future in futures:
+                results[key].append(future.result())
+    elapsed = time.perf_counter() - start
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT idempotency_key, COUNT(*), MIN(id) FROM donations
+            WHERE idempotency_key LIKE %s
+            GROUP BY idempotency_key
+        """, (prefix + "-%",))
+        written = {key: (count, donation_id) for key, count, donation_id in cursor.fetchall()}
+        if not args.keep:
+            cursor.execute("DELETE FROM donations WHERE idempotency_key LIKE %s", (prefix + "-%",))
+            if item_requests:
+                ids = list(item_requests.values())
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(f"DELETE FROM item_fulfillments WHERE item_request_id IN ({placeholders})", ids)
+                cursor.execute(f"DELETE FROM item_requests WHERE id IN ({placeholders})", ids)
+        conn.commit()
+
+    failures = []
+    for key, outcomes in results.items():
+        count, donation_id = written.get(key, (0, None))
+        created = sum(1 for outcome in outcomes if outcome.created)
+        if count != 1 or created != 1 or {outcome.donation_id for outcome in outcomes} != {donation_id}:
+            failures.append(f"{key}: {count} rows, {created} submits created, "
+                            f"ids {sorted({outcome.donation_id for outcome in outcomes})}")
+
+    submits = args.donations * args.duplicates
+    print(f"{submits:,} submits for {args.donations:,} donations in {elapsed:.2f}s "
+          f"({submits / elapsed:,.0f} submits/s, {args.donations / elapsed:,.0f} donations/s)")
+    for failure in session_failures:
+        print("FAILED: " + failure)
+    if failures:
+        print(f"FAILED: {len(failures)} keys not written exactly once")
+        for failure in failures[:20]:
+            print("  " + failure)
+    if failures or session_failures:
+        sys.exit(1)
+    print("OK: every key written exactly once and every duplicate saw the same donation")
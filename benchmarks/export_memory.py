@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connection  # noqa: E402
+from exports import export_ledger, ledger_query  # noqa: E402
+
+# Peak memory of donation ledger exports as the ledger grows.
+#
+#     GIVEBACK_DB_NAME=giveback_bench python benchmarks/export_memory.py --sizes 10000 100000 1000000
+#
+# For each size the first organization is seeded up to that many benchmark
+# donations and its whole ledger is exported. Each export runs in a fresh child process that samples its own RSS, so
+# peaks are not hidden by memory an earlier run left allocated. The
+# streaming exports should stay flat while the fetchall() baseline grows
+# with the row count. Never point this at production.
+
+SEED_BATCH = 10000
+SEED_MARKER = "bench-export"
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# Peak RSS above the starting point while fn() runs, sampled every 10 ms
+def peak_rss(fn):
+    baseline = rss_bytes()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], rss_bytes())
+            time.sleep(0.01)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - started
+        done.set()
+        sampler.join()
+    return result, max(peak[0], rss_bytes()) - baseline, elapsed
+
+
+def organization_id():
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(id) FROM organizations")
+        found = cursor.fetchone()[0]
+        if found is None:
+            sys.exit("organizations is empty; create at least one row first")
+        return found
+
+
+def seed(org_id, count):
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(id) FROM users")
+        user_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM donations WHERE organization_id = %s AND item_description = %s",
+                       (org_id, SEED_MARKER))
+        existing = cursor.fetchone()[0]
+        for low in range(existing, count, SEED_BATCH):
+            batch = min(SEED_BATCH, count - low)
+            cursor.executemany("""
+                INSERT INTO donations (user_id, organization_id, amount, item_description, donation_type, date)
+                VALUES (%s, %s, %s, %s, 'money', NOW() - INTERVAL %s MINUTE)
+            """, [(user_id, org_id, 10 + i % 490, SEED_MARKER, low + i) for i in range(batch)])
+            conn.commit()
+        print(f"Organization {org_id}: {max(existing, count):,} benchmark donations")
+
+
+# The in-page pattern: every row as a dict, then a DataFrame
+def fetchall_dataframe(org_id):
+    import pandas as pd
+
+    sql, params, _ = ledger_query("organization", org_id)
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        frame = pd.DataFrame(cursor.fetchall())
+        conn.commit()
+    return len(frame)
+
+
+def child(mode, org_id, fmt):
+    with tempfile.TemporaryDirectory() as tmp:
+        if mode == "export":
+            fn = lambda: export_ledger("organization", org_id, fmt, os.path.join(tmp, f"ledger.{fmt}"))
+        else:
+            fn = lambda: fetchall_dataframe(org_id)
+        rows, peak, elapsed = peak_rss(fn)
+    print(json.dumps({"rows": rows, "peak": peak, "elapsed": elapsed}))
+
+
+def run_child(mode, org_id, fmt):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--org", str(org_id), "--format", fmt],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark export memory use")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="ledger sizes to measure (benchmark donations are added as needed)")
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet"])
+    parser.add_argument("--baseline", action="store_true", help="also measure fetchall() into a DataFrame")
+    parser.add_argument("--child", choices=["export", "fetchall"], help=argparse.SUPPRESS)
+    parser.add_argument("--org", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--format", default="csv", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.org, args.format)
+        sys.exit(0)
+
+    org_id = organization_id()
+    runs = [("export", fmt) for fmt in args.formats] + ([("fetchall", "csv")] if args.baseline else [])
+    for size in sorted(args.sizes):
+        seed(org_id, size)
+        for mode, fmt in runs:
+            result = run_child(mode, org_id, fmt)
+            label = f"stream to {fmt}" if mode == "export" else "fetchall + DataFrame"
+            print(f"{label:22} {result['rows']:>10,} rows  {result['elapsed']:6.1f}s  "
+                  f"{result['rows'] / max(result['elapsed'], 1e-9):>9,.0f} rows/s  "
+                  f"peak RSS +{result['peak'] / 2 ** 20:,.1f} MiB")
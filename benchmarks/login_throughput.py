@@ -0,0 +1,162 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import INVALID, OK, authenticate  # noqa: E402
+from db import connection  # noqa: E402
+from passwords import make_hash  # noqa: E402
+from principal import ORGANIZATION, USER  # noqa: E402
+
+# Login throughput against large users / organizations tables.
+#
+#     GIVEBACK_DB_NAME=giveback_bench python migrations.py
+#     GIVEBACK_DB_NAME=giveback_bench python benchmarks/login_throughput.py --seed 1000000
+#
+# Seeding adds rows until each table holds --seed benchmark accounts. The
+# "lookup" phase compares the database side of the old organization login
+# (password matched in SQL, plus a second query on a miss) with the single
+# unique-key lookup auth.py does; "login" runs complete authenticate()
+# calls, password verification included. Never point this at production.
+
+PASSWORD = "benchmark-password"
+SEED_BATCH = 5000
+
+
+def user_email(i):
+    return f"bench-user-{i}@example.org"
+
+
+def org_email(i):
+    return f"bench-org-{i}@example.org"
+
+
+def seed(count, iterations):
+    stored = make_hash(PASSWORD, iterations)
+    with connection() as conn:
+        cursor = conn.cursor()
+        for table, name_col, email in (("users", "name", user_email), ("organizations", "org_name", org_email)):
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE email LIKE 'bench-%'")
+            start = cursor.fetchone()[0]
+            extra = ", is_approved, is_active" if table == "organizations" else ""
+            for low in range(start, count, SEED_BATCH):
+                rows = [(f"Bench {i}", email(i), stored) + ((True, True) if extra else ())
+                        for i in range(low, min(count, low + SEED_BATCH))]
+                cursor.executemany(f"""
+                    INSERT INTO {table} ({name_col}, email, password{extra})
+                    VALUES (%s, %s, %s{", %s, %s" if extra else ""})
+                """, rows)
+                conn.commit()
+            print(f"{table}: {max(start, count):,} benchmark rows")
+
+
+# Old organization login: match the password in SQL, then look the email
+# up again to pick the error message. Only the database side is measured;
+# callers pass the stored value as the "correct" password.
+def legacy_org_lookup(cursor, email, password):
+    cursor.execute("""
+        SELECT * FROM organizations
+        WHERE email=%s AND password=%s AND is_approved=1
+    """, (email, password))
+    if cursor.fetchone():
+        return 1
+    cursor.execute("SELECT * FROM organizations WHERE email=%s", (email,))
+    cursor.fetchall()
+    return 2
+
+
+def single_lookup(cursor, email, password):
+    cursor.execute("""
+        SELECT id, org_name AS name, password, is_approved, is_active
+        FROM organizations WHERE email = %s
+    """, (email,))
+    cursor.fetchone()
+    return 1
+
+
+# Run `attempt(conn, i)` from `threads` threads for `seconds`; returns
+# (attempts per second, queries per attempt, p95 latency in ms)
+def run(attempt, threads, seconds):
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        latencies, queries = [], 0
+        with connection() as conn:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                queries += attempt(conn)
+                latencies.append(time.perf_counter() - start)
+        with lock:
+            results.append((latencies, queries))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    latencies = sorted(latency for thread_latencies, _ in results for latency in thread_latencies)
+    queries = sum(count for _, count in results)
+    if not latencies:
+        return 0.0, 0.0, 0.0
+    return (len(latencies) / seconds, queries / len(latencies),
+            latencies[int(len(latencies) * 0.95) - 1] * 1000)
+
+
+def stored_password(email):
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT password FROM organizations WHERE email = %s", (email,))
+        return cursor.fetchone()[0]
+
+
+def report(label, result):
+    rate, queries, p95 = result
+    print(f"{label:38} {rate:10,.0f}/s  {queries:4.2f} queries/attempt  p95 {p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark login throughput")
+    parser.add_argument("--seed", type=int, default=0, help="ensure this many users and organizations exist")
+    parser.add_argument("--accounts", type=int, default=1000000, help="benchmark accounts to draw emails from")
+    parser.add_argument("--iterations", type=int, default=None, help="PBKDF2 iterations for seeded hashes")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--miss-rate", type=float, default=0.2, help="share of attempts with a wrong password")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed, args.iterations)
+        args.accounts = args.seed
+
+    def attempt_email(make_email):
+        return make_email(random.randrange(args.accounts))
+
+    def wrong(password):
+        return password + "-wrong" if random.random() < args.miss_rate else password
+
+    legacy_password = stored_password(org_email(0))
+    print(f"{args.threads} threads, {args.seconds:.0f}s per phase, {args.miss_rate:.0%} wrong passwords\n")
+    report("lookup: legacy org (password in SQL)", run(
+        lambda conn: legacy_org_lookup(conn.cursor(dictionary=True), attempt_email(org_email), wrong(legacy_password)),
+        args.threads, args.seconds))
+    report("lookup: single unique-key org", run(
+        lambda conn: single_lookup(conn.cursor(dictionary=True), attempt_email(org_email), wrong(PASSWORD)),
+        args.threads, args.seconds))
+
+    for kind, make_email in ((USER, user_email), (ORGANIZATION, org_email)):
+        outcomes = {OK: 0, INVALID: 0}
+
+        def attempt(conn, kind=kind, make_email=make_email):
+            status = authenticate(conn, kind, attempt_email(make_email), wrong(PASSWORD)).status
+            outcomes[status] = outcomes.get(status, 0) + 1
+            return 1
+
+        report(f"login: authenticate({kind})", run(attempt, args.threads, args.seconds))
+        print(f"{'':38} {outcomes[OK]:,} accepted, {outcomes[INVALID]:,} rejected")
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from money import format_minor, symbol, totals_by_currency  # noqa: E402
+
+# Formatting and totalling donation amounts: a column of Decimals formatted
+# with a per-row lambda and summed as objects, against int64 minor units
+# through money.format_minor and money.totals_by_currency. No database
+# needed; both paths must produce identical strings and totals.
+#
+#     python benchmarks/money_format.py --rows 10000 100000 1000000
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def sample(rows, currencies):
+    rng = random.Random(rows)
+    minor = np.array([rng.randrange(-10 ** 4, 10 ** 10) for _ in range(rows)], dtype=np.int64)
+    codes = np.array([rng.choice(currencies) for _ in range(rows)], dtype=object)
+    decimals = pd.Series([Decimal(int(v)).scaleb(-2) for v in minor], dtype=object)
+    return minor, codes, decimals
+
+
+def per_row(decimals, codes):
+    frame = pd.DataFrame({"amount": decimals, "currency": codes})
+    text = frame.apply(lambda row: f"{'-' if row['amount'] < 0 else ''}{symbol(row['currency'])}"
+                                   f"{abs(row['amount']):,.2f}", axis=1)
+    totals = {currency: sum(group, Decimal(0)) for currency, group in frame.groupby("currency")["amount"]}
+    return text.to_numpy(dtype=object), totals
+
+
+def vectorized(minor, codes):
+    return format_minor(minor, codes), totals_by_currency(minor, codes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark money formatting and totals")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--currencies", nargs="+", default=["INR", "USD"])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        minor, codes, decimals = sample(rows, args.currencies)
+        (text_rows, totals_rows), row_time = timed(lambda: per_row(decimals, codes))
+        (text_vec, totals_vec), vec_time = timed(lambda: vectorized(minor, codes))
+
+        if not (text_rows == text_vec).all():
+            sys.exit(f"formatted amounts differ, e.g. {text_rows[0]!r} vs {text_vec[0]!r}")
+        if {c: int(v.scaleb(2)) for c, v in totals_rows.items()} != totals_vec:
+            sys.exit("currency totals differ")
+
+        print(f"{rows:>10,} rows  Decimal per row {row_time:7.2f}s  "
+              f"int64 minor units {vec_time:7.3f}s  ({row_time / max(vec_time, 1e-9):,.0f}x)")
@@ -0,0 +1,102 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connection  # noqa: E402
+from rollups import ROLLUP_TABLES, SETTLE_SECONDS, WATERMARK, refresh  # noqa: E402
+
+# Check that rollups.refresh() never applies a donation past one that is
+# still settling, whatever order the `date` values are in.
+#
+#     GIVEBACK_DB_NAME=giveback_bench python benchmarks/rollup_settle.py
+#
+# Inserts three donations in id order with dates old, now, old. The first
+# refresh must apply only the first one and hold the third back behind the
+# second; once the second has settled all three must be applied. Donations
+# use the ISO test currency XTS so their rollup rows can be told apart, and
+# are deleted afterwards. Stop any background refresher and never point
+# this at production.
+
+CURRENCY = "XTS"
+
+
+def first_id(cursor, table):
+    cursor.execute(f"SELECT MIN(id) FROM {table}")
+    found = cursor.fetchone()[0]
+    if found is None:
+        sys.exit(f"{table} is empty; create at least one row first")
+    return found
+
+
+def insert(cursor, user_id, organization_id, age_seconds):
+    cursor.execute("""
+        INSERT INTO donations (user_id, organization_id, amount, donation_type, currency, date)
+        VALUES (%s, %s, 1, 'money', %s, NOW() - INTERVAL %s SECOND)
+    """, (user_id, organization_id, CURRENCY, age_seconds))
+    return cursor.lastrowid
+
+
+# Donations counted in each rollup table for the test currency
+def rolled_up(cursor):
+    counts = {}
+    for table, _, _ in ROLLUP_TABLES:
+        cursor.execute(f"SELECT COALESCE(SUM(donation_count), 0) FROM {table} WHERE currency = %s", (CURRENCY,))
+        counts[table] = int(cursor.fetchone()[0])
+    return counts
+
+
+def watermark(cursor):
+    cursor.execute("SELECT last_id FROM rollup_watermarks WHERE name = %s", (WATERMARK,))
+    return cursor.fetchone()[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that rollup refresh respects unsettled donations")
+    parser.add_argument("--batch-size", type=int, default=1, help="refresh batch size; 1 also checks batching")
+    args = parser.parse_args()
+
+    old = 24 * 3600
+    failures = []
+    with connection() as conn:
+        cursor = conn.cursor()
+        user_id = first_id(cursor, "users")
+        organization_id = first_id(cursor, "organizations")
+
+        # Start from a drained watermark
+        refresh(conn)
+        time.sleep(SETTLE_SECONDS + 1)
+        refresh(conn)
+
+        ids = [insert(cursor, user_id, organization_id, age) for age in (old, 0, old)]
+        conn.commit()
+        try:
+            refresh(conn, args.batch_size)
+            counts, last_id = rolled_up(cursor), watermark(cursor)
+            conn.commit()
+            if set(counts.values()) != {1} or last_id != ids[0]:
+                failures.append(f"with the second donation settling: counts {counts}, "
+                                f"watermark {last_id}, expected 1 each and {ids[0]}")
+
+            cursor.execute("UPDATE donations SET date = NOW() - INTERVAL %s SECOND WHERE id = %s", (old, ids[1]))
+            conn.commit()
+            refresh(conn, args.batch_size)
+            counts, last_id = rolled_up(cursor), watermark(cursor)
+            conn.commit()
+            if set(counts.values()) != {3} or last_id < ids[2]:
+                failures.append(f"after it settled: counts {counts}, watermark {last_id}, "
+                                f"expected 3 each and at least {ids[2]}")
+        finally:
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"DELETE FROM donations WHERE id IN ({placeholders})", ids)
+            for table, _, _ in ROLLUP_TABLES:
+                cursor.execute(f"DELETE FROM {table} WHERE currency = %s", (CURRENCY,))
+            conn.commit()
+
+    if failures:
+        for failure in failures:
+            print("FAILED: " + failure)
+        sys.exit(1)
+    print("OK: refresh stopped at the unsettled donation and applied the rest once it settled")
@@ -0,0 +1,139 @@
+from money import format_amount, to_minor
+
+# Bulk donor messaging for the Organization Dashboard. A send is recorded
+# up front (bulk_sends plus a snapshot of its recipients), then delivered
+# in chunks: each chunk renders its messages in memory, writes them with
+# one multi-row INSERT and advances the send's `sent` watermark in the same
+# transaction. An interrupted send therefore stops on a chunk boundary and
+# resume_send() picks it up exactly where it left off.
+
+CHUNK_SIZE = 500
+
+
+# Personalize a message template for one recipient
+def render_message(template, recipient, include_name=True, include_donation=True):
+    message = template
+    if include_name:
+        message = message.replace("{name}", recipient['user_name'])
+    if include_donation:
+        message = message.replace("{amount}", donation_amount(recipient))
+        message = message.replace("{date}", recipient['date'].strftime('%B %d, %Y'))
+    return message
+
+
+# Formatted amount of a donation row, or "item"
+def donation_amount(row):
+    if row['donation_type'] != 'money':
+        return "item"
+    return format_amount(to_minor(row['amount']), row['currency'])
+
+
+# One recipient per donor, keeping their most recent donation for the
+# {amount} and {date} placeholders. Rows must be ordered newest first.
+def unique_recipients(donation_rows):
+    seen = set()
+    recipients = []
+    for row in donation_rows:
+        if row['user_id'] not in seen:
+            seen.add(row['user_id'])
+            recipients.append(row)
+    return recipients
+
+
+# Record a send and its recipients in one transaction; returns the send id
+def create_send(conn, organization_id, message, recipients, include_name=True, include_donation=True):
+    cursor = conn.cursor()
+    # End any read snapshot the caller's connection still holds
+    conn.commit()
+    conn.start_transaction()
+    try:
+        cursor.execute("""
+            INSERT INTO bulk_sends
+            (organization_id, message, include_name, include_donation, total)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (organization_id, message, include_name, include_donation, len(recipients)))
+        send_id = cursor.lastrowid
+
+        for start in range(0, len(recipients), CHUNK_SIZE):
+            cursor.executemany("""
+                INSERT INTO bulk_send_recipients
+                (bulk_send_id, seq, user_id, user_name, amount, currency, donation_type, donation_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, [(send_id, seq, r['user_id'], r['user_name'], r['amount'], r['currency'],
+                   r['donation_type'], r['date'])
+                  for seq, r in enumerate(recipients[start:start + CHUNK_SIZE], start + 1)])
+
+        conn.commit()
+        return send_id
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Deliver the rest of a send chunk by chunk. on_progress(sent, total) is
+# called after every committed chunk. Returns the number of messages sent.
+def resume_send(conn, send_id, chunk_size=CHUNK_SIZE, on_progress=None):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT organization_id, message, include_name, include_donation, total, sent
+        FROM bulk_sends WHERE id = %s
+    """, (send_id,))
+    send = cursor.fetchone()
+    sent = send['sent']
+    # End the read so each chunk below runs in a transaction of its own
+    conn.commit()
+
+    while sent < send['total']:
+        conn.start_transaction()
+        try:
+            # Lock the send so two sessions resuming it cannot both deliver
+            # the same chunk; the second one re-reads the advanced watermark
+            cursor.execute("SELECT sent FROM bulk_sends WHERE id = %s FOR UPDATE", (send_id,))
+            sent = cursor.fetchone()['sent']
+
+            cursor.execute("""
+                SELECT seq, user_id, user_name, amount, currency, donation_type, donation_date as date
+                FROM bulk_send_recipients
+                WHERE bulk_send_id = %s AND seq > %s
+                ORDER BY seq
+                LIMIT %s
+            """, (send_id, sent, chunk_size))
+            chunk = cursor.fetchall()
+            if not chunk:
+                conn.commit()
+                break
+
+            cursor.executemany("""
+                INSERT INTO donation_updates (user_id, organization_id, message, bulk_send_id)
+                VALUES (%s, %s, %s, %s)
+            """, [(r['user_id'], send['organization_id'],
+                   render_message(send['message'], r, send['include_name'], send['include_donation']),
+                   send_id) for r in chunk])
+
+            sent = chunk[-1]['seq']
+            cursor.execute("""
+                UPDATE bulk_sends
+                SET sent = %s, status = IF(%s >= total, 'completed', 'sending')
+                WHERE id = %s
+            """, (sent, sent, send_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        if on_progress:
+            on_progress(sent, send['total'])
+
+    return sent
+
+
+# Sends of an organization that were interrupted before completing
+def unfinished_sends(conn, organization_id):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT id, message, total, sent, created_at
+        FROM bulk_sends
+        WHERE organization_id = %s AND status <> 'completed'
+        ORDER BY created_at DESC
+    """, (organization_id,))
+    return cursor.fetchall()
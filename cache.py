@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import connection
+
+# Cross-session cache for read-mostly queries. Entries expire after their
+# own TTL, the least recently used entry is evicted once the cache is full,
+# and writers drop exactly the entries they affect by invalidating tags.
+MAX_ENTRIES = int(os.environ.get("GIVEBACK_QUERY_CACHE_SIZE", "512"))
+DEFAULT_TTL = float(os.environ.get("GIVEBACK_QUERY_CACHE_TTL", "60"))
+
+
+class QueryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tags = {}  # tag -> set of keys
+        # Bumped on every invalidation so a load that raced with a write
+        # is not stored after the write has been committed
+        self._tag_versions = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, False
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats["misses"] += 1
+                return None, False
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value, True
+
+    def set(self, key, value, ttl=None, tags=(), versions=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            if versions is not None and any(
+                self._tag_versions.get(tag, 0) != version for tag, version in versions.items()
+            ):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def get_or_load(self, key, loader, ttl=None, tags=()):
+        value, found = self.get(key)
+        if found:
+            return value
+        with self._lock:
+            versions = {tag: self._tag_versions.get(tag, 0) for tag in tags}
+        value = loader()
+        self.set(key, value, ttl=ttl, tags=tags, versions=versions)
+        return value
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    # Caller must hold self._lock
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+query_cache = QueryCache()
+
+
+# Run a SELECT through the shared cache. Rows are shared between sessions,
+# so callers must treat them as read-only. Callers already holding a
+# pooled connection pass it as conn; a miss only borrows one otherwise.
+def cached_query(sql, params=(), ttl=None, tags=(), one=False, conn=None):
+    key = (sql, tuple(params), one)
+
+    def run(conn):
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+
+    def load():
+        if conn is not None:
+            return run(conn)
+        with connection() as borrowed:
+            return run(borrowed)
+
+    return query_cache.get_or_load(key, load, ttl=ttl, tags=tags)
+
+
+def invalidate(*tags):
+    query_cache.invalidate(*tags)
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from db import connection
+from rollups import ensure_background_refresh
+
+# Platform-wide impact totals for the landing page. A background thread
+# recomputes them from the daily donation rollup on an interval and every
+# session reads the latest snapshot from memory, so rendering the page
+# never waits on the database.
+REFRESH_INTERVAL = 60
+
+
+class LiveCounters:
+    def __init__(self, interval=REFRESH_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._thread = None
+
+    # Latest counters, or None until the first refresh has finished
+    def snapshot(self):
+        self.start()
+        with self._lock:
+            return self._snapshot
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="live-counters", daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        with connection() as conn:
+            snapshot = compute_counters(conn)
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _run(self):
+        # The counters are only as fresh as the rollups they are read from
+        ensure_background_refresh()
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Live counters refresh failed: {e}")
+            time.sleep(self.interval)
+
+
+# Totals plus this week's and last week's increments, where a week is the
+# last 7 days (today included) and the 7 days before that
+def compute_counters(conn):
+    cursor = conn.cursor(dictionary=True)
+
+    cursor.execute("""
+        SELECT COALESCE(SUM(donation_count), 0) as total,
+               COALESCE(SUM(CASE WHEN day >= CURDATE() - INTERVAL 6 DAY
+                                 THEN donation_count END), 0) as this_week,
+               COALESCE(SUM(CASE WHEN day >= CURDATE() - INTERVAL 13 DAY
+                                  AND day < CURDATE() - INTERVAL 6 DAY
+                                 THEN donation_count END), 0) as last_week
+        FROM donation_daily_rollup
+    """)
+    donations = cursor.fetchone()
+
+    # An organization or donor counts as new in the week of its first donation
+    counters = {"donations": _week_counts(donations)}
+    for name, column in (("organizations", "organization_id"), ("donors", "user_id")):
+        cursor.execute(f"""
+            SELECT COUNT(*) as total,
+                   COALESCE(SUM(first_day >= CURDATE() - INTERVAL 6 DAY), 0) as this_week,
+                   COALESCE(SUM(first_day >= CURDATE() - INTERVAL 13 DAY
+                                AND first_day < CURDATE() - INTERVAL 6 DAY), 0) as last_week
+            FROM (
+                SELECT {column}, MIN(day) as first_day
+                FROM donation_daily_rollup
+                WHERE {column} <> 0
+                GROUP BY {column}
+            ) firsts
+        """)
+        counters[name] = _week_counts(cursor.fetchone())
+
+    counters["updated_at"] = time.time()
+    return counters
+
+
+def _week_counts(row):
+    return {key: int(row[key]) for key in ("total", "this_week", "last_week")}
+
+
+# Metric delta text such as "+1,204 this week (+12% vs last week)"
+def week_delta(counts):
+    delta = f"+{counts['this_week']:,} this week"
+    if counts["last_week"]:
+        change = (counts["this_week"] - counts["last_week"]) / counts["last_week"]
+        delta += f" ({change:+.0%} vs last week)"
+    return delta
+
+
+live_counters = LiveCounters()
@@ -1,9 +1,245 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
+from mysql.connector.errors import PoolError
+
+from query_stats import ENABLED as QUERY_STATS_ENABLED, InstrumentedCursor
+
+DB_CONFIG = {
+    "host": os.environ.get("GIVEBACK_DB_HOST", "localhost"),
+    "user": os.environ.get("GIVEBACK_DB_USER", "root"),
+    "password": os.environ.get("GIVEBACK_DB_PASSWORD", "root"),
+    "database": os.environ.get("GIVEBACK_DB_NAME", "giveback_db"),
+}
+
+# Pool sizing (override through the environment per deployment)
+POOL_SIZE = int(os.environ.get("GIVEBACK_DB_POOL_SIZE", "10"))
+POOL_TIMEOUT = float(os.environ.get("GIVEBACK_DB_POOL_TIMEOUT", "10"))
+# Idle connections older than this are pinged before being handed out
+HEALTH_CHECK_AFTER = float(os.environ.get("GIVEBACK_DB_HEALTH_CHECK_AFTER", "30"))
+
+
+# Connection borrowed from a ConnectionPool. Behaves like the underlying
+# mysql.connector connection, except that close() hands it back to the pool.
+class PooledConnection:
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return getattr(self._raw, name)
+
+    # Cursors are instrumented for query_stats unless GIVEBACK_QUERY_STATS=0
+    def cursor(self, *args, **kwargs):
+        cursor = self.__getattr__("cursor")(*args, **kwargs)
+        return InstrumentedCursor(cursor) if QUERY_STATS_ENABLED else cursor
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Pages that stop early (st.rerun / st.stop) never reach conn.close();
+        # reclaim the connection once the script namespace is dropped.
+        if getattr(self, "_raw", None) is not None:
+            self._pool.reclaim(self._raw)
+            self._raw = None
+
+
+# Process-wide pool shared by every Streamlit session
+class ConnectionPool:
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_after=HEALTH_CHECK_AFTER, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.connect_args = connect_args or dict(DB_CONFIG)
+
+        self._cond = threading.Condition()
+        self._idle = []  # (raw connection, returned_at)
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._stats = {
+            "borrows": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "reclaimed": 0,
+            "health_check_failures": 0,
+            "total_wait_time": 0.0,
+            "max_wait_time": 0.0,
+        }
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.connect_args)
+        with self._cond:
+            self._stats["created"] += 1
+        return raw
+
+    def _is_healthy(self, raw, returned_at):
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            self._waiters += 1
+            try:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolError(
+                            f"Timed out after {timeout:.1f}s waiting for a database "
+                            f"connection ({self.size} in use)"
+                        )
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    raw, returned_at = self._idle.pop()
+                else:
+                    # Reserve the slot before leaving the lock so concurrent
+                    # borrowers cannot overshoot the pool size
+                    raw, returned_at = None, None
+                    self._open += 1
+                self._in_use += 1
+            finally:
+                self._waiters -= 1
+
+            waited = time.monotonic() - started
+            self._stats["borrows"] += 1
+            self._stats["total_wait_time"] += waited
+            self._stats["max_wait_time"] = max(self._stats["max_wait_time"], waited)
+
+        try:
+            if raw is not None and not self._is_healthy(raw, returned_at):
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                self._close_quietly(raw)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        healthy = True
+        try:
+            # Never leak an open transaction or unread result into the next borrower
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._open -= 1
+                self._stats["discarded"] += 1
+            self._cond.notify()
+
+        if not healthy:
+            self._close_quietly(raw)
+
+    def reclaim(self, raw):
+        with self._cond:
+            self._stats["reclaimed"] += 1
+        self.release(raw)
+
+    def _close_quietly(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiters": self._waiters,
+            })
+        stats["avg_wait_time"] = (
+            stats["total_wait_time"] / stats["borrows"] if stats["borrows"] else 0.0
+        )
+        return stats
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+# Borrow a pooled connection; conn.close() returns it to the pool
+def get_connection(timeout=None):
+    return get_pool().acquire(timeout)
+
+
+# Preferred API for short-lived work:
+#     with connection() as conn:
+#         cursor = conn.cursor(dictionary=True)
+@contextmanager
+def connection(timeout=None):
+    with get_pool().connection(timeout) as conn:
+        yield conn
+
 
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="giveback_db"
-    )
+def pool_stats():
+    return get_pool().stats()
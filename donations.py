@@ -0,0 +1,150 @@
+import uuid
+from collections import namedtuple
+
+import streamlit as st
+from mysql.connector import errorcode
+from mysql.connector.errors import IntegrityError
+
+from cache import invalidate
+from money import DEFAULT_CURRENCY, to_decimal, to_minor
+
+# One-off donations from the User Dashboard (money, items and emergency
+# responses). Every submit carries an idempotency key chosen by the
+# browser session; the unique index on donations.idempotency_key turns a
+# double click or a rerun mid-submit into a lookup of the donation that
+# was already written instead of a second row. Donations against an item
+# request also draw down its quantity_remaining and are recorded in the
+# item_fulfillments ledger, in the same transaction.
+DonationResult = namedtuple("DonationResult", "donation_id created")
+
+
+class NotEnoughRemaining(Exception):
+    def __init__(self, remaining):
+        super().__init__(f"Only {remaining} still needed" if remaining else "This request has been fulfilled")
+        self.remaining = remaining
+
+
+# The idempotency key for a donation form; `pressed` is whether this run
+# is a submit. The key stays the same while the form's inputs do, through
+# the answer and any clicks queued behind it, so a double click or a rerun
+# mid-submit is recognised as a retry. It is replaced when the inputs
+# change, or on the first run without a submit after an answer: giving the
+# same amount again after that is a new donation. `state` defaults to
+# st.session_state.
+def idempotency_key(scope, *inputs, pressed=False, state=None):
+    state = st.session_state if state is None else state
+    state_key = f"idempotency_{scope}"
+    current = state.get(state_key)
+    if current is None or current["inputs"] != inputs or (current["answered"] and not pressed):
+        current = {"inputs": inputs, "key": str(uuid.uuid4()), "answered": False}
+        state[state_key] = current
+    return current["key"]
+
+
+# Record that a form's submit has returned a result, so its key is
+# replaced on the next run that is not a submit
+def mark_answered(scope, state=None):
+    state = st.session_state if state is None else state
+    current = state.get(f"idempotency_{scope}")
+    if current is not None:
+        current["answered"] = True
+
+
+def _find(cursor, key):
+    cursor.execute("SELECT id FROM donations WHERE idempotency_key = %s", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+# Run write(cursor) -> donation id in a transaction of its own. A
+# duplicate idempotency key rolls everything back and returns the donation
+# written by the earlier submit.
+def _write_once(conn, key, write):
+    cursor = conn.cursor()
+    conn.commit()
+    conn.start_transaction()
+    try:
+        donation_id = write(cursor)
+        conn.commit()
+        return DonationResult(donation_id, True)
+    except IntegrityError as e:
+        conn.rollback()
+        if e.errno != errorcode.ER_DUP_ENTRY:
+            raise
+    except Exception:
+        conn.rollback()
+        raise
+
+    existing = _find(cursor, key)
+    conn.commit()
+    if existing is None:
+        raise RuntimeError("Donation key collided with a row that no longer exists")
+    return DonationResult(existing, False)
+
+
+def _insert_donation(cursor, user_id, organization_id, key, amount=None, item_description=None,
+                     currency=DEFAULT_CURRENCY):
+    if amount is not None:
+        # Widget floats are rounded to whole minor units here, once
+        amount = to_decimal(to_minor(amount))
+    cursor.execute("""
+        INSERT INTO donations
+        (user_id, organization_id, amount, item_description, donation_type, idempotency_key, currency)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (user_id, organization_id, amount, item_description,
+          "money" if amount is not None else "item", key, currency))
+    return cursor.lastrowid
+
+
+# Record a donation to an organization. Pass amount (in `currency`) for
+# money or item_description for items. Returns DonationResult; created is False
+# when the key had already been used and nothing new was written.
+def record_donation(conn, user_id, organization_id, key, amount=None, item_description=None,
+                    currency=DEFAULT_CURRENCY):
+    return _write_once(conn, key, lambda cursor: _insert_donation(
+        cursor, user_id, organization_id, key, amount, item_description, currency))
+
+
+# Donate `quantity` items against an item request. The request row is
+# locked while its remaining quantity is checked and decremented, so
+# concurrent donors can never take it below zero. At zero the generated
+# is_open column closes the request; is_active stays the organization's
+# own show/hide switch. Raises NotEnoughRemaining.
+def fulfill_item_request(conn, user_id, item_request_id, quantity, key, item_description):
+    def write(cursor):
+        cursor.execute("""
+            SELECT organization_id, quantity_remaining FROM item_requests
+            WHERE id = %s AND is_active = TRUE
+            FOR UPDATE
+        """, (item_request_id,))
+        request = cursor.fetchone()
+        if request is None or request[1] < quantity:
+            raise NotEnoughRemaining(request[1] if request else 0)
+
+        donation_id = _insert_donation(cursor, user_id, request[0], key, item_description=item_description)
+        cursor.execute("""
+            UPDATE item_requests
+            SET quantity_remaining = quantity_remaining - %s
+            WHERE id = %s AND quantity_remaining >= %s
+        """, (quantity, item_request_id, quantity))
+        cursor.execute("""
+            INSERT INTO item_fulfillments (item_request_id, donation_id, user_id, quantity)
+            VALUES (%s, %s, %s, %s)
+        """, (item_request_id, donation_id, user_id, quantity))
+        return donation_id
+
+    try:
+        result = _write_once(conn, key, write)
+    except NotEnoughRemaining:
+        # A retry, or a duplicate submit that waited on the row lock, finds
+        # nothing left once its own earlier submit has taken the last items.
+        # The refusal was rolled back, so this read sees that submit's commit.
+        cursor = conn.cursor()
+        existing = _find(cursor, key)
+        conn.commit()
+        if existing is None:
+            raise
+        return DonationResult(existing, False)
+    if result.created:
+        invalidate("item_requests:active")
+    return result
@@ -0,0 +1,194 @@
+import argparse
+import csv
+import datetime
+import importlib.util
+import os
+import tempfile
+import time
+import uuid
+
+import streamlit as st
+
+from db import connection
+
+# Full donation ledgers for download. Rows are read from an unbuffered
+# cursor (they stay on the server until fetched) in chunks of CHUNK_ROWS and
+# written straight to a file, so memory use does not depend on how long the
+# history is. Streamlit's download button still holds the finished file
+# while it is offered; for very large ledgers use the CLI:
+#     python exports.py organization 42 --format parquet --start 2024-01-01 -o ledger.parquet
+
+CHUNK_ROWS = 5000
+EXPORT_DIR = os.environ.get("GIVEBACK_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "giveback-exports"))
+# Prepared files older than this are deleted by prune_exports()
+EXPORT_TTL = 3600
+FORMATS = ["csv", "parquet"]
+
+# scope -> (query, [(column, type)]); types map to Parquet columns
+LEDGERS = {
+    "organization": ("""
+        SELECT d.id, d.date, d.donation_type, d.amount, d.currency, d.item_description,
+               u.name, u.email
+        FROM donations d
+        LEFT JOIN users u ON d.user_id = u.id
+        WHERE d.organization_id = %s
+    """, [("donation_id", "int"), ("date", "timestamp"), ("type", "string"), ("amount", "decimal"),
+          ("currency", "string"), ("item_description", "string"), ("donor_name", "string"),
+          ("donor_email", "string")]),
+    "user": ("""
+        SELECT d.id, d.date, d.donation_type, d.amount, d.currency, d.item_description,
+               o.org_name
+        FROM donations d
+        LEFT JOIN organizations o ON d.organization_id = o.id
+        WHERE d.user_id = %s
+    """, [("donation_id", "int"), ("date", "timestamp"), ("type", "string"), ("amount", "decimal"),
+          ("currency", "string"), ("item_description", "string"), ("organization", "string")]),
+}
+
+
+# Ledger query for an owner, oldest first; start and end are inclusive dates
+def ledger_query(scope, owner_id, start=None, end=None):
+    sql, columns = LEDGERS[scope]
+    params = [owner_id]
+    if start:
+        sql += " AND d.date >= %s"
+        params.append(start)
+    if end:
+        sql += " AND d.date < %s"
+        params.append(end + datetime.timedelta(days=1))
+    sql += " ORDER BY d.date, d.id"
+    return sql, params, columns
+
+
+# Yield lists of row tuples from an unbuffered cursor
+def stream_rows(conn, sql, params, chunk_rows=CHUNK_ROWS):
+    cursor = conn.cursor(buffered=False)
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        yield rows
+
+
+def write_csv(chunks, columns, path):
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow([name for name, _ in columns])
+        for rows in chunks:
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+# One Parquet row group per chunk (needs pyarrow)
+def write_parquet(chunks, columns, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"int": pa.int64(), "timestamp": pa.timestamp("us"), "string": pa.string(),
+             "decimal": pa.decimal128(10, 2)}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            written += len(rows)
+        if not written:
+            writer.write_table(schema.empty_table())
+    return written
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+# Write an owner's ledger to `path`; returns the number of rows written.
+# Reads through conn when given, otherwise through a pooled connection.
+def export_ledger(scope, owner_id, fmt, path, start=None, end=None, chunk_rows=CHUNK_ROWS, conn=None):
+    sql, params, columns = ledger_query(scope, owner_id, start, end)
+    write = write_parquet if fmt == "parquet" else write_csv
+
+    def run(conn):
+        written = write(stream_rows(conn, sql, params, chunk_rows), columns, path)
+        conn.commit()
+        return written
+
+    if conn is not None:
+        return run(conn)
+    with connection() as borrowed:
+        return run(borrowed)
+
+
+# Export into EXPORT_DIR under an unguessable name; returns (path, rows)
+def prepare_export(scope, owner_id, fmt, start=None, end=None, conn=None):
+    prune_exports()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{scope}-{owner_id}-{uuid.uuid4().hex}.{fmt}")
+    try:
+        return path, export_ledger(scope, owner_id, fmt, path, start, end, conn=conn)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def prune_exports(max_age=EXPORT_TTL):
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# Date range, format and download widgets for an owner's full ledger;
+# conn is the caller's connection, if it holds one
+def export_controls(scope, owner_id, conn=None):
+    state_key = f"export_{scope}"
+    formats = FORMATS if parquet_available() else ["csv"]
+    col1, col2, col3 = st.columns([0.45, 0.25, 0.3])
+    with col1:
+        date_range = st.date_input("Date range (optional)", value=(), key=f"{state_key}_range")
+    with col2:
+        fmt = st.radio("Format", formats, horizontal=True, key=f"{state_key}_format",
+                       format_func=str.upper)
+    with col3:
+        if st.button("📦 Prepare Export", key=f"{state_key}_prepare", use_container_width=True):
+            start = date_range[0] if len(date_range) > 0 else None
+            end = date_range[1] if len(date_range) > 1 else start
+            path, rows = prepare_export(scope, owner_id, fmt, start, end, conn)
+            st.session_state[state_key] = (path, rows, fmt)
+
+    prepared = st.session_state.get(state_key)
+    if prepared and os.path.exists(prepared[0]):
+        path, rows, fmt = prepared
+        with open(path, "rb") as data:
+            st.download_button(f"⬇️ Download {rows:,} donations ({fmt.upper()})", data,
+                               file_name=f"giveback-donations.{fmt}", key=f"{state_key}_download",
+                               mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet")
+
+
+def _date(text):
+    return datetime.date.fromisoformat(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a donation ledger")
+    parser.add_argument("scope", choices=list(LEDGERS))
+    parser.add_argument("owner_id", type=int, help="organization or user id")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--start", type=_date, help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_date, help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = export_ledger(args.scope, args.owner_id, args.format, args.output, args.start, args.end)
+    print(f"Wrote {rows:,} donations to {args.output} in {time.perf_counter() - started:.1f}s")
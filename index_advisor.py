@@ -0,0 +1,195 @@
+import re
+import threading
+import time
+
+from cache import query_cache
+from db import connection
+from query_stats import query_stats
+
+# EXPLAIN capture and index advice on top of query_stats. The slowest
+# fingerprints are explained periodically with the parameters of their
+# slowest run; plans that scan a whole table or index, or sort without an
+# index, are turned into a suggested composite index: equality filters
+# first, then the ORDER BY columns, then one range column.
+
+EXPLAIN_INTERVAL = 300
+EXPLAIN_TOP = 10
+FULL_SCAN_TYPES = {"ALL", "index"}
+MAX_INDEX_COLUMNS = 4
+# The index list only changes with migrations; re-read it once per capture
+INDEX_CACHE_TTL = EXPLAIN_INTERVAL
+
+_SQL_WORDS = {"on", "where", "join", "left", "right", "inner", "outer", "cross",
+              "order", "group", "limit", "having", "using", "set", "union"}
+_TABLES = re.compile(r"\b(?:from|join|update)\s+(\w+)(?:\s+(?:as\s+)?(\w+))?")
+_CLAUSE_END = re.compile(r"\b(?:group by|order by|limit|having|for update)\b")
+_EQUALITY = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:=\s*(?:\?|true|false)|in\s*\(\?\+?\))")
+_RANGE = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:<=|>=|<|>|\blike\b|\bbetween\b)\s*(?:\?|now|curdate)")
+_ORDER = re.compile(r"\border by (.+?)(?:\blimit\b|\bfor update\b|$)")
+_ORDER_COLUMN = re.compile(r"^(?:(\w+)\.)?(\w+)(?:\s+(?:asc|desc))?$")
+
+
+def explain(conn, sql, params):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + sql, params or ())
+    return cursor.fetchall()
+
+
+# EXPLAIN the slowest SELECT fingerprints and store the plans on them
+def capture_explains(top=EXPLAIN_TOP):
+    candidates = [entry for entry in query_stats.slowest(top)
+                  if entry["fingerprint"].startswith("select") and entry.get("sample_sql")]
+    with connection() as conn:
+        for entry in candidates:
+            try:
+                plan = explain(conn, entry["sample_sql"], entry["sample_params"])
+            except Exception as e:
+                plan = [{"error": str(e)}]
+            query_stats.set_explain(entry["fingerprint"], plan)
+    return len(candidates)
+
+
+def run_forever(interval=EXPLAIN_INTERVAL):
+    while True:
+        time.sleep(interval)
+        try:
+            capture_explains()
+        except Exception as e:
+            print(f"EXPLAIN capture failed: {e}")
+
+
+_capturer = None
+_capturer_lock = threading.Lock()
+
+
+def ensure_background_capture(interval=EXPLAIN_INTERVAL):
+    global _capturer
+    with _capturer_lock:
+        if _capturer is None or not _capturer.is_alive():
+            _capturer = threading.Thread(target=run_forever, args=(interval,), name="explain-capture", daemon=True)
+            _capturer.start()
+
+
+# {table: [[column, ...] per index]} for the current schema
+def existing_indexes(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT table_name, index_name, column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+        ORDER BY table_name, index_name, seq_in_index
+    """)
+    indexes = {}
+    for table, index, column in cursor.fetchall():
+        indexes.setdefault(table.lower(), {}).setdefault(index, []).append(column.lower())
+    return {table: list(by_name.values()) for table, by_name in indexes.items()}
+
+
+# existing_indexes() through the shared query cache, so rendering a report
+# does not query information_schema every time
+def cached_indexes():
+    def load():
+        with connection() as conn:
+            return existing_indexes(conn)
+
+    return query_cache.get_or_load("index_advisor:indexes", load, ttl=INDEX_CACHE_TTL, tags=("schema:indexes",))
+
+
+# Columns worth indexing on `alias` for a fingerprinted statement
+def candidate_columns(fp, alias, single_table):
+    def ours(prefix):
+        return prefix == alias or (not prefix and single_table)
+
+    where = ""
+    if " where " in fp:
+        where = fp.split(" where ", 1)[1]
+        end = _CLAUSE_END.search(where)
+        where = where[:end.start()] if end else where
+
+    columns = []
+    for prefix, column in _EQUALITY.findall(where):
+        if ours(prefix) and column not in columns:
+            columns.append(column)
+
+    order = _ORDER.search(fp)
+    if order:
+        for part in order.group(1).split(","):
+            match = _ORDER_COLUMN.match(part.strip())
+            if match and ours(match.group(1)) and match.group(2) not in columns:
+                columns.append(match.group(2))
+        # InnoDB appends the primary key to every secondary index already
+        if len(columns) > 1 and columns[-1] == "id":
+            columns.pop()
+
+    if not order:
+        for prefix, column in _RANGE.findall(where):
+            if ours(prefix) and column not in columns:
+                columns.append(column)
+                break
+
+    return columns[:MAX_INDEX_COLUMNS]
+
+
+def _covered(columns, indexes):
+    return any(index[:len(columns)] == columns for index in indexes)
+
+
+# Index suggestions for every explained fingerprint whose plan scans or sorts
+def recommend(entries, indexes):
+    recommendations = {}
+    for entry in entries:
+        fp = entry["fingerprint"]
+        tables = {}
+        for table, alias in _TABLES.findall(fp):
+            tables[alias if alias and alias not in _SQL_WORDS else table] = table
+
+        for row in entry.get("explain") or []:
+            extra = row.get("Extra") or ""
+            if row.get("type") not in FULL_SCAN_TYPES and "filesort" not in extra:
+                continue
+            alias = row.get("table")
+            table = tables.get(alias)
+            if not table:
+                continue
+            columns = candidate_columns(fp, alias, len(tables) == 1)
+            if not columns or _covered(columns, indexes.get(table, [])):
+                continue
+
+            key = (table, tuple(columns))
+            if key not in recommendations:
+                reason = "full table scan" if row["type"] == "ALL" else (
+                    "full index scan" if row["type"] == "index" else "filesort")
+                recommendations[key] = {
+                    "table": table,
+                    "columns": columns,
+                    "reason": reason,
+                    "rows_examined": row.get("rows"),
+                    "statement": f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})",
+                    "queries": [],
+                }
+            recommendations[key]["queries"].append(fp)
+    return list(recommendations.values())
+
+
+def build_report():
+    entries = query_stats.snapshot()
+    return entries, recommend(entries, cached_indexes())
+
+
+def format_report(entries, recommendations, limit=20):
+    lines = ["Query performance", "================="]
+    for entry in entries[:limit]:
+        lines.append(
+            f"{entry['count']:>8}x  p50 {entry['p50'] * 1000:8.1f} ms  p95 {entry['p95'] * 1000:8.1f} ms  "
+            f"p99 {entry['p99'] * 1000:8.1f} ms  {entry['avg_rows']:8.1f} rows  {entry['fingerprint']}"
+        )
+    lines += ["", "Recommended indexes", "==================="]
+    if not recommendations:
+        lines.append("None (explain more queries or wait for the next capture)")
+    for rec in recommendations:
+        lines.append(f"{rec['table']}({', '.join(rec['columns'])})  -- {rec['reason']}, "
+                     f"~{rec['rows_examined']} rows examined")
+        lines.append(f"    {rec['statement']};")
+        for fp in rec["queries"]:
+            lines.append(f"    used by: {fp}")
+    return "\n".join(lines)
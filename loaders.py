@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from mysql.connector.constants import FieldType
+
+from money import SCALE
+
+# Result sets straight into DataFrame columns. Rows are fetched raw (each
+# value as the bytes MySQL sent) from an unbuffered cursor in chunks of
+# CHUNK_ROWS, and each chunk is parsed column by column with NumPy/pandas,
+# so numbers and datetimes never become per-cell Decimal or datetime
+# objects and no list of row dicts is built first.
+#
+# Column dtypes follow the MySQL field type: integers -> int64 (nullable
+# Int64 when NULLs occur), DECIMAL/FLOAT/DOUBLE -> float64 (NaN for NULL),
+# DATE/DATETIME/TIMESTAMP -> datetime64 (NaT), everything else -> str/None.
+# DECIMAL columns listed in minor_units are read exactly as int64 money
+# minor units instead (see money.py); extra decimal places are truncated.
+
+CHUNK_ROWS = 10000
+
+INTEGER_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG,
+                 FieldType.INT24, FieldType.YEAR}
+FLOAT_TYPES = {FieldType.DECIMAL, FieldType.NEWDECIMAL, FieldType.FLOAT, FieldType.DOUBLE}
+DATETIME_TYPES = {FieldType.DATE, FieldType.NEWDATE, FieldType.DATETIME, FieldType.TIMESTAMP}
+
+
+def _kind(type_code):
+    if type_code in INTEGER_TYPES:
+        return "int"
+    if type_code in FLOAT_TYPES:
+        return "float"
+    if type_code in DATETIME_TYPES:
+        return "datetime"
+    return "str"
+
+
+# Parse one chunk of raw values for a column; returns (values, null mask)
+def _parse(values, kind):
+    if kind == "str":
+        return np.array([None if v is None else bytes(v).decode("utf-8") for v in values], dtype=object), None
+
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    filler = b"0" if kind in ("int", "minor") else b"nan" if kind == "float" else b""
+    raw = np.array([filler if v is None else bytes(v) for v in values], dtype="S")
+    if kind == "int":
+        return raw.astype(np.int64), mask
+    if kind == "minor":
+        return _minor_units(raw), mask
+    if kind == "float":
+        return raw.astype(np.float64), mask
+    # Zero dates ('0000-00-00') and NULLs both become NaT
+    return pd.to_datetime(raw.astype("U"), errors="coerce").to_numpy(), mask
+
+
+# b"-12.5" -> -1250: whole and fractional digits are parsed separately, so
+# no value goes through a float
+def _minor_units(raw):
+    whole, _, fraction = np.char.partition(raw, b".").T
+    fraction = np.char.ljust(fraction, SCALE, b"0").astype(f"S{SCALE}").astype(np.int64)
+    sign = np.where(np.char.startswith(whole, b"-"), -1, 1)
+    return sign * (np.abs(whole.astype(np.int64)) * 10 ** SCALE + fraction)
+
+
+def _column(parts, kind):
+    if not parts:
+        return np.array([], dtype={"int": np.int64, "minor": np.int64, "float": np.float64,
+                                   "datetime": "datetime64[ns]", "str": object}[kind])
+    values = np.concatenate([part[0] for part in parts])
+    if kind in ("int", "minor"):
+        mask = np.concatenate([part[1] for part in parts])
+        if mask.any():
+            return pd.arrays.IntegerArray(values, mask)
+    return values
+
+
+# Run a query and return {column name: array}, ready for pd.DataFrame
+def read_columns(conn, sql, params=(), chunk_rows=CHUNK_ROWS, minor_units=()):
+    cursor = conn.cursor(raw=True, buffered=False)
+    cursor.execute(sql, params)
+    names = [column[0] for column in cursor.description]
+    kinds = ["minor" if column[0] in minor_units else _kind(column[1]) for column in cursor.description]
+    parts = [[] for _ in names]
+
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        for i, values in enumerate(zip(*rows)):
+            parts[i].append(_parse(values, kinds[i]))
+
+    return {name: _column(column_parts, kind) for name, kind, column_parts in zip(names, kinds, parts)}
+
+
+def read_frame(conn, sql, params=(), chunk_rows=CHUNK_ROWS, minor_units=()):
+    return pd.DataFrame(read_columns(conn, sql, params, chunk_rows, minor_units))
@@ -1,4 +1,5 @@
 import streamlit as st
+from counters import live_counters, week_delta
 
 # Page Configuration
 st.set_page_config(
@@ -38,13 +39,20 @@ Sign up today to make a difference!
 </span>
 """, unsafe_allow_html=True)
 
-# Metrics Counter (simulated)
+# Live impact counters, served from memory and refreshed in the background
 st.markdown("---")
 st.subheader("🌍 Our Collective Impact")
+counters = live_counters.snapshot()
 col1, col2, col3 = st.columns(3)
-col1.metric("Donations Made", "1,245,678", "+12,345 this week")
-col2.metric("Organizations Supported", "4,321", "+42 this month")
-col3.metric("Countries Reached", "127", "6 new this year")
+if counters:
+    col1.metric("Donations Made", f"{counters['donations']['total']:,}", week_delta(counters['donations']))
+    col2.metric("Organizations Supported", f"{counters['organizations']['total']:,}", week_delta(counters['organizations']))
+    col3.metric("Donors", f"{counters['donors']['total']:,}", week_delta(counters['donors']))
+else:
+    col1.metric("Donations Made", "—")
+    col2.metric("Organizations Supported", "—")
+    col3.metric("Donors", "—")
+    st.caption("Live totals are loading…")
 
 # Features Section
 st.markdown("---")
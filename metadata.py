@@ -0,0 +1,97 @@
+import datetime
+
+# Structured metadata for emergencies and item requests. These values are
+# stored in their own indexed columns; the parsers below only exist to
+# backfill rows written when the metadata was embedded in `description`.
+
+EMERGENCY_TYPES = ["Natural Disaster", "Medical Crisis", "Food Shortage",
+                   "Shelter Needed", "Other Urgent Need"]
+EMERGENCY_RADII = ["Local (under 1km)", "Community (1-5km)", "Regional (5-20km)", "Wide Area (20+km)"]
+EMERGENCY_DURATIONS = ["Hours", "Days", "Weeks", "Ongoing"]
+EMERGENCY_URGENCY_LEVELS = ["Monitor", "Concern", "Serious", "Critical", "Life-Threatening"]
+EMERGENCY_URGENCY_COLORS = {
+    "Life-Threatening": "violet",
+    "Critical": "red",
+    "Serious": "orange",
+    "Concern": "blue",
+    "Monitor": "green"
+}
+
+ITEM_CATEGORIES = ["Clothing", "Food", "Medical", "Educational",
+                   "Toys", "Furniture", "Electronics", "Other"]
+ITEM_TAGS = ["Winter", "Summer", "Children", "Elderly", "Emergency",
+             "New", "Used", "Urgent", "School", "Festival"]
+ITEM_URGENCY_LEVELS = ["Low", "Medium", "High", "Critical"]
+ITEM_URGENCY_COLORS = {
+    "Critical": "red",
+    "High": "orange",
+    "Medium": "blue",
+    "Low": "green"
+}
+
+
+# Markdown badge for an urgency level, e.g. ":red[Critical]"
+def urgency_badge(level, colors):
+    if not level:
+        return ":gray[Unspecified]"
+    return f":{colors.get(level, 'gray')}[{level}]"
+
+
+# Split a legacy emergency description ("**Type:** ...", "**Urgency:** ...")
+# into structured fields and the remaining free-text details
+def parse_emergency_description(description):
+    fields = {}
+    details = []
+    for line in (description or "").split("\n"):
+        if line.startswith("**") and ":**" in line and not details:
+            key, val = line[2:].split(":**", 1)
+            val = val.strip()
+            if key == "Details":
+                continue
+            fields[key] = val
+        elif line.strip() or details:
+            details.append(line)
+
+    location = fields.get("Location")
+    radius = None
+    for candidate in EMERGENCY_RADII:
+        if location and location.endswith(f" ({candidate})"):
+            location, radius = location[:-len(candidate) - 3], candidate
+            break
+
+    return {
+        "emergency_type": fields.get("Type"),
+        "location": location,
+        "affected_radius": radius,
+        "urgency": fields.get("Urgency"),
+        "duration": fields.get("Duration"),
+        "needs": fields.get("Immediate Needs") or None,
+    }, "\n".join(details).strip()
+
+
+# Split a legacy item request description ("Category: ...", "Urgency: ...")
+# into structured fields and the remaining free-text details
+def parse_item_request_description(description):
+    fields = {}
+    details = []
+    for line in (description or "").split("\n"):
+        key, sep, val = line.partition(":")
+        if sep and not details and key.strip() in ("Category", "Tags", "Urgency", "Deadline", "Details"):
+            if key.strip() != "Details":
+                fields[key.strip()] = val.strip()
+        elif line.strip() or details:
+            details.append(line)
+
+    deadline = None
+    if fields.get("Deadline"):
+        try:
+            deadline = datetime.datetime.strptime(fields["Deadline"], "%Y-%m-%d").date()
+        except ValueError:
+            pass
+
+    return {
+        "category": fields.get("Category"),
+        "urgency": fields.get("Urgency"),
+        "deadline": deadline,
+        "tags": fields.get("Tags") or None,
+    }, "\n".join(details).strip()
@@ -0,0 +1,627 @@
+import argparse
+
+from db import connection
+from metadata import parse_emergency_description, parse_item_request_description
+
+# Versioned schema migrations for GiveBack. Run once per deploy, before the
+# app starts serving:
+#     python migrations.py              # apply pending migrations
+#     python migrations.py status       # list applied and pending versions
+# Applied versions are recorded in schema_version and a named lock keeps
+# concurrent deploys from running the same step twice. Every step is also
+# idempotent, so databases set up before versioning upgrade cleanly.
+# Pages assume the schema is current and never run DDL themselves.
+
+BACKFILL_BATCH_SIZE = 500
+LOCK_NAME = "giveback_migrations"
+LOCK_TIMEOUT = 60
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+def add_column(cursor, table, column, definition):
+    if not column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def add_index(cursor, table, index, columns, unique=False):
+    if not index_exists(cursor, table, index):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"CREATE {kind} {index} ON {table} ({columns})")
+
+
+def foreign_key_exists(cursor, table, name):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.table_constraints
+        WHERE table_schema = DATABASE() AND table_name = %s
+          AND constraint_name = %s AND constraint_type = 'FOREIGN KEY'
+    """, (table, name))
+    return cursor.fetchone()[0] > 0
+
+
+def drop_index(cursor, table, index):
+    if index_exists(cursor, table, index):
+        cursor.execute(f"DROP INDEX {index} ON {table}")
+
+
+# The original tables, for fresh databases. Organizations created before
+# approval existed also get their is_active / is_approved flags here.
+def create_base_tables(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            address TEXT,
+            phone VARCHAR(20)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS organizations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            org_name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            description TEXT,
+            address TEXT,
+            phone VARCHAR(20),
+            gov_id_type VARCHAR(50),
+            gov_id_number VARCHAR(100),
+            is_approved BOOLEAN DEFAULT FALSE,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    """)
+    add_column(cursor, "organizations", "is_active", "BOOLEAN DEFAULT TRUE")
+    add_column(cursor, "organizations", "is_approved", "BOOLEAN DEFAULT FALSE")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS donations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT,
+            organization_id INT,
+            amount DECIMAL(10, 2),
+            donation_type VARCHAR(10) NOT NULL,
+            item_description TEXT,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS recurring_donations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            organization_id INT NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            frequency VARCHAR(10) NOT NULL,
+            next_payment_date DATE NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_requests (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            organization_id INT NOT NULL,
+            item_name VARCHAR(255) NOT NULL,
+            quantity INT NOT NULL,
+            description TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS emergencies (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            organization_id INT NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            is_approved BOOLEAN DEFAULT FALSE,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS donation_updates (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            organization_id INT NOT NULL,
+            message TEXT NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.commit()
+
+
+# Urgency, category, type, location, deadline and tags used to live inside
+# the free-text description; give them real, indexed columns
+def add_structured_metadata(conn):
+    cursor = conn.cursor()
+
+    add_column(cursor, "emergencies", "emergency_type", "VARCHAR(50) NULL")
+    add_column(cursor, "emergencies", "location", "VARCHAR(255) NULL")
+    add_column(cursor, "emergencies", "affected_radius", "VARCHAR(50) NULL")
+    add_column(cursor, "emergencies", "urgency", "VARCHAR(20) NULL")
+    add_column(cursor, "emergencies", "duration", "VARCHAR(20) NULL")
+    add_column(cursor, "emergencies", "needs", "VARCHAR(255) NULL")
+    add_index(cursor, "emergencies", "idx_emergencies_urgency", "urgency")
+    add_index(cursor, "emergencies", "idx_emergencies_org_urgency", "organization_id, urgency")
+
+    add_column(cursor, "item_requests", "category", "VARCHAR(50) NULL")
+    add_column(cursor, "item_requests", "urgency", "VARCHAR(20) NULL")
+    add_column(cursor, "item_requests", "deadline", "DATE NULL")
+    add_column(cursor, "item_requests", "tags", "VARCHAR(255) NULL")
+    add_index(cursor, "item_requests", "idx_item_requests_org_urgency", "organization_id, urgency")
+    add_index(cursor, "item_requests", "idx_item_requests_org_category", "organization_id, category")
+
+    conn.commit()
+
+
+# One-off: parse metadata out of legacy descriptions into the new columns.
+# Only rows that still carry the embedded format are touched, in id-ordered
+# batches so the backfill never holds long locks on a hot table.
+def backfill_structured_metadata(conn):
+    cursor = conn.cursor(dictionary=True)
+
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id, description FROM emergencies
+            WHERE id > %s AND urgency IS NULL AND description LIKE '**Type:**%%'
+            ORDER BY id LIMIT %s
+        """, (last_id, BACKFILL_BATCH_SIZE))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for row in rows:
+            fields, details = parse_emergency_description(row["description"])
+            cursor.execute("""
+                UPDATE emergencies
+                SET emergency_type = %s, location = %s, affected_radius = %s,
+                    urgency = %s, duration = %s, needs = %s, description = %s
+                WHERE id = %s
+            """, (fields["emergency_type"], fields["location"], fields["affected_radius"],
+                  fields["urgency"], fields["duration"], fields["needs"], details, row["id"]))
+        conn.commit()
+        last_id = rows[-1]["id"]
+
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id, description FROM item_requests
+            WHERE id > %s AND urgency IS NULL AND description LIKE 'Category:%%'
+            ORDER BY id LIMIT %s
+        """, (last_id, BACKFILL_BATCH_SIZE))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for row in rows:
+            fields, details = parse_item_request_description(row["description"])
+            cursor.execute("""
+                UPDATE item_requests
+                SET category = %s, urgency = %s, deadline = %s, tags = %s, description = %s
+                WHERE id = %s
+            """, (fields["category"], fields["urgency"], fields["deadline"],
+                  fields["tags"], details, row["id"]))
+        conn.commit()
+        last_id = rows[-1]["id"]
+
+
+# Composite indexes matching the filtered, keyset-paginated dashboard lists:
+# equality filters first, then the (timestamp, id) sort key. The two-column
+# (organization_id, urgency/category) indexes are prefixes of the new ones.
+def add_filter_pagination_indexes(conn):
+    cursor = conn.cursor()
+
+    add_index(cursor, "item_requests", "idx_item_requests_org_created", "organization_id, created_at")
+    add_index(cursor, "item_requests", "idx_item_requests_org_active_created",
+              "organization_id, is_active, created_at")
+    add_index(cursor, "item_requests", "idx_item_requests_org_urgency_created",
+              "organization_id, urgency, created_at")
+    add_index(cursor, "item_requests", "idx_item_requests_org_category_created",
+              "organization_id, category, created_at")
+    drop_index(cursor, "item_requests", "idx_item_requests_org_urgency")
+    drop_index(cursor, "item_requests", "idx_item_requests_org_category")
+
+    add_index(cursor, "emergencies", "idx_emergencies_org_created", "organization_id, created_at")
+    add_index(cursor, "emergencies", "idx_emergencies_org_urgency_created",
+              "organization_id, urgency, created_at")
+    drop_index(cursor, "emergencies", "idx_emergencies_org_urgency")
+    add_index(cursor, "emergencies", "idx_emergencies_status_created",
+              "is_active, is_approved, created_at")
+    add_index(cursor, "emergencies", "idx_emergencies_status_urgency_created",
+              "is_active, is_approved, urgency, created_at")
+
+    add_index(cursor, "donations", "idx_donations_org_date", "organization_id, date")
+    add_index(cursor, "donations", "idx_donations_org_type_date", "organization_id, donation_type, date")
+
+    conn.commit()
+
+
+# "Show more" feeds on the User Dashboard page through (created_at, id) and
+# (sent_at, id); the primary key is implicitly the last index column
+def add_feed_indexes(conn):
+    cursor = conn.cursor()
+    add_index(cursor, "donation_updates", "idx_donation_updates_user_sent", "user_id, sent_at")
+    conn.commit()
+
+
+# Daily and monthly donation rollups maintained by rollups.py
+def add_donation_rollups(conn):
+    cursor = conn.cursor()
+
+    for table, bucket_col in (("donation_daily_rollup", "day"), ("donation_monthly_rollup", "month")):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                user_id INT NOT NULL,
+                organization_id INT NOT NULL,
+                {bucket_col} DATE NOT NULL,
+                donation_type VARCHAR(10) NOT NULL,
+                donation_count INT NOT NULL DEFAULT 0,
+                described_count INT NOT NULL DEFAULT 0,
+                amount_total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, organization_id, {bucket_col}, donation_type),
+                INDEX idx_{table}_org (organization_id, {bucket_col})
+            )
+        """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_watermarks (
+            name VARCHAR(50) PRIMARY KEY,
+            last_id BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Latest-donation lookups for the overview metrics
+    add_index(cursor, "donations", "idx_donations_user_date", "user_id, date")
+
+    conn.commit()
+
+
+# Columns and indexes used by the recurring donation scheduler (scheduler.py)
+def add_recurring_scheduler(conn):
+    cursor = conn.cursor()
+
+    # Day of month monthly/yearly schedules return to after a short month
+    add_column(cursor, "recurring_donations", "anchor_day", "TINYINT NULL")
+    add_index(cursor, "recurring_donations", "idx_recurring_donations_due", "is_active, next_payment_date")
+
+    # One donation per schedule and due date, whatever happens to the workers
+    add_column(cursor, "donations", "recurring_donation_id", "INT NULL")
+    add_column(cursor, "donations", "scheduled_for", "DATE NULL")
+    add_index(cursor, "donations", "uq_donations_recurring_schedule",
+              "recurring_donation_id, scheduled_for", unique=True)
+
+    conn.commit()
+
+
+# Resumable bulk messaging (bulk_messaging.py): each send keeps its template,
+# a snapshot of its recipients and a watermark of how many were delivered
+def add_bulk_sends(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_sends (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            organization_id INT NOT NULL,
+            message TEXT NOT NULL,
+            include_name BOOLEAN NOT NULL DEFAULT TRUE,
+            include_donation BOOLEAN NOT NULL DEFAULT TRUE,
+            total INT NOT NULL,
+            sent INT NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_bulk_sends_org_status (organization_id, status)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_send_recipients (
+            bulk_send_id INT NOT NULL,
+            seq INT NOT NULL,
+            user_id INT NOT NULL,
+            user_name VARCHAR(255),
+            amount DECIMAL(10, 2),
+            donation_type VARCHAR(10),
+            donation_date DATETIME,
+            PRIMARY KEY (bulk_send_id, seq)
+        )
+    """)
+    add_column(cursor, "donation_updates", "bulk_send_id", "INT NULL")
+
+    conn.commit()
+
+
+# Transactional outbox drained by outbox.py workers
+def add_outbox(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(30) NOT NULL,
+            recipient VARCHAR(255) NULL,
+            payload TEXT NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at DATETIME NULL,
+            INDEX idx_outbox_due (status, next_attempt_at)
+        )
+    """)
+    conn.commit()
+
+
+# Lookups the remaining hot queries filter on: logins by email, the
+# organization lists, the active item request feed, recurring donations per
+# user and per-organization message analytics
+def add_hot_query_indexes(conn):
+    cursor = conn.cursor()
+
+    add_index(cursor, "users", "idx_users_email", "email")
+    add_index(cursor, "organizations", "idx_organizations_email", "email")
+    add_index(cursor, "organizations", "idx_organizations_status_name", "is_approved, is_active, org_name")
+    add_index(cursor, "item_requests", "idx_item_requests_active_created", "is_active, created_at")
+    add_index(cursor, "recurring_donations", "idx_recurring_donations_user_active",
+              "user_id, is_active, next_payment_date")
+    add_index(cursor, "donation_updates", "idx_donation_updates_org_sent", "organization_id, sent_at")
+
+    conn.commit()
+
+
+# One account per email, so a login is a single unique-key lookup. Existing
+# duplicates have to be merged by hand first; the step refuses to guess.
+def add_unique_emails(conn):
+    cursor = conn.cursor()
+
+    for table in ("users", "organizations"):
+        cursor.execute(f"""
+            SELECT email, COUNT(*) FROM {table}
+            GROUP BY email HAVING COUNT(*) > 1
+            LIMIT 10
+        """)
+        duplicates = cursor.fetchall()
+        if duplicates and not index_exists(cursor, table, f"uq_{table}_email"):
+            listed = ", ".join(f"{email} ({count})" for email, count in duplicates)
+            raise RuntimeError(f"{table} has duplicate emails, resolve them before migrating: {listed}")
+
+        add_index(cursor, table, f"uq_{table}_email", "email", unique=True)
+        drop_index(cursor, table, f"idx_{table}_email")
+
+    conn.commit()
+
+
+def add_organization_audit(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS organization_audit (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            organization_id INT NOT NULL,
+            org_name VARCHAR(255),
+            email VARCHAR(255),
+            action VARCHAR(20) NOT NULL,
+            note TEXT,
+            source VARCHAR(100),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_organization_audit_org (organization_id, created_at),
+            INDEX idx_organization_audit_created (created_at)
+        )
+    """)
+
+    conn.commit()
+
+
+# Client-generated key per one-off donation; NULL for scheduled donations,
+# which are deduplicated by uq_donations_recurring_schedule instead
+def add_donation_idempotency(conn):
+    cursor = conn.cursor()
+
+    add_column(cursor, "donations", "idempotency_key", "CHAR(36) NULL")
+    add_index(cursor, "donations", "uq_donations_idempotency_key", "idempotency_key", unique=True)
+
+    conn.commit()
+
+
+# Fulfillment ledger for item requests. quantity_remaining starts at the
+# requested quantity and is drawn down by donations; is_open is maintained
+# by MySQL so the donor-facing list of open requests is one index range.
+# Item donations written before this step are not linked to their
+# requests (they stored the request id as organization_id).
+def add_item_fulfillments(conn):
+    cursor = conn.cursor()
+
+    add_column(cursor, "item_requests", "quantity_remaining", "INT NULL")
+    cursor.execute("UPDATE item_requests SET quantity_remaining = quantity WHERE quantity_remaining IS NULL")
+    cursor.execute("ALTER TABLE item_requests MODIFY quantity_remaining INT NOT NULL")
+    add_column(cursor, "item_requests", "is_open",
+               "BOOLEAN AS (is_active = TRUE AND quantity_remaining > 0) STORED")
+    add_index(cursor, "item_requests", "idx_item_requests_open_created", "is_open, created_at")
+    drop_index(cursor, "item_requests", "idx_item_requests_active_created")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_fulfillments (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            item_request_id INT NOT NULL,
+            donation_id INT NOT NULL,
+            user_id INT NOT NULL,
+            quantity INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_item_fulfillments_donation (donation_id),
+            INDEX idx_item_fulfillments_request (item_request_id, created_at)
+        )
+    """)
+
+    conn.commit()
+
+
+# Currency of every stored amount (see money.py). Existing rows were all
+# entered in rupees. The rollups keep one row per currency, so the column
+# joins their primary keys.
+def add_donation_currency(conn):
+    cursor = conn.cursor()
+
+    for table in ("donations", "recurring_donations", "bulk_send_recipients"):
+        add_column(cursor, table, "currency", "CHAR(3) NOT NULL DEFAULT 'INR'")
+
+    for table, bucket_col in (("donation_daily_rollup", "day"), ("donation_monthly_rollup", "month")):
+        if not column_exists(cursor, table, "currency"):
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                ADD COLUMN currency CHAR(3) NOT NULL DEFAULT 'INR' AFTER donation_type,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (user_id, organization_id, {bucket_col}, donation_type, currency)
+            """)
+
+    conn.commit()
+
+
+# Date range scans for rollups.reconcile()
+def add_rollup_reconcile_index(conn):
+    cursor = conn.cursor()
+    add_index(cursor, "donations", "idx_donations_date", "date")
+    conn.commit()
+
+
+# Fulfillment rows go with their item request, and is_active is left to
+# the organization: fully fulfilled requests are closed by is_open alone.
+# Requests that fulfillment had deactivated are switched back on; they
+# stay closed because nothing remains.
+def add_item_fulfillment_cascade(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        DELETE f FROM item_fulfillments f
+        LEFT JOIN item_requests r ON r.id = f.item_request_id
+        WHERE r.id IS NULL
+    """)
+    if not foreign_key_exists(cursor, "item_fulfillments", "fk_item_fulfillments_request"):
+        cursor.execute("""
+            ALTER TABLE item_fulfillments
+            ADD CONSTRAINT fk_item_fulfillments_request
+            FOREIGN KEY (item_request_id) REFERENCES item_requests (id) ON DELETE CASCADE
+        """)
+    cursor.execute("UPDATE item_requests SET is_active = TRUE WHERE quantity_remaining = 0 AND is_active = FALSE")
+
+    conn.commit()
+
+
+# Accounts created with a temporary password must choose their own at
+# the next login (auth.change_password clears the flag). Organizations
+# imported earlier still hold a cheap 1000-iteration temporary hash.
+def add_must_change_password(conn):
+    cursor = conn.cursor()
+
+    for table in ("users", "organizations"):
+        add_column(cursor, table, "must_change_password", "BOOLEAN NOT NULL DEFAULT FALSE")
+    cursor.execute("""
+        UPDATE organizations SET must_change_password = TRUE
+        WHERE password LIKE 'pbkdf2\\_sha256$1000$%'
+    """)
+
+    conn.commit()
+
+
+# Append only: a version number must never be reused or reordered
+MIGRATIONS = [
+    (1, create_base_tables),
+    (2, add_structured_metadata),
+    (3, backfill_structured_metadata),
+    (4, add_filter_pagination_indexes),
+    (5, add_feed_indexes),
+    (6, add_donation_rollups),
+    (7, add_recurring_scheduler),
+    (8, add_bulk_sends),
+    (9, add_outbox),
+    (10, add_hot_query_indexes),
+    (11, add_unique_emails),
+    (12, add_organization_audit),
+    (13, add_donation_idempotency),
+    (14, add_item_fulfillments),
+    (15, add_donation_currency),
+    (16, add_rollup_reconcile_index),
+    (17, add_item_fulfillment_cascade),
+    (18, add_must_change_password),
+]
+
+
+def ensure_version_table(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def applied_versions(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM schema_version")
+    versions = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return versions
+
+
+def migrate(target=None):
+    with connection() as conn:
+        ensure_version_table(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Another migration run holds the lock; try again once it finishes")
+        try:
+            # Read under the lock, so steps applied by a concurrent run are skipped
+            applied = applied_versions(conn)
+            for version, step in MIGRATIONS:
+                if version in applied or (target is not None and version > target):
+                    continue
+                print(f"Applying {version}: {step.__name__}...")
+                step(conn)
+                cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                               (version, step.__name__))
+                conn.commit()
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    print("Schema is up to date.")
+
+
+def status():
+    with connection() as conn:
+        ensure_version_table(conn)
+        applied = applied_versions(conn)
+    for version, step in MIGRATIONS:
+        print(f"{'applied' if version in applied else 'pending':8} {version:3} {step.__name__}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the GiveBack database schema")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    parser.add_argument("--to", type=int, help="stop after this version")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        status()
+    else:
+        migrate(args.to)
@@ -0,0 +1,107 @@
+import os
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+
+# Money as integer minor units (paise, cents). The database keeps amounts
+# as DECIMAL(_, 2) next to a three-letter currency code; in Python they
+# are ints and in DataFrames int64 columns (loaders.read_columns with
+# minor_units=...), so totals are exact and formatting works on whole
+# columns instead of one Decimal per cell. Amounts in different currencies
+# are never added together: aggregates are kept per currency.
+
+SCALE = 2  # digits after the decimal point of stored amounts
+MINOR = 10 ** SCALE
+# Currency of new donations and of the amount inputs
+DEFAULT_CURRENCY = os.environ.get("GIVEBACK_CURRENCY", "INR")
+
+SYMBOLS = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£"}
+
+
+# Display prefix of a currency; codes without a symbol print as "CHF 12.00"
+def symbol(currency=DEFAULT_CURRENCY):
+    return SYMBOLS.get(currency, f"{currency} ")
+
+
+# Decimal, int, float or numeric string -> int minor units, rounded half
+# up. None counts as zero, like COALESCE(amount, 0).
+def to_minor(amount):
+    if amount is None:
+        return 0
+    return int((Decimal(str(amount)) * MINOR).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+# int minor units -> Decimal with SCALE places, for writing to the database
+def to_decimal(minor):
+    return Decimal(int(minor)).scaleb(-SCALE)
+
+
+# Minor units -> float major units, for charts only
+def to_major(minor):
+    return minor / MINOR
+
+
+def format_amount(minor, currency=DEFAULT_CURRENCY):
+    major, fraction = divmod(abs(int(minor)), MINOR)
+    sign = "-" if minor < 0 else ""
+    return f"{sign}{symbol(currency)}{major:,}.{fraction:0{SCALE}d}"
+
+
+# {currency: minor} -> "₹1,200.00 + $40.00"; zero in the default currency
+# when there is nothing to show
+def format_totals(totals):
+    if not totals:
+        return format_amount(0)
+    return " + ".join(format_amount(minor, currency) for currency, minor in sorted(totals.items()))
+
+
+# Digits of non-negative int64s with thousands separators. Works one
+# three-digit group at a time over the whole array: rows still in the loop
+# all have the same number of groups so far, so zfill to a common width
+# restores the zeros inside the group.
+def _group_thousands(major):
+    text = (major % 1000).astype("U")
+    rest = major // 1000
+    width = 3
+    while rest.any():
+        grouped = np.char.add(np.char.add((rest % 1000).astype("U"), ","), np.char.zfill(text, width))
+        text = np.where(rest > 0, grouped, text)
+        rest //= 1000
+        width += 4
+    return text
+
+
+# format_amount over a column: minor units (int64, or nullable Int64 with
+# NA -> None) and one currency code or a column of them. Returns an object
+# array of strings.
+def format_minor(minor, currencies=DEFAULT_CURRENCY):
+    values = pd.array(minor, dtype="Int64")
+    missing = np.asarray(values.isna())
+    minor = values.to_numpy(dtype=np.int64, na_value=0)
+    major, fraction = np.divmod(np.abs(minor), MINOR)
+
+    codes = pd.Series(np.broadcast_to(np.asarray(currencies, dtype=object), minor.shape))
+    symbols = codes.map(SYMBOLS)
+    symbols = symbols.where(symbols.notna(), codes + " ").to_numpy(dtype="U")
+
+    text = np.char.add(np.where(minor < 0, "-", ""), symbols)
+    text = np.char.add(text, _group_thousands(major))
+    text = np.char.add(np.char.add(text, "."), np.char.zfill(fraction.astype("U"), SCALE))
+    text = text.astype(object)
+    text[missing] = None
+    return text
+
+
+# Exact totals of a column of minor units per currency: {currency: int}
+def totals_by_currency(minor, currencies):
+    sums = pd.Series(np.asarray(minor, dtype=np.int64)).groupby(np.asarray(currencies)).sum()
+    return {currency: int(total) for currency, total in sums.items()}
+
+
+# Long rows (index, currency, minor amount) -> one column of major units
+# per currency, for charts
+def pivot_currencies(frame, index, amount="amount"):
+    wide = frame.pivot_table(index=index, columns="currency", values=amount, aggfunc="sum", fill_value=0)
+    wide.columns.name = None
+    return to_major(wide)
@@ -0,0 +1,162 @@
+import csv
+import io
+
+from cache import invalidate
+from loaders import read_columns
+from outbox import enqueue_email
+from principal import ORGANIZATION, invalidate_principal
+
+# Admin actions on organizations. Each action runs as one set-based
+# statement over any number of organizations, writes one audit row per
+# organization it changed and commits once, whether it came from a single
+# button, a multi-select or a batch review CSV.
+
+CHUNK_SIZE = 1000
+REJECTION_SUBJECT = "Your GiveBack registration"
+DEFAULT_REJECTION = "Your organization's registration was not approved."
+
+# action -> (rows it applies to, change); a change of None deletes the rows
+ACTIONS = {
+    "approve": ("is_approved = FALSE", "is_approved = TRUE, is_active = TRUE"),
+    "reject": ("is_approved = FALSE", None),
+    "activate": ("is_approved = TRUE AND is_active = FALSE", "is_active = TRUE"),
+    "deactivate": ("is_approved = TRUE AND is_active = TRUE", "is_active = FALSE"),
+    "delete": ("TRUE", None),
+}
+REVIEW_COLUMNS = ["email", "action", "note"]
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _placeholders(items):
+    return ", ".join(["%s"] * len(items))
+
+
+# Apply an action inside the caller's transaction; returns the rows it
+# changed. notes maps organization id -> note for the audit record (and,
+# for rejections, the email sent to the organization).
+def _apply(conn, action, org_ids, notes, source):
+    applies_to, change = ACTIONS[action]
+    cursor = conn.cursor(dictionary=True)
+    changed = []
+    for chunk in _chunks(sorted(set(org_ids))):
+        cursor.execute(f"""
+            SELECT id, org_name, email FROM organizations
+            WHERE id IN ({_placeholders(chunk)}) AND {applies_to}
+            FOR UPDATE
+        """, chunk)
+        rows = cursor.fetchall()
+        if not rows:
+            continue
+        ids = [row["id"] for row in rows]
+        if change is None:
+            cursor.execute(f"DELETE FROM organizations WHERE id IN ({_placeholders(ids)})", ids)
+        else:
+            cursor.execute(f"UPDATE organizations SET {change} WHERE id IN ({_placeholders(ids)})", ids)
+        changed.extend(rows)
+
+    if changed:
+        cursor.executemany("""
+            INSERT INTO organization_audit (organization_id, org_name, email, action, note, source)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [(row["id"], row["org_name"], row["email"], action, notes.get(row["id"]), source)
+              for row in changed])
+    if action == "reject":
+        for row in changed:
+            enqueue_email(conn, row["email"], REJECTION_SUBJECT, notes.get(row["id"]) or DEFAULT_REJECTION)
+    return changed
+
+
+def _invalidate(changed):
+    if changed:
+        invalidate("organizations")
+    for row in changed:
+        invalidate_principal(ORGANIZATION, row["id"])
+
+
+# Run one action over a set of organizations and commit. Organizations not
+# in a state the action applies to are left alone; returns those changed.
+def apply_action(conn, action, org_ids, note=None, source="dashboard"):
+    conn.commit()
+    conn.start_transaction()
+    try:
+        changed = _apply(conn, action, org_ids, {org_id: note for org_id in org_ids}, source)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _invalidate(changed)
+    return changed
+
+
+# Read a batch review CSV (email, action, optional note); returns
+# [(line number, email, action, note)]
+def read_review_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in ("email", "action") if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    return [(reader.line_num, (row.get("email") or "").strip(), (row.get("action") or "").strip().lower(),
+             (row.get("note") or "").strip() or None) for row in reader]
+
+
+# Apply a batch review in one transaction: each action is one set-based
+# statement over all rows requesting it. Returns (changed count by action,
+# [(line, email, error)] for rows that were not applied).
+def apply_review(conn, rows, source="csv"):
+    errors = []
+    requested = {}
+    for line, email, action, note in rows:
+        if action not in ACTIONS:
+            errors.append((line, email, f"Unknown action '{action}'; use one of: {', '.join(ACTIONS)}"))
+        elif email.lower() in requested:
+            errors.append((line, email, "Organization appears more than once in this file"))
+        else:
+            requested[email.lower()] = (line, email, action, note)
+
+    cursor = conn.cursor()
+    ids = {}
+    emails = list(requested)
+    for chunk in _chunks(emails):
+        cursor.execute(f"SELECT LOWER(email), id FROM organizations WHERE email IN ({_placeholders(chunk)})", chunk)
+        ids.update(cursor.fetchall())
+    conn.commit()
+
+    by_action = {}
+    for key, (line, email, action, note) in requested.items():
+        if key not in ids:
+            errors.append((line, email, "No organization with this email"))
+        else:
+            by_action.setdefault(action, []).append((ids[key], line, email, note))
+
+    conn.start_transaction()
+    try:
+        changed = {}
+        for action, entries in by_action.items():
+            rows_changed = _apply(conn, action, [org_id for org_id, _, _, _ in entries],
+                                  {org_id: note for org_id, _, _, note in entries}, source)
+            changed[action] = rows_changed
+            done = {row["id"] for row in rows_changed}
+            errors.extend((line, email, f"Cannot {action} an organization in its current state")
+                          for org_id, line, email, _ in entries if org_id not in done)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for rows_changed in changed.values():
+        _invalidate(rows_changed)
+    return {action: len(rows_changed) for action, rows_changed in changed.items()}, sorted(errors)
+
+
+# Columns for pd.DataFrame, newest first
+def recent_audit(conn, limit=100):
+    return read_columns(conn, """
+        SELECT created_at, action, org_name, email, note, source
+        FROM organization_audit
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """, (limit,))
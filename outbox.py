@@ -0,0 +1,325 @@
+import argparse
+import json
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+from bulk_messaging import resume_send
+from db import connection
+
+# Transactional outbox for everything the app sends. Pages enqueue a row in
+# the same transaction as the change that triggers it and return at once;
+# worker threads claim due rows with FOR UPDATE SKIP LOCKED, deliver them
+# through a pluggable backend under a rate limit, and retry failures with
+# exponential backoff. A claimed row is leased: if its worker dies, the row
+# becomes due again once the lease runs out, so delivery is at-least-once.
+# Delivered rows are purged once they are RETENTION_DAYS old; failed rows
+# stay for inspection.
+#     python outbox.py                  # run the worker pool
+#     python outbox.py --once           # drain what is due and exit
+#     python outbox.py --purge          # delete old delivered rows and exit
+
+BACKEND = os.environ.get("GIVEBACK_OUTBOX_BACKEND", "file")
+MAIL_DIR = os.environ.get("GIVEBACK_OUTBOX_DIR", "outbox_mail")
+SMTP_HOST = os.environ.get("GIVEBACK_SMTP_HOST", "localhost")
+SMTP_PORT = int(os.environ.get("GIVEBACK_SMTP_PORT", "1025"))
+MAIL_FROM = os.environ.get("GIVEBACK_MAIL_FROM", "GiveBack <noreply@giveback.local>")
+# Messages per second handed to the backend, shared by all workers of a process
+RATE_LIMIT = float(os.environ.get("GIVEBACK_OUTBOX_RATE", "20"))
+WORKERS = int(os.environ.get("GIVEBACK_OUTBOX_WORKERS", "2"))
+RETENTION_DAYS = int(os.environ.get("GIVEBACK_OUTBOX_RETENTION_DAYS", "7"))
+
+BATCH_SIZE = 20
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+POLL_INTERVAL = 2
+FANOUT_CHUNK = 500
+PURGE_INTERVAL = 3600
+PURGE_BATCH = 5000
+
+
+def build_message(recipient, subject, body):
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+# Local stand-in: every message becomes an .eml file in MAIL_DIR
+class FileBackend:
+    def __init__(self, directory=MAIL_DIR):
+        self.directory = directory
+
+    def send(self, recipient, subject, body):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.time_ns()}-{threading.get_ident()}.eml")
+        with open(path, "wb") as f:
+            f.write(bytes(build_message(recipient, subject, body)))
+
+
+# Plain SMTP; the defaults point at a local debugging server such as
+# `python -m aiosmtpd -n -l localhost:1025`
+class SMTPBackend:
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT):
+        self.host = host
+        self.port = port
+
+    def send(self, recipient, subject, body):
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            smtp.send_message(build_message(recipient, subject, body))
+
+
+BACKENDS = {"file": FileBackend, "smtp": SMTPBackend}
+
+
+def get_backend(name=BACKEND):
+    return BACKENDS[name]()
+
+
+# Token bucket; a rate of 0 or less disables limiting
+class RateLimiter:
+    def __init__(self, rate=RATE_LIMIT):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Queue a job. Does not commit: the caller commits it together with the
+# change that caused it.
+def enqueue(conn, kind, payload, recipient=None):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO outbox (kind, recipient, payload)
+        VALUES (%s, %s, %s)
+    """, (kind, recipient, json.dumps(payload, default=str)))
+    return cursor.lastrowid
+
+
+def enqueue_email(conn, recipient, subject, body):
+    return enqueue(conn, "email", {"subject": subject, "body": body}, recipient)
+
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+@handler("email")
+def deliver_email(conn, job, payload, backend, limiter):
+    limiter.acquire()
+    backend.send(job["recipient"], payload["subject"], payload["body"])
+
+
+# Post an emergency update to the feed of every donor of the emergency's
+# organization and queue an email to each of them. Runs in the worker's
+# transaction, so the whole fan-out commits together with the job.
+@handler("emergency_broadcast")
+def fan_out_emergency_broadcast(conn, job, payload, backend, limiter):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT organization_id, title FROM emergencies WHERE id = %s", (payload["emergency_id"],))
+    emergency = cursor.fetchone()
+    if not emergency:
+        return
+
+    cursor.execute("""
+        SELECT u.id, u.email
+        FROM users u
+        WHERE u.id IN (SELECT DISTINCT user_id FROM donations WHERE organization_id = %s)
+    """, (emergency["organization_id"],))
+    donors = cursor.fetchall()
+
+    message = f"Update on {emergency['title']}: {payload['message']}"
+    email = json.dumps({"subject": f"Update: {emergency['title']}", "body": payload["message"]})
+    for start in range(0, len(donors), FANOUT_CHUNK):
+        chunk = donors[start:start + FANOUT_CHUNK]
+        cursor.executemany("""
+            INSERT INTO donation_updates (user_id, organization_id, message)
+            VALUES (%s, %s, %s)
+        """, [(donor["id"], emergency["organization_id"], message) for donor in chunk])
+        cursor.executemany("""
+            INSERT INTO outbox (kind, recipient, payload)
+            VALUES ('email', %s, %s)
+        """, [(donor["email"], email) for donor in chunk if donor["email"]])
+
+
+@handler("bulk_send")
+def deliver_bulk_send(conn, job, payload, backend, limiter):
+    resume_send(conn, payload["bulk_send_id"])
+
+
+# Claim up to batch_size due jobs and lease them to this worker
+def claim(conn, batch_size=BATCH_SIZE):
+    cursor = conn.cursor(dictionary=True)
+    conn.start_transaction()
+    cursor.execute("""
+        SELECT id, kind, recipient, payload, attempts
+        FROM outbox
+        WHERE status IN ('pending', 'sending') AND next_attempt_at <= NOW()
+        ORDER BY next_attempt_at, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (batch_size,))
+    jobs = cursor.fetchall()
+    if jobs:
+        cursor.execute(f"""
+            UPDATE outbox
+            SET status = 'sending', attempts = attempts + 1,
+                next_attempt_at = NOW() + INTERVAL %s SECOND
+            WHERE id IN ({', '.join(['%s'] * len(jobs))})
+        """, [LEASE_SECONDS] + [job["id"] for job in jobs])
+    conn.commit()
+    return jobs
+
+
+def process(conn, job, backend, limiter):
+    cursor = conn.cursor()
+    try:
+        HANDLERS[job["kind"]](conn, job, json.loads(job["payload"]), backend, limiter)
+        cursor.execute("""
+            UPDATE outbox SET status = 'sent', sent_at = NOW(), last_error = NULL
+            WHERE id = %s
+        """, (job["id"],))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        attempts = job["attempts"] + 1
+        backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+        cursor.execute("""
+            UPDATE outbox
+            SET status = %s, next_attempt_at = NOW() + INTERVAL %s SECOND, last_error = %s
+            WHERE id = %s
+        """, ("failed" if attempts >= MAX_ATTEMPTS else "pending", backoff, str(e)[:1000], job["id"]))
+        conn.commit()
+        return False
+
+
+# Claim and process batches until nothing is due; returns jobs processed
+def drain(backend, limiter, batch_size=BATCH_SIZE):
+    processed = 0
+    with connection() as conn:
+        while True:
+            jobs = claim(conn, batch_size)
+            for job in jobs:
+                process(conn, job, backend, limiter)
+            processed += len(jobs)
+            if len(jobs) < batch_size:
+                return processed
+
+
+# Delete delivered rows older than `days` in short batches, so the purge
+# never holds locks long enough to stall the workers; returns rows deleted
+def purge_sent(days=RETENTION_DAYS, batch_size=PURGE_BATCH):
+    deleted = 0
+    with connection() as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("""
+                DELETE FROM outbox
+                WHERE status = 'sent' AND sent_at < NOW() - INTERVAL %s DAY
+                LIMIT %s
+            """, (days, batch_size))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+
+
+_purged_at = 0.0
+_purge_lock = threading.Lock()
+
+
+# Purge from whichever worker of the process gets here first each interval
+def purge_if_due(interval=PURGE_INTERVAL):
+    global _purged_at
+    with _purge_lock:
+        if time.monotonic() - _purged_at < interval:
+            return 0
+        _purged_at = time.monotonic()
+    return purge_sent()
+
+
+def work(backend, limiter, batch_size=BATCH_SIZE, interval=POLL_INTERVAL):
+    while True:
+        try:
+            drain(backend, limiter, batch_size)
+            purge_if_due()
+        except Exception as e:
+            print(f"Outbox worker failed: {e}")
+        time.sleep(interval)
+
+
+def start_workers(count=WORKERS, backend=None):
+    backend = backend or get_backend()
+    limiter = RateLimiter()
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(target=work, args=(backend, limiter), name=f"outbox-worker-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+_workers = []
+_workers_lock = threading.Lock()
+
+
+# Deliver from inside the Streamlit server when no separate
+# `python outbox.py` worker is deployed. Starts one pool per process.
+def ensure_workers(count=WORKERS):
+    global _workers
+    with _workers_lock:
+        if not any(thread.is_alive() for thread in _workers):
+            _workers = start_workers(count)
+
+
+def outbox_stats(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT status, COUNT(*) as count FROM outbox GROUP BY status")
+    stats = {"pending": 0, "sending": 0, "sent": 0, "failed": 0}
+    stats.update({row["status"]: row["count"] for row in cursor.fetchall()})
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver queued outbound messages")
+    parser.add_argument("--once", action="store_true", help="deliver everything due and exit")
+    parser.add_argument("--purge", action="store_true", help="delete delivered rows past retention and exit")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker threads")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND, help="delivery backend")
+    args = parser.parse_args()
+
+    if args.purge:
+        print(f"Purged {purge_sent()} delivered outbox rows older than {RETENTION_DAYS} days")
+    elif args.once:
+        print(f"Processed {drain(get_backend(args.backend), RateLimiter())} outbox jobs")
+    else:
+        for thread in start_workers(args.workers, get_backend(args.backend)):
+            thread.join()
@@ -1,5 +1,8 @@
 import streamlit as st
-from db import get_connection
+from passwords import HasherBusy
+from principal import ORGANIZATION, USER, client_address
+from signup import (GOV_ID_TYPES, EmailTaken, TooManyEmailChecks, create_account, email_available, valid_email,
+                    validate)
 
 # Page configuration
 st.set_page_config(page_title="Sign Up", page_icon="📝", layout="centered")
@@ -9,6 +12,8 @@ if "signup_data" not in st.session_state:
     st.session_state.signup_data = {}
 if "signup_success" not in st.session_state:
     st.session_state.signup_success = False
+if "signup_email" not in st.session_state:
+    st.session_state.signup_email = st.session_state.signup_data.get("email", "")
 
 st.title("Create Your Account")
 st.caption("Join our platform to get started")
@@ -22,25 +27,42 @@ if not st.session_state.signup_success:
         horizontal=True,
         help="Select whether you're signing up as an individual or an organization"
     )
+    kind = USER if signup_type == "User" else ORGANIZATION
+
+    # The email lives outside the form so its availability can be checked
+    # as soon as it changes; only this fragment reruns for the check
+    @st.fragment
+    def email_field():
+        email = st.text_input(
+            "Email*" if kind == USER else "Organization Email*",
+            key="signup_email",
+            help="We'll use this for account communication" if kind == USER
+                 else "Official contact email for the organization"
+        )
+        if email.strip():
+            if not valid_email(email):
+                st.caption(":red[Please enter a valid email address]")
+            else:
+                try:
+                    available = email_available(kind, email, client_address())
+                except TooManyEmailChecks as e:
+                    st.caption(str(e))
+                else:
+                    if available:
+                        st.caption(":green[✅ This email is available]")
+                    else:
+                        st.caption(":red[❌ This email is already registered]")
+
+    email_field()
 
     with st.form("signup_form"):
         if signup_type == "User":
             st.subheader("User Information")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                name = st.text_input(
-                    "Full Name*",
-                    value=st.session_state.signup_data.get("name", ""),
-                    help="Your full name as it should appear on your account"
-                )
-                
-            with col2:
-                email = st.text_input(
-                    "Email*",
-                    value=st.session_state.signup_data.get("email", ""),
-                    help="We'll use this for account communication"
-                )
+            name = st.text_input(
+                "Full Name*",
+                value=st.session_state.signup_data.get("name", ""),
+                help="Your full name as it should appear on your account"
+            )
             
             password = st.text_input(
                 "Password*",
@@ -69,12 +91,6 @@ if not st.session_state.signup_success:
                 help="The official name of your organization"
             )
             
-            email = st.text_input(
-                "Organization Email*",
-                value=st.session_state.signup_data.get("email", ""),
-                help="Official contact email for the organization"
-            )
-            
             password = st.text_input(
                 "Password*",
                 type="password",
@@ -103,8 +119,7 @@ if not st.session_state.signup_success:
             
             gov_id_type = st.selectbox(
                 "Government ID Type*",
-                ["Aadhaar Card", "PAN Card", "Passport", "Driver's License", 
-                 "Voter ID", "Business Registration", "Other"],
+                GOV_ID_TYPES,
                 index=0,
                 help="Select the type of government-issued ID"
             )
@@ -136,74 +151,45 @@ if not st.session_state.signup_success:
         )
         
         if submitted:
-            # Validate required fields
-            required_fields = []
-            
+            email = st.session_state.signup_email
             if signup_type == "User":
-                if not name: required_fields.append("Full Name")
-                if not email: required_fields.append("Email")
-                if not password: required_fields.append("Password")
+                fields = {"name": name, "email": email, "password": password,
+                          "address": address, "phone": phone}
             else:
-                if not org_name: required_fields.append("Organization Name")
-                if not email: required_fields.append("Email")
-                if not password: required_fields.append("Password")
-                if not address: required_fields.append("Organization Address")
-                if not phone: required_fields.append("Contact Phone")
-                if not gov_id_number: required_fields.append("Government ID Number")
+                fields = {"org_name": org_name, "email": email, "password": password,
+                          "description": description, "address": address, "phone": phone,
+                          "gov_id_type": gov_id_type, "gov_id_number": gov_id_number}
+            
+            # Validate required fields
+            errors = validate(kind, fields)
             
             if not agree_to_terms:
                 st.error("You must agree to the Terms of Service and Privacy Policy")
-            elif required_fields:
-                st.error(f"Please fill in all required fields: {', '.join(required_fields)}")
+            elif errors:
+                for error in errors:
+                    st.error(error)
             else:
                 # Save form data to session
-                form_data = {
-                    "name" if signup_type == "User" else "org_name": name if signup_type == "User" else org_name,
-                    "email": email,
-                    "address": address,
-                    "phone": phone,
-                    "agree_to_terms": agree_to_terms
-                }
-                
-                if signup_type == "Organization":
-                    form_data.update({
-                        "description": description,
-                        "gov_id_number": gov_id_number
-                    })
-                
+                form_data = {key: value for key, value in fields.items() if key not in ("password", "gov_id_type")}
+                form_data["agree_to_terms"] = agree_to_terms
                 st.session_state.signup_data = form_data
                 
                 try:
-                    conn = get_connection()
-                    cursor = conn.cursor()
-                    
+                    create_account(kind, fields)
                     if signup_type == "User":
-                        cursor.execute("""
-                            INSERT INTO users (name, email, password, address, phone)
-                            VALUES (%s, %s, %s, %s, %s)
-                        """, (name, email, password, address, phone))
                         success_message = "User account created successfully!"
                     else:
-                        cursor.execute("""
-                            INSERT INTO organizations 
-                            (org_name, email, password, description, address, phone, gov_id_type, gov_id_number)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (org_name, email, password, description, address, phone, gov_id_type, gov_id_number))
                         success_message = """Organization account created successfully! 
                                           Your account will be activated after verification."""
                     
-                    conn.commit()
-                    conn.close()
-                    
                     st.session_state.signup_success = True
                     st.session_state.success_message = success_message
                     st.rerun()  # This will refresh the page and show the success state
                     
+                except (EmailTaken, HasherBusy) as e:
+                    st.error(str(e))
                 except Exception as e:
-                    if "email" in str(e).lower():
-                        st.error("This email is already registered. Please use a different email.")
-                    else:
-                        st.error(f"An error occurred: {str(e)}")
+                    st.error(f"An error occurred: {str(e)}")
 
 # Show success message if we've had a successful submission
 else:
@@ -216,6 +202,7 @@ else:
     if st.button("Create Another Account"):
         st.session_state.signup_success = False
         st.session_state.signup_data = {}
+        st.session_state.signup_email = ""
         st.rerun()
 
 # Add footer links
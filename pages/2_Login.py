@@ -1,5 +1,10 @@
 import streamlit as st
-from db import get_connection
+from db import connection
+from auth import DEACTIVATED, INVALID, OK, PENDING, authenticate, change_password
+from passwords import HasherBusy
+from rate_limit import login_limiter
+from principal import ORGANIZATION, USER, client_address, current_principal, login, logout
+from signup import MIN_PASSWORD_LENGTH
 
 # Page configuration
 st.set_page_config(page_title="Login", page_icon="🔐", layout="centered")
@@ -53,15 +58,20 @@ def main():
                 st.error("Please fill in all fields")
                 return
             
-            conn = get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            if login_type == "User":
-                handle_user_login(cursor, email, password)
-            else:
-                handle_org_login(cursor, email, password)
+            # Throttled attempts are turned away before touching the database
+            wait = login_limiter.check(email, client_address())
+            if wait:
+                st.error(f"🚫 Too many login attempts. Please try again in {max(1, round(wait / 60))} minute(s).")
+                return
             
-            conn.close()
+            try:
+                with connection() as conn:
+                    if login_type == "User":
+                        handle_user_login(conn, email, password)
+                    else:
+                        handle_org_login(conn, email, password)
+            except HasherBusy as e:
+                st.error(f"⏳ {e}")
 
     # Additional options
     col1, col2 = st.columns(2)
@@ -72,68 +82,104 @@ def main():
         if st.button("Create Account"):
             st.switch_page("pages/1_Sign_Up.py")  # Assuming you have a registration page
 
+# Run one login attempt and feed its outcome to the rate limiter
+def check_credentials(conn, kind, email, password):
+    result = authenticate(conn, kind, email, password)
+    if result.status == INVALID:
+        login_limiter.failure(email)
+    else:
+        login_limiter.success(email)
+    return result
+
+# Log in an authenticated account, or hold it until it has replaced a
+# temporary password (see change_password_form)
+def complete_login(kind, account):
+    if account["must_change_password"]:
+        st.session_state.password_change = (kind, account["id"], account["name"])
+    else:
+        login(kind, account["id"])
+    st.rerun()  # Refresh to show logged-in state
+
+# New password for an account that signed in with a temporary one; the
+# account is only logged in once it has been saved
+def change_password_form():
+    kind, account_id, name = st.session_state.password_change
+    st.title("🔑 Choose a New Password")
+    st.info(f"{name}, you signed in with a temporary password. Please choose your own to continue.")
+    
+    with st.form("change_password_form"):
+        password = st.text_input("New Password", type="password")
+        confirm = st.text_input("Confirm New Password", type="password")
+        submitted = st.form_submit_button("Save Password", type="primary")
+        
+        if submitted:
+            if len(password) < MIN_PASSWORD_LENGTH:
+                st.error(f"Password must be at least {MIN_PASSWORD_LENGTH} characters")
+                return
+            if password != confirm:
+                st.error("Passwords do not match")
+                return
+            try:
+                with connection() as conn:
+                    change_password(conn, kind, account_id, password)
+            except HasherBusy as e:
+                st.error(f"⏳ {e}")
+                return
+            del st.session_state.password_change
+            login(kind, account_id)
+            st.rerun()
+    
+    if st.button("Cancel"):
+        del st.session_state.password_change
+        st.rerun()
+
 # Handle user login
-def handle_user_login(cursor, email, password):
-    cursor.execute("SELECT * FROM users WHERE email=%s AND password=%s", (email, password))
-    user = cursor.fetchone()
+def handle_user_login(conn, email, password):
+    result = check_credentials(conn, USER, email, password)
     
-    if user:
-        st.success(f"👋 Welcome back, {user['name']}!")
-        st.session_state.user = user
-        st.session_state.user_type = "User"
-        st.session_state.user_id = user["id"]
-        st.rerun()  # Refresh to show logged-in state
+    if result.status == OK:
+        st.success(f"👋 Welcome back, {result.account['name']}!")
+        complete_login(USER, result.account)
     else:
         st.error("❌ Invalid email or password for user account")
 
 # Handle organization login
-def handle_org_login(cursor, email, password):
-    cursor.execute("""
-        SELECT * FROM organizations 
-        WHERE email=%s AND password=%s AND is_approved=1
-    """, (email, password))
-    organization = cursor.fetchone()
+def handle_org_login(conn, email, password):
+    result = check_credentials(conn, ORGANIZATION, email, password)
     
-    if organization:
-        if not organization["is_active"]:
-            st.error("⛔ Your organization account has been deactivated")
-            return
-            
-        st.success(f"🏢 Welcome, {organization['org_name']}!")
-        st.session_state.organization = organization
-        st.session_state.user_type = "Organization"
-        st.session_state.organization_id = organization["id"]
-        st.rerun()  # Refresh to show logged-in state
+    if result.status == OK:
+        st.success(f"🏢 Welcome, {result.account['name']}!")
+        complete_login(ORGANIZATION, result.account)
+    elif result.status == PENDING:
+        st.error("⏳ Your organization registration is pending approval")
+    elif result.status == DEACTIVATED:
+        st.error("⛔ Your organization account has been deactivated")
     else:
-        cursor.execute("SELECT * FROM organizations WHERE email=%s", (email,))
-        exists = cursor.fetchone()
-        
-        if exists:
-            if not exists["is_approved"]:
-                st.error("⏳ Your organization registration is pending approval")
-            else:
-                st.error("❌ Invalid password for organization account")
-        else:
-            st.error("❌ No organization found with this email")
+        st.error("❌ Invalid email or password for organization account")
 
 
 # Show different content if already logged in
-if st.session_state.get("user"):
-    st.success(f"✅ You're logged in as User: {st.session_state.user['name']}")
+principal = current_principal()
+if principal and principal.kind == USER:
+    st.success(f"✅ You're logged in as User: {principal.name}")
     if st.button("Logout"):
-        st.session_state.clear()
+        logout()
         st.rerun()
         
-elif st.session_state.get("organization"):
-    org = st.session_state.organization
-    st.success(f"✅ You're logged in as Organization: {org['org_name']}")
+elif principal:
+    st.success(f"✅ You're logged in as Organization: {principal.name}")
     
     # Show organization status
-    status = "Approved ✅" if org["is_approved"] else "Pending Approval ⏳"
+    status = "Approved ✅" if principal.is_approved else "Pending Approval ⏳"
     st.info(f"Organization Status: {status}")
     
     if st.button("Logout"):
-        st.session_state.clear()
+        logout()
         st.rerun()
+elif "password_change" in st.session_state:
+    change_password_form()
 else:
+    reason = st.session_state.pop("logged_out_reason", None)
+    if reason:
+        st.warning(reason)
     main()
\ No newline at end of file
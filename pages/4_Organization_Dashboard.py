@@ -1,437 +1,477 @@
 import streamlit as st
-import pandas as pd
 import datetime
-from db import get_connection
+from db import connection
+from cache import invalidate
+from bulk_messaging import create_send, donation_amount, render_message, unfinished_sends, unique_recipients
+from outbox import enqueue, ensure_workers
+from pagination import current_cursor, fetch_page, pager
+from rollups import ensure_background_refresh
+from exports import export_controls
+from loaders import read_columns
+from money import format_amount, format_minor, format_totals, pivot_currencies, to_minor
+from profiling import start_page
+from principal import ORGANIZATION, donation_totals, require_principal
+from metadata import (
+    EMERGENCY_DURATIONS, EMERGENCY_RADII, EMERGENCY_TYPES, EMERGENCY_URGENCY_COLORS,
+    EMERGENCY_URGENCY_LEVELS, ITEM_CATEGORIES, ITEM_TAGS, ITEM_URGENCY_COLORS,
+    ITEM_URGENCY_LEVELS, urgency_badge
+)
 
 st.set_page_config(page_title="Organization Dashboard", layout="wide")
 st.title("🏢 Organization Dashboard")
 
-if "organization" not in st.session_state:
-    st.error("You need to be logged in as an organization to view the dashboard.")
-    st.stop()
+principal = require_principal(ORGANIZATION, "You need to be logged in as an organization to view the dashboard.")
+organization_id = principal.id
 
-# Database connection
-conn = get_connection()
-cursor = conn.cursor(dictionary=True)
+RECORDS_LIMIT = 100
+
+profiler = start_page("Organization Dashboard")
+
+ensure_background_refresh()
+ensure_workers()
 
 # **Donation Analytics Dashboard**
-st.subheader("📊 Donation Analytics")
-
-organization_id = st.session_state["organization"]["id"]
-
-# Fetch donation data including user information
-cursor.execute("""
-    SELECT d.date, d.amount, d.donation_type, d.item_description,
-           u.name as donor_name, u.email as donor_email
-    FROM donations d
-    LEFT JOIN users u ON d.user_id = u.id
-    WHERE d.organization_id = %s 
-    ORDER BY d.date DESC
-""", (organization_id,))
-donations = cursor.fetchall()
-
-if donations:
-    # Create DataFrame with better formatting
-    df_donations = pd.DataFrame(donations)
-    df_donations['date'] = pd.to_datetime(df_donations['date'])
-    df_donations['amount'] = pd.to_numeric(df_donations['amount'], errors='coerce').fillna(0)
-    df_donations['donation_type'] = df_donations['donation_type'].str.capitalize()
-    
-    # Calculate summary stats
-    total_donated = df_donations['amount'].sum()
-    money_donations = df_donations[df_donations['donation_type'] == 'Money']
-    item_donations = df_donations[df_donations['donation_type'] == 'Item']
-    money_count = len(money_donations)
-    item_count = len(item_donations)
-    
-    # Create two columns for layout
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("### 💰 Monthly Donations")
-        
-        if not money_donations.empty:
-            # Resample by month and sum amounts
-            monthly_money = money_donations.set_index('date').resample('M')['amount'].sum()
+@st.fragment
+@profiler.fragment("Donation Analytics")
+def donation_analytics():
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+
+        st.subheader("📊 Donation Analytics")
+
+        # Totals and the monthly chart are read from the donation rollups
+        # (rollups.py); only the latest donation and the recent records table
+        # touch the donations table, both through idx_donations_org_date
+        totals = donation_totals(principal, conn)
+
+        cursor.execute("""
+            SELECT date, COALESCE(amount, 0) AS amount, currency, donation_type
+            FROM donations
+            WHERE organization_id = %s
+            ORDER BY date DESC
+            LIMIT 1
+        """, (organization_id,))
+        last_donation = cursor.fetchone()
+
+        if last_donation:
+            # Calculate summary stats
+            money_totals = totals.get('money', {})
+            item_totals = totals.get('item', {})
+            money_count = int(money_totals.get('donation_count') or 0)
+            item_count = int(item_totals.get('donation_count') or 0)
+            money_total = money_totals.get('amounts', {})
+            
+            # Create two columns for layout
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("### 💰 Monthly Donations")
+                
+                monthly_money = profiler.frame(read_columns(conn, """
+                    SELECT month, currency, SUM(amount_total) as amount
+                    FROM donation_monthly_rollup
+                    WHERE organization_id = %s AND donation_type = 'money'
+                    GROUP BY month, currency
+                    ORDER BY month
+                """, (organization_id,), minor_units=("amount",)))
+                
+                if len(monthly_money):
+                    # One point per month and currency, including months without donations
+                    monthly_money = pivot_currencies(monthly_money, 'month').asfreq('MS', fill_value=0)
+                    
+                    # Create area chart with custom styling
+                    st.area_chart(monthly_money, height=300,
+                                  color="#4CAF50" if monthly_money.shape[1] == 1 else None)
+                else:
+                    st.info("No monetary donations received yet")
             
-            # Create area chart with custom styling
-            st.area_chart(monthly_money, color="#4CAF50", height=300)
+            with col2:
+                st.markdown("### 🎁 Donation Breakdown")
+                
+                # Metrics row
+                m1, m2 = st.columns(2)
+                with m1:
+                    st.metric("Total Money Donated", 
+                             format_totals(money_total),
+                             f"{money_count} donations")
+                with m2:
+                    st.metric("Item Donations Received", 
+                             f"{item_count} items",
+                             f"{int(item_totals.get('described_count') or 0)} described")
+                
+                # Horizontal bar chart showing counts
+                type_counts = profiler.frame(
+                    [(donation_type.capitalize(), int(row['donation_count'])) for donation_type, row in totals.items()],
+                    columns=['Type', 'Count']
+                )
+                st.bar_chart(type_counts.set_index('Type'), height=200, color="#FF9800")
+            
+            # Top summary metrics
+            st.markdown("---")
+            st.markdown("### 📈 Summary Statistics")
+            stat1, stat2, stat3, stat4 = st.columns(4)
+            with stat1:
+                st.metric("Total Value Received", format_totals(money_total))
+            with stat2:
+                # Averaged within each currency, rounded half up in whole minor units
+                money_counts = money_totals.get('counts', {})
+                avg_donation = {currency: (2 * amount + money_counts[currency]) // (2 * money_counts[currency])
+                                for currency, amount in money_total.items() if money_counts.get(currency)}
+                st.metric("Average Donation", format_totals(avg_donation))
+            with stat3:
+                st.metric("Most Recent", 
+                         format_amount(to_minor(last_donation['amount']), last_donation['currency'])
+                         if last_donation['donation_type'] == 'money' 
+                         else "Item",
+                         last_donation['date'].strftime('%b %d, %Y'))
+            with stat4:
+                cursor.execute("""
+                    SELECT COUNT(DISTINCT user_id) as donor_count
+                    FROM donation_monthly_rollup
+                    WHERE organization_id = %s AND user_id <> 0
+                """, (organization_id,))
+                st.metric("Unique Donors", cursor.fetchone()['donor_count'])
+            
+            # Enhanced donation history table
+            with st.expander("🔍 View Detailed Donation Records", expanded=False):
+                display_df = profiler.frame(read_columns(conn, """
+                    SELECT d.date, COALESCE(d.amount, 0) AS amount, d.currency, d.donation_type, d.item_description,
+                           u.name as donor_name, u.email as donor_email
+                    FROM donations d
+                    LEFT JOIN users u ON d.user_id = u.id
+                    WHERE d.organization_id = %s 
+                    ORDER BY d.date DESC
+                    LIMIT %s
+                """, (organization_id, RECORDS_LIMIT), minor_units=("amount",)))
+                
+                # Format the display dataframe
+                display_df['amount'] = format_minor(display_df['amount'], display_df['currency'])
+                display_df.loc[display_df['donation_type'] != 'money', 'amount'] = "Item"
+                display_df['donation_type'] = display_df['donation_type'].str.capitalize()
+                display_df = display_df.rename(columns={
+                    'date': 'Date',
+                    'amount': 'Amount',
+                    'donation_type': 'Type',
+                    'donor_name': 'Donor Name',
+                    'donor_email': 'Donor Email',
+                    'item_description': 'Description'
+                })
+                
+                # Reorder and select columns
+                display_df = display_df[['Date', 'Type', 'Amount', 'Donor Name', 'Donor Email', 'Description']]
+                
+                # Display with nice formatting
+                st.dataframe(
+                    display_df,
+                    column_config={
+                        "Date": st.column_config.DatetimeColumn("Date", format="MMM D, YYYY"),
+                        "Donor Email": st.column_config.LinkColumn("Donor Email", display_text="📧")
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+                if len(display_df) == RECORDS_LIMIT:
+                    st.caption(f"Showing the {RECORDS_LIMIT} most recent donations")
+
+                st.markdown("#### Export Donation Ledger")
+                export_controls("organization", organization_id, conn)
         else:
-            st.info("No monetary donations received yet")
-    
-    with col2:
-        st.markdown("### 🎁 Donation Breakdown")
-        
-        # Metrics row
-        m1, m2 = st.columns(2)
-        with m1:
-            st.metric("Total Money Donated", 
-                     f"₹{money_donations['amount'].sum():,.2f}",
-                     f"{money_count} donations")
-        with m2:
-            st.metric("Item Donations Received", 
-                     f"{item_count} items",
-                     f"{len(item_donations[item_donations['item_description'].notna()])} described")
-        
-        # Horizontal bar chart showing counts
-        type_counts = df_donations['donation_type'].value_counts().reset_index()
-        type_counts.columns = ['Type', 'Count']
-        st.bar_chart(type_counts.set_index('Type'), height=200, color="#FF9800")
-    
-    # Top summary metrics
-    st.markdown("---")
-    st.markdown("### 📈 Summary Statistics")
-    stat1, stat2, stat3, stat4 = st.columns(4)
-    with stat1:
-        st.metric("Total Value Received", f"₹{total_donated:,.2f}")
-    with stat2:
-        avg_donation = money_donations['amount'].mean() if not money_donations.empty else 0
-        st.metric("Average Donation", f"₹{avg_donation:,.2f}")
-    with stat3:
-        last_donation = df_donations.iloc[0]
-        st.metric("Most Recent", 
-                 f"₹{last_donation['amount']:,.2f}" if last_donation['donation_type'] == 'Money' 
-                 else "Item",
-                 last_donation['date'].strftime('%b %d, %Y'))
-    with stat4:
-        unique_donors = df_donations['donor_email'].nunique()
-        st.metric("Unique Donors", unique_donors)
-    
-    # Enhanced donation history table
-    with st.expander("🔍 View Detailed Donation Records", expanded=False):
-        # Format the display dataframe
-        display_df = df_donations.copy()
-        display_df['amount'] = display_df['amount'].apply(lambda x: f"₹{x:,.2f}" if x > 0 else "Item")
-        display_df = display_df.rename(columns={
-            'date': 'Date',
-            'amount': 'Amount',
-            'donation_type': 'Type',
-            'donor_name': 'Donor Name',
-            'donor_email': 'Donor Email',
-            'item_description': 'Description'
-        })
-        
-        # Reorder and select columns
-        display_df = display_df[['Date', 'Type', 'Amount', 'Donor Name', 'Donor Email', 'Description']]
-        
-        # Display with nice formatting
-        st.dataframe(
-            display_df,
-            column_config={
-                "Date": st.column_config.DatetimeColumn("Date", format="MMM D, YYYY"),
-                "Donor Email": st.column_config.LinkColumn("Donor Email", display_text="📧")
-            },
-            hide_index=True,
-            use_container_width=True
-        )
-else:
-    st.info("🌟 Your organization hasn't received any donations yet. Share your cause to attract donors!")
-
-st.divider()
+            st.info("🌟 Your organization hasn't received any donations yet. Share your cause to attract donors!")
+
+        st.divider()
+
+
+profiler.section("Donation Analytics")
+donation_analytics()
+
 
 # **Item Donation Management**
-st.subheader("📦 Item Donation Requests")
-
-# Create a tabbed interface
-tab1, tab2 = st.tabs(["➕ Create New Request", "📋 Manage Requests"])
-
-with tab1:
-    with st.container(border=True):
-        st.markdown("### 🆕 New Item Request")
-        
-        # Item details
-        col1, col2 = st.columns(2)
-        with col1:
-            item_name = st.text_input("Item Name*", placeholder="e.g., Blankets, Rice Bags, Medicines")
-        with col2:
-            category = st.selectbox("Category*", 
-                                  ["Clothing", "Food", "Medical", "Educational", 
-                                   "Toys", "Furniture", "Electronics", "Other"])
-        
-        quantity = st.number_input("Quantity Needed*", min_value=1, value=10)
-        
-        # Enhanced description with formatting tips
-        with st.expander("📝 Item Description & Details"):
-            description = st.text_area(
-                "Describe the items you need (be specific):",
-                help="Include details like size, type, condition requirements, etc.",
-                height=150
-            )
-            
-            # Suggested tags
-            st.markdown("**Suggested tags (select relevant ones):**")
-            tags = st.multiselect(
-                "Tags (select up to 5)",
-                ["Winter", "Summer", "Children", "Elderly", "Emergency", 
-                 "New", "Used", "Urgent", "School", "Festival"],
-                max_selections=5,
-                label_visibility="collapsed"
-            )
-        
-        # Urgency and timeline
-        col1, col2 = st.columns(2)
-        with col1:
-            urgency = st.select_slider(
-                "Urgency Level",
-                options=["Low", "Medium", "High", "Critical"],
-                value="Medium"
-            )
-        with col2:
-            deadline = st.date_input(
-                "Needed By",
-                min_value=datetime.date.today(),
-                help="When do you need these items by?"
-            )
-        
-        # Image upload (simulated)
-        image_upload = st.checkbox("Add reference image (coming soon)")
-        if image_upload:
-            st.warning("Image upload feature will be available in the next update")
-        
-        if st.button("Submit Request", type="primary"):
-            if not item_name:
-                st.error("Please enter an item name")
-            else:
-                # Combine description with additional metadata
-                full_description = f"Category: {category}\n"
-                full_description += f"Tags: {', '.join(tags)}\n"
-                full_description += f"Urgency: {urgency}\n"
-                full_description += f"Deadline: {deadline}\n\n"
-                full_description += f"Details:\n{description}"
+@st.fragment
+@profiler.fragment("Item Requests")
+def item_requests():
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+
+        st.subheader("📦 Item Donation Requests")
+
+        # Create a tabbed interface
+        tab1, tab2 = st.tabs(["➕ Create New Request", "📋 Manage Requests"])
+
+        with tab1:
+            with st.container(border=True):
+                st.markdown("### 🆕 New Item Request")
                 
-                cursor.execute("""
-                    INSERT INTO item_requests 
-                    (organization_id, item_name, quantity, description)
-                    VALUES (%s, %s, %s, %s)
-                """, (organization_id, item_name, quantity, full_description))
-                conn.commit()
-                
-                st.success("🎉 Item request submitted successfully!")
-                st.toast("Donors will now see your request", icon="📤")
-
-with tab2:
-    st.markdown("### 📋 Your Active Requests")
-    
-    # Fetch all requests for this organization
-    cursor.execute("""
-        SELECT id, item_name, quantity, description, 
-               created_at, is_active
-        FROM item_requests
-        WHERE organization_id = %s
-        ORDER BY created_at DESC
-    """, (organization_id,))
-    requests = cursor.fetchall()
-    
-    if requests:
-        # Create filters
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            filter_active = st.selectbox(
-                "Status",
-                ["All", "Active Only", "Inactive Only"]
-            )
-        with col2:
-            filter_urgency = st.selectbox(
-                "Urgency",
-                ["All", "Critical", "High", "Medium", "Low"]
-            )
-        with col3:
-            filter_category = st.selectbox(
-                "Category",
-                ["All"] + ["Clothing", "Food", "Medical", "Educational", "Other"]
-            )
-        
-        # Apply filters
-        filtered_requests = []
-        for req in requests:
-            desc = req['description'] or ""
-            include = True
+                # Item details
+                col1, col2 = st.columns(2)
+                with col1:
+                    item_name = st.text_input("Item Name*", placeholder="e.g., Blankets, Rice Bags, Medicines")
+                with col2:
+                    category = st.selectbox("Category*", ITEM_CATEGORIES)
+                
+                quantity = st.number_input("Quantity Needed*", min_value=1, value=10)
+                
+                # Enhanced description with formatting tips
+                with st.expander("📝 Item Description & Details"):
+                    description = st.text_area(
+                        "Describe the items you need (be specific):",
+                        help="Include details like size, type, condition requirements, etc.",
+                        height=150
+                    )
+                    
+                    # Suggested tags
+                    st.markdown("**Suggested tags (select relevant ones):**")
+                    tags = st.multiselect(
+                        "Tags (select up to 5)",
+                        ITEM_TAGS,
+                        max_selections=5,
+                        label_visibility="collapsed"
+                    )
+                
+                # Urgency and timeline
+                col1, col2 = st.columns(2)
+                with col1:
+                    urgency = st.select_slider(
+                        "Urgency Level",
+                        options=ITEM_URGENCY_LEVELS,
+                        value="Medium"
+                    )
+                with col2:
+                    deadline = st.date_input(
+                        "Needed By",
+                        min_value=datetime.date.today(),
+                        help="When do you need these items by?"
+                    )
+                
+                # Image upload (simulated)
+                image_upload = st.checkbox("Add reference image (coming soon)")
+                if image_upload:
+                    st.warning("Image upload feature will be available in the next update")
+                
+                if st.button("Submit Request", type="primary"):
+                    if not item_name:
+                        st.error("Please enter an item name")
+                    else:
+                        cursor.execute("""
+                            INSERT INTO item_requests 
+                            (organization_id, item_name, quantity, quantity_remaining, description,
+                             category, urgency, deadline, tags)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        """, (organization_id, item_name, quantity, quantity, description,
+                              category, urgency, deadline, ", ".join(tags) or None))
+                        conn.commit()
+                        invalidate("item_requests:active")
+                        
+                        st.success("🎉 Item request submitted successfully!")
+                        st.toast("Donors will now see your request", icon="📤")
+
+        with tab2:
+            st.markdown("### 📋 Your Active Requests")
             
-            # Status filter
-            if filter_active == "Active Only" and not req['is_active']:
-                include = False
-            elif filter_active == "Inactive Only" and req['is_active']:
-                include = False
+            # Create filters
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                filter_active = st.selectbox(
+                    "Status",
+                    ["All", "Active Only", "Inactive Only"]
+                )
+            with col2:
+                filter_urgency = st.selectbox(
+                    "Urgency",
+                    ["All"] + ITEM_URGENCY_LEVELS[::-1]
+                )
+            with col3:
+                filter_category = st.selectbox(
+                    "Category",
+                    ["All"] + ITEM_CATEGORIES
+                )
             
-            # Urgency filter
-            if include and filter_urgency != "All":
-                if f"Urgency: {filter_urgency}" not in desc:
-                    include = False
+            # Fetch one page of this organization's requests with the filters applied in SQL
+            query = """
+                SELECT id, item_name, quantity, quantity_remaining, description, 
+                       category, urgency, deadline, tags,
+                       created_at, is_active
+                FROM item_requests
+                WHERE organization_id = %s
+            """
+            params = [organization_id]
             
-            # Category filter
-            if include and filter_category != "All":
-                if f"Category: {filter_category}" not in desc:
-                    include = False
+            if filter_active == "Active Only":
+                query += " AND is_active = TRUE"
+            elif filter_active == "Inactive Only":
+                query += " AND is_active = FALSE"
+            if filter_urgency != "All":
+                query += " AND urgency = %s"
+                params.append(filter_urgency)
+            if filter_category != "All":
+                query += " AND category = %s"
+                params.append(filter_category)
             
-            if include:
-                filtered_requests.append(req)
-        
-        if filtered_requests:
-            for req in filtered_requests:
-                with st.container(border=True):
-                    cols = st.columns([0.7, 0.3])
-                    with cols[0]:
-                        st.markdown(f"#### {req['item_name']}")
-                        st.write(f"**Quantity Needed:** {req['quantity']}")
-                        
-                        # Parse description for metadata
-                        desc_lines = (req['description'] or "").split('\n')
-                        metadata = {}
-                        details = []
-                        for line in desc_lines:
-                            if ':' in line:
-                                key, val = line.split(':', 1)
-                                metadata[key.strip()] = val.strip()
-                            elif line.strip():
-                                details.append(line)
-                        
-                        # Display metadata
-                        if 'Category' in metadata:
-                            st.write(f"**Category:** {metadata['Category']}")
-                        if 'Urgency' in metadata:
-                            urgency_color = {
-                                "Critical": "red",
-                                "High": "orange",
-                                "Medium": "blue",
-                                "Low": "green"
-                            }.get(metadata['Urgency'], "gray")
-                            st.write(f"**Urgency:** :{urgency_color}[{metadata['Urgency']}]")
-                        if 'Deadline' in metadata:
-                            deadline_date = datetime.datetime.strptime(metadata['Deadline'], "%Y-%m-%d").date()
-                            days_left = (deadline_date - datetime.date.today()).days
-                            deadline_status = f"{metadata['Deadline']} ({days_left} days left)"
-                            st.write(f"**Deadline:** {deadline_status}")
-                        
-                        # Show tags if available
-                        if 'Tags' in metadata:
-                            st.write("**Tags:**")
-                            tags = metadata['Tags'].split(', ')
-                            st.write(" ".join([f"`{tag}`" for tag in tags]))
-                        
-                        # Show description details
-                        if details:
-                            with st.expander("View Details"):
-                                st.write("\n".join(details))
-                        
-                    with cols[1]:
-                        st.write(f"**Posted:** {req['created_at'].strftime('%b %d, %Y')}")
-                        
-                        # Toggle active status
-                        current_status = bool(req['is_active'])
-                        new_status = st.toggle(
-                            "Active",
-                            value=current_status,
-                            key=f"status_{req['id']}",
-                            help="Toggle to show/hide this request from donors"
-                        )
-                        
-                        if new_status != current_status:
-                            cursor.execute("""
-                                UPDATE item_requests
-                                SET is_active = %s
-                                WHERE id = %s
-                            """, (int(new_status), req['id']))
-                            conn.commit()
-                            st.rerun()
-                        
-                        # Edit button (would link to edit functionality)
-                        if st.button("✏️ Edit", key=f"edit_{req['id']}", use_container_width=True):
-                            st.session_state.editing_request = req['id']
-                            st.rerun()
-                        
-                        # Delete button
-                        if st.button("🗑️ Delete", key=f"delete_{req['id']}", type="secondary", use_container_width=True):
-                            cursor.execute("DELETE FROM item_requests WHERE id = %s", (req['id'],))
-                            conn.commit()
-                            st.success("Request deleted")
-                            st.rerun()
-        else:
-            st.info("No requests match your filters")
-    else:
-        st.info("Your organization hasn't created any item requests yet")
+            request_filters = (filter_active, filter_urgency, filter_category)
+            after = current_cursor("requests_page", request_filters)
+            filtered_requests, next_cursor = fetch_page(cursor, query, params, "created_at", "id", after)
+            
+            if filtered_requests:
+                for req in filtered_requests:
+                    with st.container(border=True):
+                        cols = st.columns([0.7, 0.3])
+                        with cols[0]:
+                            st.markdown(f"#### {req['item_name']}")
+                            st.write(f"**Quantity Needed:** {req['quantity']}")
+                            if req['quantity_remaining'] == 0:
+                                st.write(":green[Fulfilled]")
+                            received = req['quantity'] - req['quantity_remaining']
+                            st.progress(min(1.0, received / req['quantity']) if req['quantity'] else 1.0,
+                                        text=f"{received} of {req['quantity']} received")
+                            
+                            # Display metadata
+                            if req['category']:
+                                st.write(f"**Category:** {req['category']}")
+                            if req['urgency']:
+                                st.write(f"**Urgency:** {urgency_badge(req['urgency'], ITEM_URGENCY_COLORS)}")
+                            if req['deadline']:
+                                days_left = (req['deadline'] - datetime.date.today()).days
+                                deadline_status = f"{req['deadline']} ({days_left} days left)"
+                                st.write(f"**Deadline:** {deadline_status}")
+                            
+                            # Show tags if available
+                            if req['tags']:
+                                st.write("**Tags:**")
+                                tags = req['tags'].split(', ')
+                                st.write(" ".join([f"`{tag}`" for tag in tags]))
+                            
+                            # Show description details
+                            if req['description']:
+                                with st.expander("View Details"):
+                                    st.write(req['description'])
+                            
+                        with cols[1]:
+                            st.write(f"**Posted:** {req['created_at'].strftime('%b %d, %Y')}")
+                            
+                            # Toggle active status
+                            current_status = bool(req['is_active'])
+                            new_status = st.toggle(
+                                "Active",
+                                value=current_status,
+                                key=f"status_{req['id']}",
+                                help="Toggle to show/hide this request from donors"
+                            )
+                            
+                            if new_status != current_status:
+                                cursor.execute("""
+                                    UPDATE item_requests
+                                    SET is_active = %s
+                                    WHERE id = %s
+                                """, (int(new_status), req['id']))
+                                conn.commit()
+                                invalidate("item_requests:active")
+                                st.rerun(scope="fragment")
+                            
+                            # Edit button (would link to edit functionality)
+                            if st.button("✏️ Edit", key=f"edit_{req['id']}", use_container_width=True):
+                                st.session_state.editing_request = req['id']
+                                st.rerun(scope="fragment")
+                            
+                            # Delete button; its item_fulfillments rows cascade
+                            if st.button("🗑️ Delete", key=f"delete_{req['id']}", type="secondary", use_container_width=True):
+                                cursor.execute("DELETE FROM item_requests WHERE id = %s", (req['id'],))
+                                conn.commit()
+                                invalidate("item_requests:active")
+                                st.success("Request deleted")
+                                st.rerun(scope="fragment")
+                pager("requests_page", next_cursor)
+            elif request_filters != ("All", "All", "All"):
+                st.info("No requests match your filters")
+            else:
+                st.info("Your organization hasn't created any item requests yet")
+
+        st.divider()
+
+
+profiler.section("Item Requests")
+item_requests()
 
-st.divider()
 
 # **Donor Communication Center**
-st.subheader("💌 Donor Updates & Engagement")
-
-# Tabbed interface for different communication methods
-tab1, tab2, tab3 = st.tabs(["📝 Individual Updates", "📨 Bulk Messaging", "📊 Engagement Analytics"])
-
-with tab1:
-    st.markdown("### Personalized Updates")
-    
-    # Fetch donations with user info
-    cursor.execute("""
-        SELECT d.id as donation_id, d.user_id, d.amount, d.donation_type, d.date,
-               u.name as user_name, u.email as user_email,
-               o.org_name
-        FROM donations d
-        JOIN users u ON d.user_id = u.id
-        JOIN organizations o ON d.organization_id = o.id
-        WHERE d.organization_id = %s
-        ORDER BY d.date DESC
-    """, (organization_id,))
-    donations_info = cursor.fetchall()
-
-    if donations_info:
-        # Filter donations
-        col1, col2 = st.columns(2)
-        with col1:
-            filter_type = st.selectbox(
-                "Filter by donation type:",
-                ["All", "Money", "Item"]
-            )
-        with col2:
-            time_filter = st.selectbox(
-                "Filter by time:",
-                ["All time", "Last 30 days", "Last 90 days"]
-            )
-        
-        # Apply filters
-        filtered_donations = []
-        for donation in donations_info:
-            include = True
+@st.fragment
+@profiler.fragment("Donor Updates")
+def donor_updates():
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+
+        st.subheader("💌 Donor Updates & Engagement")
+
+        # Tabbed interface for different communication methods
+        tab1, tab2, tab3 = st.tabs(["📝 Individual Updates", "📨 Bulk Messaging", "📊 Engagement Analytics"])
+
+        cursor.execute("""
+            SELECT EXISTS(SELECT 1 FROM donations WHERE organization_id = %s) as has_donations
+        """, (organization_id,))
+        has_donations = bool(cursor.fetchone()['has_donations'])
+
+        with tab1:
+            st.markdown("### Personalized Updates")
             
-            if filter_type == "Money" and donation['donation_type'] != 'money':
-                include = False
-            elif filter_type == "Item" and donation['donation_type'] != 'item':
-                include = False
+            # Filter donations
+            col1, col2 = st.columns(2)
+            with col1:
+                filter_type = st.selectbox(
+                    "Filter by donation type:",
+                    ["All", "Money", "Item"]
+                )
+            with col2:
+                time_filter = st.selectbox(
+                    "Filter by time:",
+                    ["All time", "Last 30 days", "Last 90 days"]
+                )
             
-            if include and time_filter != "All time":
-                days = 30 if time_filter == "Last 30 days" else 90
-                donation_date = donation['date']
-                if (datetime.datetime.now() - donation_date).days > days:
-                    include = False
+            # Fetch one page of donations with user info, filtered in SQL
+            query = """
+                SELECT d.id as donation_id, d.user_id, d.amount, d.currency, d.donation_type, d.date,
+                       u.name as user_name, u.email as user_email
+                FROM donations d
+                JOIN users u ON d.user_id = u.id
+                WHERE d.organization_id = %s
+            """
+            params = [organization_id]
             
-            if include:
-                filtered_donations.append(donation)
-        
-        if filtered_donations:
-            # Template selector
-            with st.expander("💡 Message Templates"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    template = st.selectbox(
-                        "Select a template:",
-                        ["Custom", "Thank you", "Impact update", "Receipt confirmation", "Follow-up request"],
-                        help="Pre-written templates to save time"
-                    )
-                
-                with col2:
-                    if template != "Custom":
-                        if st.button("Apply Template"):
-                            if template == "Thank you":
-                                st.session_state.message_template = f"""Dear {filtered_donations[0]['user_name']},
+            if filter_type != "All":
+                query += " AND d.donation_type = %s"
+                params.append(filter_type.lower())
+            if time_filter != "All time":
+                query += " AND d.date >= NOW() - INTERVAL %s DAY"
+                params.append(30 if time_filter == "Last 30 days" else 90)
+            
+            donation_filters = (filter_type, time_filter)
+            after = current_cursor("updates_page", donation_filters)
+            filtered_donations, next_cursor = fetch_page(
+                cursor, query, params, "d.date", "d.id", after, id_key="donation_id"
+            )
+            
+            if filtered_donations:
+                # Template selector
+                with st.expander("💡 Message Templates"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        template = st.selectbox(
+                            "Select a template:",
+                            ["Custom", "Thank you", "Impact update", "Receipt confirmation", "Follow-up request"],
+                            help="Pre-written templates to save time"
+                        )
+                    
+                    with col2:
+                        if template != "Custom":
+                            if st.button("Apply Template"):
+                                if template == "Thank you":
+                                    st.session_state.message_template = f"""Dear {filtered_donations[0]['user_name']},
 
-Thank you for your generous {'₹' + str(filtered_donations[0]['amount']) if filtered_donations[0]['donation_type'] == 'money' else filtered_donations[0]['donation_type']} donation!
+Thank you for your generous {donation_amount(filtered_donations[0])} donation!
 
 Your support helps us continue our mission. Here's how your contribution is making a difference: [insert specific impact example].
 
 With gratitude,
-{st.session_state['organization']['org_name']} Team"""
-                            elif template == "Impact update":
-                                st.session_state.message_template = f"""Hello {filtered_donations[0]['user_name']},
+{principal.name} Team"""
+                                elif template == "Impact update":
+                                    st.session_state.message_template = f"""Hello {filtered_donations[0]['user_name']},
 
 We wanted to share how donations like yours are creating change:
 
@@ -439,520 +479,518 @@ We wanted to share how donations like yours are creating change:
 - [Specific example 2]
 - [Specific example 3]
 
-Your {'₹' + str(filtered_donations[0]['amount']) if filtered_donations[0]['donation_type'] == 'money' else 'item'} donation on {filtered_donations[0]['date'].strftime('%B %d, %Y')} is part of this impact.
+Your {donation_amount(filtered_donations[0])} donation on {filtered_donations[0]['date'].strftime('%B %d, %Y')} is part of this impact.
 
 Thank you,
-{st.session_state['organization']['org_name']}"""
-            
-            # Donation cards with messaging
-            for donation in filtered_donations:
-                with st.container(border=True):
-                    cols = st.columns([0.2, 0.6, 0.2])
-                    with cols[0]:
-                        st.markdown(f"**{donation['user_name']}**")
-                        st.caption(donation['user_email'])
-                        st.write(f"**Donated:** {donation['date'].strftime('%b %d, %Y')}")
-                    
-                    with cols[1]:
-                        if donation['donation_type'] == 'money':
-                            st.markdown(f"💰 **₹{donation['amount']:,.2f}**")
-                        else:
-                            st.markdown(f"🎁 **Item Donation**")
+{principal.name}"""
+                
+                # Donation cards with messaging
+                for donation in filtered_donations:
+                    with st.container(border=True):
+                        cols = st.columns([0.2, 0.6, 0.2])
+                        with cols[0]:
+                            st.markdown(f"**{donation['user_name']}**")
+                            st.caption(donation['user_email'])
+                            st.write(f"**Donated:** {donation['date'].strftime('%b %d, %Y')}")
                         
-                        # Message input with template support
-                        message_key = f"message_{donation['donation_id']}"
-                        if 'message_template' in st.session_state:
-                            default_message = st.session_state.message_template.replace(
-                                filtered_donations[0]['user_name'], donation['user_name']
-                            ).replace(
-                                str(filtered_donations[0]['amount']), str(donation['amount'])
-                            ).replace(
-                                filtered_donations[0]['date'].strftime('%B %d, %Y'), 
-                                donation['date'].strftime('%B %d, %Y')
+                        with cols[1]:
+                            if donation['donation_type'] == 'money':
+                                st.markdown(f"💰 **{donation_amount(donation)}**")
+                            else:
+                                st.markdown(f"🎁 **Item Donation**")
+                            
+                            # Message input with template support
+                            message_key = f"message_{donation['donation_id']}"
+                            if 'message_template' in st.session_state:
+                                default_message = st.session_state.message_template.replace(
+                                    filtered_donations[0]['user_name'], donation['user_name']
+                                ).replace(
+                                    donation_amount(filtered_donations[0]), donation_amount(donation)
+                                ).replace(
+                                    filtered_donations[0]['date'].strftime('%B %d, %Y'), 
+                                    donation['date'].strftime('%B %d, %Y')
+                                )
+                            else:
+                                default_message = ""
+                            
+                            message = st.text_area(
+                                "Compose your message:",
+                                value=default_message,
+                                key=message_key,
+                                height=150
                             )
-                        else:
-                            default_message = ""
                         
-                        message = st.text_area(
-                            "Compose your message:",
-                            value=default_message,
-                            key=message_key,
-                            height=150
-                        )
-                    
-                    with cols[2]:
-                        if st.button("Send", key=f"send_{donation['donation_id']}", use_container_width=True):
-                            cursor.execute("""
-                                INSERT INTO donation_updates (user_id, organization_id, message)
-                                VALUES (%s, %s, %s)
-                            """, (donation['user_id'], organization_id, message))
-                            conn.commit()
-                            st.success(f"Message sent to {donation['user_name']}!")
-                            st.toast(f"Update sent to {donation['user_name']}", icon="✉️")
-        else:
-            st.info("No donations match your filters")
-    else:
-        st.info("No donations yet to send updates for")
-
-with tab2:
-    st.markdown("### Bulk Messaging")
-    
-    if donations_info:
-        # Select recipients
-        st.markdown("#### Select Recipients")
-        
-        # Group by donation type
-        money_donors = [d for d in donations_info if d['donation_type'] == 'money']
-        item_donors = [d for d in donations_info if d['donation_type'] == 'item']
-        
-        recipient_options = {
-            "All Donors": donations_info,
-            "Monetary Donors Only": money_donors,
-            "Item Donors Only": item_donors,
-            "Recent Donors (30 days)": [d for d in donations_info if (datetime.datetime.now() - d['date']).days <= 30],
-            "Custom Selection": None
-        }
-        
-        recipient_choice = st.selectbox(
-            "Recipient Group:",
-            list(recipient_options.keys())
-        )
-        
-        selected_donors = recipient_options[recipient_choice]
-        
-        if recipient_choice == "Custom Selection":
-            donor_names = [f"{d['user_name']} <{d['user_email']}>" for d in donations_info]
-            selected_donors = st.multiselect(
-                "Select individual donors:",
-                donor_names
-            )
-            selected_donors = [d for d in donations_info if f"{d['user_name']} <{d['user_email']}>" in selected_donors]
-        
-        # Message composition
-        st.markdown("#### Compose Message")
-        
-        # Personalization options
-        col1, col2 = st.columns(2)
-        with col1:
-            include_name = st.checkbox("Personalize with donor names", value=True)
-        with col2:
-            include_donation = st.checkbox("Reference their donation", value=True)
-        
-        # Template selection
-        template = st.selectbox(
-            "Message template:",
-            ["Custom", "Thank you", "Impact report", "Event invitation", "Newsletter"],
-            help="Select a template to start with"
-        )
-        
-        # Message editor
-        message = st.text_area(
-            "Your message:",
-            height=200,
-            help="Use {name} for donor name, {amount} for donation amount, {date} for donation date"
-        )
-        
-        # Preview and send
-        if st.button("Preview Messages"):
-            if not selected_donors:
-                st.warning("Please select at least one recipient")
+                        with cols[2]:
+                            if st.button("Send", key=f"send_{donation['donation_id']}", use_container_width=True):
+                                cursor.execute("""
+                                    INSERT INTO donation_updates (user_id, organization_id, message)
+                                    VALUES (%s, %s, %s)
+                                """, (donation['user_id'], organization_id, message))
+                                conn.commit()
+                                st.success(f"Message sent to {donation['user_name']}!")
+                                st.toast(f"Update sent to {donation['user_name']}", icon="✉️")
+                pager("updates_page", next_cursor)
+            elif donation_filters != ("All", "All time"):
+                st.info("No donations match your filters")
             else:
-                with st.expander("Message Previews", expanded=True):
-                    for i, donor in enumerate(selected_donors[:3]):  # Show first 3 as preview
-                        personalized = message
-                        if include_name:
-                            personalized = personalized.replace("{name}", donor['user_name'])
-                        if include_donation:
-                            personalized = personalized.replace("{amount}", str(donor['amount']) if donor['donation_type'] == 'money' else "item")
-                            personalized = personalized.replace("{date}", donor['date'].strftime('%B %d, %Y'))
+                st.info("No donations yet to send updates for")
+
+        with tab2:
+            st.markdown("### Bulk Messaging")
+            
+            if has_donations:
+                # Select recipients
+                st.markdown("#### Select Recipients")
+                
+                # Each group is a WHERE clause on the recipient query
+                recipient_options = {
+                    "All Donors": "",
+                    "Monetary Donors Only": " AND d.donation_type = 'money'",
+                    "Item Donors Only": " AND d.donation_type = 'item'",
+                    "Recent Donors (30 days)": " AND d.date >= NOW() - INTERVAL 30 DAY",
+                    "Custom Selection": None
+                }
+                
+                recipient_choice = st.selectbox(
+                    "Recipient Group:",
+                    list(recipient_options.keys())
+                )
+                
+                recipient_query = """
+                    SELECT d.id as donation_id, d.user_id, d.amount, d.currency, d.donation_type, d.date,
+                           u.name as user_name, u.email as user_email
+                    FROM donations d
+                    JOIN users u ON d.user_id = u.id
+                    WHERE d.organization_id = %s
+                """
+                recipient_params = [organization_id]
+                
+                if recipient_choice == "Custom Selection":
+                    cursor.execute("""
+                        SELECT DISTINCT u.id, u.name, u.email
+                        FROM donations d
+                        JOIN users u ON d.user_id = u.id
+                        WHERE d.organization_id = %s
+                        ORDER BY u.name
+                    """, (organization_id,))
+                    chosen_donors = st.multiselect(
+                        "Select individual donors:",
+                        cursor.fetchall(),
+                        format_func=lambda d: f"{d['name']} <{d['email']}>"
+                    )
+                    if chosen_donors:
+                        recipient_query += f" AND d.user_id IN ({', '.join(['%s'] * len(chosen_donors))})"
+                        recipient_params += [d['id'] for d in chosen_donors]
+                    else:
+                        recipient_query = None
+                else:
+                    recipient_query += recipient_options[recipient_choice]
+                
+                # One message per donor, personalized with their latest donation
+                selected_donors = []
+                if recipient_query:
+                    cursor.execute(recipient_query + " ORDER BY d.date DESC", recipient_params)
+                    selected_donors = unique_recipients(cursor.fetchall())
+                    st.caption(f"{len(selected_donors)} recipient{'s' if len(selected_donors) != 1 else ''}")
+                
+                # Message composition
+                st.markdown("#### Compose Message")
+                
+                # Personalization options
+                col1, col2 = st.columns(2)
+                with col1:
+                    include_name = st.checkbox("Personalize with donor names", value=True)
+                with col2:
+                    include_donation = st.checkbox("Reference their donation", value=True)
+                
+                # Template selection
+                template = st.selectbox(
+                    "Message template:",
+                    ["Custom", "Thank you", "Impact report", "Event invitation", "Newsletter"],
+                    help="Select a template to start with"
+                )
+                
+                # Message editor
+                message = st.text_area(
+                    "Your message:",
+                    height=200,
+                    help="Use {name} for donor name, {amount} for donation amount, {date} for donation date"
+                )
+                
+                # Preview and send
+                if st.button("Preview Messages"):
+                    if not selected_donors:
+                        st.warning("Please select at least one recipient")
+                    else:
+                        with st.expander("Message Previews", expanded=True):
+                            for i, donor in enumerate(selected_donors[:3]):  # Show first 3 as preview
+                                personalized = render_message(message, donor, include_name, include_donation)
+                                
+                                st.markdown(f"**To:** {donor['user_name']} <{donor['user_email']}>")
+                                st.text_area(f"Preview {i+1}", value=personalized, key=f"preview_{i}", height=100)
+                                st.divider()
+                
+                if st.button("Send to All Selected", type="primary", use_container_width=True):
+                    if not selected_donors:
+                        st.warning("Please select at least one recipient")
+                    elif not message.strip():
+                        st.error("Please compose a message")
+                    else:
+                        # The send is recorded and queued; outbox workers deliver it
+                        # in chunks and resume it if they are interrupted
+                        send_id = create_send(conn, organization_id, message, selected_donors,
+                                              include_name, include_donation)
+                        enqueue(conn, "bulk_send", {"bulk_send_id": send_id})
+                        conn.commit()
                         
-                        st.markdown(f"**To:** {donor['user_name']} <{donor['user_email']}>")
-                        st.text_area(f"Preview {i+1}", value=personalized, key=f"preview_{i}", height=100)
-                        st.divider()
-        
-        if st.button("Send to All Selected", type="primary", use_container_width=True):
-            if not selected_donors:
-                st.warning("Please select at least one recipient")
-            elif not message.strip():
-                st.error("Please compose a message")
+                        st.success(f"Messages to {len(selected_donors)} donors queued for delivery!")
+                        st.balloons()
+                
+                # Sends still being delivered or left unfinished
+                in_progress = unfinished_sends(conn, organization_id)
+                if in_progress:
+                    st.markdown("#### Sends in Progress")
+                    for send in in_progress:
+                        with st.container(border=True):
+                            col1, col2 = st.columns([0.75, 0.25])
+                            with col1:
+                                st.write(f"**{send['created_at'].strftime('%b %d, %Y %H:%M')}** - "
+                                         f"{send['sent']:,} of {send['total']:,} delivered")
+                                st.progress(send['sent'] / send['total'])
+                                st.caption(send['message'][:120])
+                            with col2:
+                                if st.button("Resume", key=f"resume_send_{send['id']}", use_container_width=True,
+                                             help="Queue the remaining messages again"):
+                                    enqueue(conn, "bulk_send", {"bulk_send_id": send['id']})
+                                    conn.commit()
+                                    st.rerun(scope="fragment")
             else:
-                progress_bar = st.progress(0)
-                total = len(selected_donors)
-                
-                for i, donor in enumerate(selected_donors):
-                    personalized = message
-                    if include_name:
-                        personalized = personalized.replace("{name}", donor['user_name'])
-                    if include_donation:
-                        personalized = personalized.replace("{amount}", str(donor['amount']) if donor['donation_type'] == 'money' else "item")
-                        personalized = personalized.replace("{date}", donor['date'].strftime('%B %d, %Y'))
-                    
-                    cursor.execute("""
-                        INSERT INTO donation_updates (user_id, organization_id, message)
-                        VALUES (%s, %s, %s)
-                    """, (donor['user_id'], organization_id, personalized))
-                    conn.commit()
-                    
-                    progress_bar.progress((i + 1) / total)
-                
-                st.success(f"Messages sent to {len(selected_donors)} donors!")
-                st.balloons()
-    else:
-        st.info("No donors available for messaging")
-
-with tab3:
-    st.markdown("### Engagement Analytics")
-    
-    # Fetch sent messages
-    cursor.execute("""
-        SELECT COUNT(*) as total_messages, 
-               COUNT(DISTINCT user_id) as unique_donors_contacted,
-               MIN(sent_at) as first_message,
-               MAX(sent_at) as last_message
-        FROM donation_updates
-        WHERE organization_id = %s
-    """, (organization_id,))
-    stats = cursor.fetchone()
-    
-    if stats['total_messages'] > 0:
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Messages Sent", stats['total_messages'])
-        with col2:
-            st.metric("Unique Donors Contacted", stats['unique_donors_contacted'])
-        with col3:
-            st.metric("Last Message Sent", stats['last_message'].strftime('%b %d, %Y'))
-        
-        # Message frequency chart
-        cursor.execute("""
-            SELECT DATE(sent_at) as date, COUNT(*) as count
-            FROM donation_updates
-            WHERE organization_id = %s
-            GROUP BY DATE(sent_at)
-            ORDER BY date
-        """, (organization_id,))
-        frequency_data = cursor.fetchall()
-        
-        if frequency_data:
-            df_freq = pd.DataFrame(frequency_data)
-            st.markdown("#### Message Frequency Over Time")
-            st.line_chart(df_freq.set_index('date'))
-    else:
-        st.info("No messages sent yet")
+                st.info("No donors available for messaging")
+
+        with tab3:
+            st.markdown("### Engagement Analytics")
+            
+            # Fetch sent messages
+            cursor.execute("""
+                SELECT COUNT(*) as total_messages, 
+                       COUNT(DISTINCT user_id) as unique_donors_contacted,
+                       MIN(sent_at) as first_message,
+                       MAX(sent_at) as last_message
+                FROM donation_updates
+                WHERE organization_id = %s
+            """, (organization_id,))
+            stats = cursor.fetchone()
+            
+            if stats['total_messages'] > 0:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Total Messages Sent", stats['total_messages'])
+                with col2:
+                    st.metric("Unique Donors Contacted", stats['unique_donors_contacted'])
+                with col3:
+                    st.metric("Last Message Sent", stats['last_message'].strftime('%b %d, %Y'))
+                
+                # Message frequency chart
+                df_freq = profiler.frame(read_columns(conn, """
+                    SELECT DATE(sent_at) as date, COUNT(*) as count
+                    FROM donation_updates
+                    WHERE organization_id = %s
+                    GROUP BY DATE(sent_at)
+                    ORDER BY date
+                """, (organization_id,)))
+                
+                if len(df_freq):
+                    st.markdown("#### Message Frequency Over Time")
+                    st.line_chart(df_freq.set_index('date'))
+            else:
+                st.info("No messages sent yet")
+
+        st.divider()
+
+
+profiler.section("Donor Updates")
+donor_updates()
 
-st.divider()
 
 # **Emergency Alerts Section**
 # **Emergency Response Center**
-st.subheader("🆘 Emergency Response Center")
-
-# Tabbed interface for different emergency functions
-tab1, tab2, tab3 = st.tabs(["🚨 Create Alert", "📋 Active Emergencies", "📊 Response Dashboard"])
-
-with tab1:
-    with st.container(border=True):
-        st.markdown("### 🚨 Create New Emergency Alert")
-        
-        # Emergency details
-        emergency_title = st.text_input(
-            "Alert Title*", 
-            placeholder="e.g., Flood Relief Needed - Mumbai Area",
-            help="Clear, concise title that explains the emergency"
-        )
-        
-        # Emergency type selector
-        emergency_type = st.selectbox(
-            "Emergency Type*",
-            ["Natural Disaster", "Medical Crisis", "Food Shortage", 
-             "Shelter Needed", "Other Urgent Need"],
-            help="Categorize your emergency for better response"
-        )
-        
-        # Location details
-        col1, col2 = st.columns(2)
-        with col1:
-            location = st.text_input(
-                "Location*",
-                placeholder="City, District, or Specific Address",
-                help="Where is help needed?"
-            )
-        with col2:
-            radius = st.selectbox(
-                "Affected Radius",
-                ["Local (under 1km)", "Community (1-5km)", "Regional (5-20km)", "Wide Area (20+km)"],
-                help="How widespread is the emergency?"
-            )
-        
-        # Rich text description with formatting options
-        with st.expander("📝 Detailed Emergency Description"):
-            emergency_description = st.text_area(
-                "Full Description*",
-                height=200,
-                help="Include:\n- What happened\n- Immediate needs\n- Safety concerns\n- Contact info"
-            )
+@st.fragment
+@profiler.fragment("Emergency Response Center")
+def emergency_response_center():
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+
+        st.subheader("🆘 Emergency Response Center")
+
+        # Tabbed interface for different emergency functions
+        tab1, tab2, tab3 = st.tabs(["🚨 Create Alert", "📋 Active Emergencies", "📊 Response Dashboard"])
+
+        with tab1:
+            with st.container(border=True):
+                st.markdown("### 🚨 Create New Emergency Alert")
+                
+                # Emergency details
+                emergency_title = st.text_input(
+                    "Alert Title*", 
+                    placeholder="e.g., Flood Relief Needed - Mumbai Area",
+                    help="Clear, concise title that explains the emergency"
+                )
+                
+                # Emergency type selector
+                emergency_type = st.selectbox(
+                    "Emergency Type*",
+                    EMERGENCY_TYPES,
+                    help="Categorize your emergency for better response"
+                )
+                
+                # Location details
+                col1, col2 = st.columns(2)
+                with col1:
+                    location = st.text_input(
+                        "Location*",
+                        placeholder="City, District, or Specific Address",
+                        help="Where is help needed?"
+                    )
+                with col2:
+                    radius = st.selectbox(
+                        "Affected Radius",
+                        EMERGENCY_RADII,
+                        help="How widespread is the emergency?"
+                    )
+                
+                # Rich text description with formatting options
+                with st.expander("📝 Detailed Emergency Description"):
+                    emergency_description = st.text_area(
+                        "Full Description*",
+                        height=200,
+                        help="Include:\n- What happened\n- Immediate needs\n- Safety concerns\n- Contact info"
+                    )
+                    
+                    # Urgency level
+                    urgency = st.select_slider(
+                        "Urgency Level",
+                        options=EMERGENCY_URGENCY_LEVELS,
+                        value="Serious"
+                    )
+                    
+                    # Estimated duration
+                    duration = st.selectbox(
+                        "Expected Duration",
+                        EMERGENCY_DURATIONS,
+                        help="How long will this emergency last?"
+                    )
+                
+                # Resources needed checklist
+                st.markdown("**Immediate Needs (check all that apply):**")
+                needs_cols = st.columns(3)
+                with needs_cols[0]:
+                    need_food = st.checkbox("Food/Water")
+                    need_medical = st.checkbox("Medical Supplies")
+                with needs_cols[1]:
+                    need_shelter = st.checkbox("Shelter")
+                    need_volunteers = st.checkbox("Volunteers")
+                with needs_cols[2]:
+                    need_clothing = st.checkbox("Clothing")
+                    need_other = st.checkbox("Other Resources")
+                
+                # Image upload option
+                upload_image = st.checkbox("Add emergency photo (optional)")
+                if upload_image:
+                    st.warning("Image upload coming in next update - describe visually in text for now")
+                
+                if st.button("Submit Emergency Alert", type="primary"):
+                    if not emergency_title or not emergency_description or not location:
+                        st.error("Please fill all required fields (marked with *)")
+                    else:
+                        needs = []
+                        if need_food: needs.append("Food/Water")
+                        if need_medical: needs.append("Medical")
+                        if need_shelter: needs.append("Shelter")
+                        if need_volunteers: needs.append("Volunteers")
+                        if need_clothing: needs.append("Clothing")
+                        if need_other: needs.append("Other")
+                        
+                        cursor.execute("""
+                            INSERT INTO emergencies 
+                            (organization_id, title, description, is_approved,
+                             emergency_type, location, affected_radius, urgency, duration, needs)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        """, (organization_id, emergency_title, emergency_description, 0,
+                              emergency_type, location, radius, urgency, duration, ", ".join(needs) or None))
+                        conn.commit()
+                        
+                        st.success("""
+                            🚨 Emergency alert submitted for admin approval!\n
+                            Our team will review it immediately. You'll be notified when approved.
+                        """)
+
+        with tab2:
+            st.markdown("### 📋 Active Emergency Alerts")
             
-            # Urgency level
-            urgency = st.select_slider(
-                "Urgency Level",
-                options=["Monitor", "Concern", "Serious", "Critical", "Life-Threatening"],
-                value="Serious"
-            )
+            # Filter options
+            col1, col2 = st.columns(2)
+            with col1:
+                filter_status = st.selectbox(
+                    "Filter by Status",
+                    ["All", "Pending Approval", "Active", "Resolved"]
+                )
+            with col2:
+                filter_urgency = st.selectbox(
+                    "Filter by Urgency",
+                    ["All"] + EMERGENCY_URGENCY_LEVELS[::-1]
+                )
             
-            # Estimated duration
-            duration = st.selectbox(
-                "Expected Duration",
-                ["Hours", "Days", "Weeks", "Ongoing"],
-                help="How long will this emergency last?"
-            )
-        
-        # Resources needed checklist
-        st.markdown("**Immediate Needs (check all that apply):**")
-        needs_cols = st.columns(3)
-        with needs_cols[0]:
-            need_food = st.checkbox("Food/Water")
-            need_medical = st.checkbox("Medical Supplies")
-        with needs_cols[1]:
-            need_shelter = st.checkbox("Shelter")
-            need_volunteers = st.checkbox("Volunteers")
-        with needs_cols[2]:
-            need_clothing = st.checkbox("Clothing")
-            need_other = st.checkbox("Other Resources")
-        
-        # Image upload option
-        upload_image = st.checkbox("Add emergency photo (optional)")
-        if upload_image:
-            st.warning("Image upload coming in next update - describe visually in text for now")
-        
-        if st.button("Submit Emergency Alert", type="primary"):
-            if not emergency_title or not emergency_description or not location:
-                st.error("Please fill all required fields (marked with *)")
-            else:
-                # Build comprehensive description
-                full_description = f"**Type:** {emergency_type}\n"
-                full_description += f"**Location:** {location} ({radius})\n"
-                full_description += f"**Urgency:** {urgency}\n"
-                full_description += f"**Duration:** {duration}\n\n"
-                full_description += "**Immediate Needs:** "
-                needs = []
-                if need_food: needs.append("Food/Water")
-                if need_medical: needs.append("Medical")
-                if need_shelter: needs.append("Shelter")
-                if need_volunteers: needs.append("Volunteers")
-                if need_clothing: needs.append("Clothing")
-                if need_other: needs.append("Other")
-                full_description += ", ".join(needs) + "\n\n"
-                full_description += "**Details:**\n" + emergency_description
-                
-                cursor.execute("""
-                    INSERT INTO emergencies 
-                    (organization_id, title, description, is_approved)
-                    VALUES (%s, %s, %s, %s)
-                """, (organization_id, emergency_title, full_description, 0))
-                conn.commit()
-                
-                st.success("""
-                    🚨 Emergency alert submitted for admin approval!\n
-                    Our team will review it immediately. You'll be notified when approved.
-                """)
-
-with tab2:
-    st.markdown("### 📋 Active Emergency Alerts")
-    
-    # Filter options
-    col1, col2 = st.columns(2)
-    with col1:
-        filter_status = st.selectbox(
-            "Filter by Status",
-            ["All", "Pending Approval", "Active", "Resolved"]
-        )
-    with col2:
-        filter_urgency = st.selectbox(
-            "Filter by Urgency",
-            ["All", "Critical", "Serious", "Concern"]
-        )
-    
-    # Fetch emergencies with filters
-    query = """
-        SELECT id, title, description, created_at, is_active, is_approved
-        FROM emergencies
-        WHERE organization_id = %s
-    """
-    params = [organization_id]
-    
-    if filter_status != "All":
-        if filter_status == "Pending Approval":
-            query += " AND is_approved = 0"
-        elif filter_status == "Active":
-            query += " AND is_approved = 1 AND is_active = 1"
-        elif filter_status == "Resolved":
-            query += " AND is_active = 0"
-    
-    query += " ORDER BY created_at DESC"
-    
-    cursor.execute(query, params)
-    emergencies = cursor.fetchall()
-    
-    if emergencies:
-        filtered_emergencies = []
-        for emergency in emergencies:
-            include = True
+            # Fetch emergencies with filters
+            query = """
+                SELECT id, title, description, created_at, is_active, is_approved,
+                       emergency_type, location, affected_radius, urgency, duration, needs
+                FROM emergencies
+                WHERE organization_id = %s
+            """
+            params = [organization_id]
+            
+            if filter_status != "All":
+                if filter_status == "Pending Approval":
+                    query += " AND is_approved = 0"
+                elif filter_status == "Active":
+                    query += " AND is_approved = 1 AND is_active = 1"
+                elif filter_status == "Resolved":
+                    query += " AND is_active = 0"
             
-            # Apply urgency filter if needed
             if filter_urgency != "All":
-                desc = emergency['description'] or ""
-                if f"**Urgency:** {filter_urgency}" not in desc:
-                    include = False
+                query += " AND urgency = %s"
+                params.append(filter_urgency)
             
-            if include:
-                filtered_emergencies.append(emergency)
-        
-        if filtered_emergencies:
-            for emergency in filtered_emergencies:
-                with st.container(border=True):
-                    cols = st.columns([0.7, 0.3])
-                    with cols[0]:
-                        st.markdown(f"#### {emergency['title']}")
-                        
-                        # Parse description for metadata
-                        desc_lines = (emergency['description'] or "").split('\n')
-                        metadata = {}
-                        details = []
-                        for line in desc_lines:
-                            if line.startswith("**") and ":**" in line:
-                                key = line.split("**")[1].split(":**")[0]
-                                val = line.split(":**")[1].strip()
-                                metadata[key] = val
-                            elif line.strip():
-                                details.append(line)
-                        
-                        # Display metadata
-                        if 'Type' in metadata:
-                            st.write(f"**Type:** {metadata['Type']}")
-                        if 'Location' in metadata:
-                            st.write(f"**Location:** {metadata['Location']}")
-                        if 'Urgency' in metadata:
-                            urgency_color = {
-                                "Critical": "red",
-                                "Serious": "orange",
-                                "Concern": "blue",
-                                "Monitor": "green"
-                            }.get(metadata['Urgency'], "gray")
-                            st.write(f"**Urgency:** :{urgency_color}[{metadata['Urgency']}]")
-                        if 'Duration' in metadata:
-                            st.write(f"**Duration:** {metadata['Duration']}")
-                        
-                        # Show details
-                        if details:
-                            with st.expander("View Full Details"):
-                                st.write("\n".join(details))
-                    
-                    with cols[1]:
-                        status_badge = ""
-                        if emergency['is_approved'] == 0:
-                            status_badge = "🟡 Pending Approval"
-                        elif emergency['is_active'] == 1:
-                            status_badge = "🔴 Active Emergency"
-                        else:
-                            status_badge = "🟢 Resolved"
-                        
-                        st.write(f"**Status:** {status_badge}")
-                        st.write(f"**Created:** {emergency['created_at'].strftime('%b %d, %Y %H:%M')}")
-                        
-                        # Action buttons
-                        if emergency['is_active'] == 1 and emergency['is_approved'] == 1:
-                            if st.button("Mark as Resolved", key=f"resolve_{emergency['id']}", use_container_width=True):
-                                cursor.execute("""
-                                    UPDATE emergencies
-                                    SET is_active = 0
-                                    WHERE id = %s
-                                """, (emergency['id'],))
-                                conn.commit()
-                                st.success("Emergency marked as resolved!")
-                                st.rerun()
+            emergency_filters = (filter_status, filter_urgency)
+            after = current_cursor("emergencies_page", emergency_filters)
+            filtered_emergencies, next_cursor = fetch_page(cursor, query, params, "created_at", "id", after)
+            
+            if filtered_emergencies:
+                for emergency in filtered_emergencies:
+                    with st.container(border=True):
+                        cols = st.columns([0.7, 0.3])
+                        with cols[0]:
+                            st.markdown(f"#### {emergency['title']}")
+                            
+                            # Display metadata
+                            if emergency['emergency_type']:
+                                st.write(f"**Type:** {emergency['emergency_type']}")
+                            if emergency['location']:
+                                radius = f" ({emergency['affected_radius']})" if emergency['affected_radius'] else ""
+                                st.write(f"**Location:** {emergency['location']}{radius}")
+                            if emergency['urgency']:
+                                st.write(f"**Urgency:** {urgency_badge(emergency['urgency'], EMERGENCY_URGENCY_COLORS)}")
+                            if emergency['duration']:
+                                st.write(f"**Duration:** {emergency['duration']}")
+                            if emergency['needs']:
+                                st.write(f"**Immediate Needs:** {emergency['needs']}")
+                            
+                            # Show details
+                            if emergency['description']:
+                                with st.expander("View Full Details"):
+                                    st.write(emergency['description'])
                         
-                        if st.button("Update", key=f"update_{emergency['id']}", use_container_width=True):
-                            st.session_state.editing_emergency = emergency['id']
-                            st.rerun()
-        else:
-            st.info("No emergencies match your filters")
-    else:
-        st.info("No emergency alerts created yet")
-
-with tab3:
-    st.markdown("### 📊 Emergency Response Dashboard")
-    
-    # Fetch emergency stats
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total_emergencies,
-            SUM(is_approved = 1 AND is_active = 1) as active_emergencies,
-            SUM(is_approved = 1 AND is_active = 0) as resolved_emergencies,
-            MIN(created_at) as first_emergency,
-            MAX(created_at) as last_emergency
-        FROM emergencies
-        WHERE organization_id = %s
-    """, (organization_id,))
-    stats = cursor.fetchone()
-    
-    if stats['total_emergencies'] > 0:
-        # Convert Decimal values to integers
-        total_emergencies = int(stats['total_emergencies'])
-        active_emergencies = int(stats['active_emergencies'])
-        resolved_emergencies = int(stats['resolved_emergencies'])
-        
-        # Key metrics
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Emergencies", total_emergencies)
-        with col2:
-            st.metric("Active Now", active_emergencies)
-        with col3:
-            st.metric("Resolved", resolved_emergencies)
-        
-        # Emergency frequency chart
-        cursor.execute("""
-            SELECT DATE(created_at) as date, COUNT(*) as count
-            FROM emergencies
-            WHERE organization_id = %s
-            GROUP BY DATE(created_at)
-            ORDER BY date
-        """, (organization_id,))
-        frequency_data = cursor.fetchall()
-        
-        if frequency_data:
-            df_freq = pd.DataFrame(frequency_data)
-            st.markdown("#### Emergency Frequency Over Time")
-            st.area_chart(df_freq.set_index('date'))
-        
-        # Urgency breakdown
-        cursor.execute("""
-            SELECT 
-                SUM(description LIKE '%**Urgency:** Critical%') as critical,
-                SUM(description LIKE '%**Urgency:** Serious%') as serious,
-                SUM(description LIKE '%**Urgency:** Concern%') as concern,
-                SUM(description LIKE '%**Urgency:** Monitor%') as monitor
-            FROM emergencies
-            WHERE organization_id = %s
-        """, (organization_id,))
-        urgency_stats = cursor.fetchone()
-        
-        # Convert Decimal values to integers
-        urgency_stats = {k: int(v) for k, v in urgency_stats.items()}
-        
-        st.markdown("#### Emergency Urgency Breakdown")
-        urgency_df = pd.DataFrame({
-            "Level": ["Critical", "Serious", "Concern", "Monitor"],
-            "Count": [
-                urgency_stats['critical'],
-                urgency_stats['serious'],
-                urgency_stats['concern'],
-                urgency_stats['monitor']
-            ]
-        })
-        st.bar_chart(urgency_df.set_index('Level'))
-    else:
-        st.info("No emergency data available yet")
-        
-st.divider()
-
-conn.close()
\ No newline at end of file
+                        with cols[1]:
+                            status_badge = ""
+                            if emergency['is_approved'] == 0:
+                                status_badge = "🟡 Pending Approval"
+                            elif emergency['is_active'] == 1:
+                                status_badge = "🔴 Active Emergency"
+                            else:
+                                status_badge = "🟢 Resolved"
+                            
+                            st.write(f"**Status:** {status_badge}")
+                            st.write(f"**Created:** {emergency['created_at'].strftime('%b %d, %Y %H:%M')}")
+                            
+                            # Action buttons
+                            if emergency['is_active'] == 1 and emergency['is_approved'] == 1:
+                                if st.button("Mark as Resolved", key=f"resolve_{emergency['id']}", use_container_width=True):
+                                    cursor.execute("""
+                                        UPDATE emergencies
+                                        SET is_active = 0
+                                        WHERE id = %s
+                                    """, (emergency['id'],))
+                                    conn.commit()
+                                    invalidate("emergencies:active")
+                                    st.success("Emergency marked as resolved!")
+                                    st.rerun(scope="fragment")
+                            
+                            if st.button("Update", key=f"update_{emergency['id']}", use_container_width=True):
+                                st.session_state.editing_emergency = emergency['id']
+                                st.rerun(scope="fragment")
+                pager("emergencies_page", next_cursor)
+            elif emergency_filters != ("All", "All"):
+                st.info("No emergencies match your filters")
+            else:
+                st.info("No emergency alerts created yet")
+
+        with tab3:
+            st.markdown("### 📊 Emergency Response Dashboard")
+            
+            # Fetch emergency stats
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_emergencies,
+                    SUM(is_approved = 1 AND is_active = 1) as active_emergencies,
+                    SUM(is_approved = 1 AND is_active = 0) as resolved_emergencies,
+                    MIN(created_at) as first_emergency,
+                    MAX(created_at) as last_emergency
+                FROM emergencies
+                WHERE organization_id = %s
+            """, (organization_id,))
+            stats = cursor.fetchone()
+            
+            if stats['total_emergencies'] > 0:
+                # Convert Decimal values to integers
+                total_emergencies = int(stats['total_emergencies'])
+                active_emergencies = int(stats['active_emergencies'])
+                resolved_emergencies = int(stats['resolved_emergencies'])
+                
+                # Key metrics
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Total Emergencies", total_emergencies)
+                with col2:
+                    st.metric("Active Now", active_emergencies)
+                with col3:
+                    st.metric("Resolved", resolved_emergencies)
+                
+                # Emergency frequency chart
+                df_freq = profiler.frame(read_columns(conn, """
+                    SELECT DATE(created_at) as date, COUNT(*) as count
+                    FROM emergencies
+                    WHERE organization_id = %s
+                    GROUP BY DATE(created_at)
+                    ORDER BY date
+                """, (organization_id,)))
+                
+                if len(df_freq):
+                    st.markdown("#### Emergency Frequency Over Time")
+                    st.area_chart(df_freq.set_index('date'))
+                
+                # Urgency breakdown (served from idx_emergencies_org_urgency_created)
+                cursor.execute("""
+                    SELECT urgency, COUNT(*) as count
+                    FROM emergencies
+                    WHERE organization_id = %s AND urgency IS NOT NULL
+                    GROUP BY urgency
+                """, (organization_id,))
+                urgency_stats = {row['urgency']: row['count'] for row in cursor.fetchall()}
+                
+                st.markdown("#### Emergency Urgency Breakdown")
+                levels = EMERGENCY_URGENCY_LEVELS[::-1]
+                urgency_df = profiler.frame({
+                    "Level": levels,
+                    "Count": [urgency_stats.get(level, 0) for level in levels]
+                })
+                st.bar_chart(urgency_df.set_index('Level'))
+            else:
+                st.info("No emergency data available yet")
+                
+        st.divider()
+
+
+profiler.section("Emergency Response Center")
+emergency_response_center()
+
+profiler.finish()
\ No newline at end of file
@@ -1,586 +1,778 @@
 import streamlit as st
-import pandas as pd
 from decimal import Decimal
-from db import get_connection
+from db import connection, pool_stats
+from cache import invalidate, query_cache
+from outbox import enqueue, enqueue_email, ensure_workers, outbox_stats
+from index_advisor import build_report, capture_explains, ensure_background_capture, format_report
+from query_stats import query_stats
+from rate_limit import login_limiter
+from org_admin import REVIEW_COLUMNS, apply_action, apply_review, read_review_csv, recent_audit
+from loaders import read_columns
+from signup import ORGANIZATION_COLUMNS, import_organizations, read_organizations_csv
+from profiling import is_enabled as profiling_enabled, set_enabled as set_profiling, start_page
+from pagination import current_cursor, fetch_page, pager
+from metadata import EMERGENCY_URGENCY_COLORS, EMERGENCY_URGENCY_LEVELS, urgency_badge
 
 # Page configuration
 st.set_page_config(page_title="Admin Dashboard", layout="wide")
 st.title("👑 Admin Dashboard")
+profiler = start_page("Admin Dashboard")
 
-# Database connection
-conn = get_connection()
-cursor = conn.cursor(dictionary=True)
+# Messages are queued in the outbox and delivered by background workers
+ensure_workers()
 
 # **Emergency Alerts Management Center**
-st.subheader("🛡️ Emergency Alerts Management Dashboard")
-
-# Tabbed interface for different management functions
-tab1, tab2, tab3 = st.tabs(["📋 Pending Approvals", "✅ Active Emergencies", "📊 Emergency Analytics"])
-
-with tab1:
-    st.markdown("### ⏳ Pending Emergency Approvals")
-    
-    # Fetch pending emergencies with organization details
-    cursor.execute("""
-        SELECT e.id, e.title, e.description, e.created_at,
-               o.org_name, o.email as org_email
-        FROM emergencies e
-        JOIN organizations o ON e.organization_id = o.id
-        WHERE e.is_active = TRUE AND e.is_approved = FALSE
-        ORDER BY e.created_at DESC
-    """)
-    pending_emergencies = cursor.fetchall()
-
-    if pending_emergencies:
-        for emergency in pending_emergencies:
-            with st.container(border=True):
-                cols = st.columns([0.7, 0.3])
-                with cols[0]:
-                    st.markdown(f"#### {emergency['title']}")
-                    st.caption(f"From: {emergency['org_name']} ({emergency['org_email']})")
-                    st.write(f"**Submitted:** {emergency['created_at'].strftime('%Y-%m-%d %H:%M')}")
-                    
-                    # Parse description for metadata if structured
-                    if emergency['description'] and '**Type:**' in emergency['description']:
-                        desc_lines = emergency['description'].split('\n')
-                        metadata = {}
-                        details = []
-                        for line in desc_lines:
-                            if line.startswith("**") and ":**" in line:
-                                key = line.split("**")[1].split(":**")[0]
-                                val = line.split(":**")[1].strip()
-                                metadata[key] = val
-                            elif line.strip():
-                                details.append(line)
+@st.fragment
+@profiler.fragment("Emergency Management")
+def emergency_management():
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+
+        st.subheader("🛡️ Emergency Alerts Management Dashboard")
+
+        # Tabbed interface for different management functions
+        tab1, tab2, tab3 = st.tabs(["📋 Pending Approvals", "✅ Active Emergencies", "📊 Emergency Analytics"])
+
+        with tab1:
+            st.markdown("### ⏳ Pending Emergency Approvals")
+            
+            # Fetch pending emergencies with organization details
+            cursor.execute("""
+                SELECT e.id, e.title, e.description, e.created_at,
+                       e.emergency_type, e.location, e.affected_radius, e.urgency,
+                       o.org_name, o.email as org_email
+                FROM emergencies e
+                JOIN organizations o ON e.organization_id = o.id
+                WHERE e.is_active = TRUE AND e.is_approved = FALSE
+                ORDER BY e.created_at DESC
+            """)
+            pending_emergencies = cursor.fetchall()
+
+            if pending_emergencies:
+                for emergency in pending_emergencies:
+                    with st.container(border=True):
+                        cols = st.columns([0.7, 0.3])
+                        with cols[0]:
+                            st.markdown(f"#### {emergency['title']}")
+                            st.caption(f"From: {emergency['org_name']} ({emergency['org_email']})")
+                            st.write(f"**Submitted:** {emergency['created_at'].strftime('%Y-%m-%d %H:%M')}")
+                            
+                            if emergency['emergency_type']:
+                                st.write(f"**Type:** {emergency['emergency_type']}")
+                            if emergency['urgency']:
+                                st.write(f"**Urgency:** {urgency_badge(emergency['urgency'], EMERGENCY_URGENCY_COLORS)}")
+                            
+                            with st.expander("View Full Details"):
+                                st.write(emergency['description'] or "No description provided")
                         
-                        if 'Type' in metadata:
-                            st.write(f"**Type:** {metadata['Type']}")
-                        if 'Urgency' in metadata:
-                            urgency_color = {
-                                "Critical": "red",
-                                "High": "orange",
-                                "Medium": "blue",
-                                "Low": "green"
-                            }.get(metadata['Urgency'], "gray")
-                            st.write(f"**Urgency:** :{urgency_color}[{metadata['Urgency']}]")
-                    
-                    with st.expander("View Full Details"):
-                        st.write(emergency['description'] or "No description provided")
-                
-                with cols[1]:
-                    # Approval actions
-                    st.write("### Admin Actions")
-                    
-                    if st.button("✅ Approve Emergency", key=f"approve_{emergency['id']}", 
-                               use_container_width=True, type="primary"):
-                        cursor.execute("""
-                            UPDATE emergencies
-                            SET is_approved = TRUE
-                            WHERE id = %s
-                        """, (emergency['id'],))
-                        conn.commit()
-                        st.success(f"Emergency #{emergency['id']} approved and activated!")
-                        st.rerun()
-                    
-                    if st.button("✖️ Reject with Feedback", key=f"reject_{emergency['id']}", 
-                               use_container_width=True, type="secondary"):
-                        feedback = st.text_area(
-                            "Rejection reason (will be emailed to organization):",
-                            key=f"feedback_{emergency['id']}",
-                            height=100
-                        )
-                        if st.button("Confirm Rejection", key=f"confirm_reject_{emergency['id']}"):
-                            cursor.execute("""
-                                UPDATE emergencies
-                                SET is_active = FALSE
-                                WHERE id = %s
-                            """, (emergency['id'],))
-                            conn.commit()
+                        with cols[1]:
+                            # Approval actions
+                            st.write("### Admin Actions")
                             
-                            # In a real app, you would send the feedback email here
-                            st.warning(f"Emergency #{emergency['id']} rejected. Organization notified.")
-                            st.rerun()
-                    
-                    if st.button("🔄 Request More Info", key=f"info_{emergency['id']}", 
-                               use_container_width=True):
-                        info_request = st.text_area(
-                            "What additional information do you need?",
-                            key=f"info_request_{emergency['id']}",
-                            height=100
-                        )
-                        if st.button("Send Request", key=f"send_info_{emergency['id']}"):
-                            # In a real app, you would send this request to the organization
-                            st.info(f"Information request sent to {emergency['org_name']}")
-                            st.rerun()
-    else:
-        st.info("No pending emergency alerts requiring approval.")
-
-with tab2:
-    st.markdown("### 🔴 Active Emergency Alerts")
-    
-    # Filter options
-    col1, col2 = st.columns(2)
-    with col1:
-        filter_urgency = st.selectbox(
-            "Filter by Urgency",
-            ["All", "Critical", "High", "Medium", "Low"],
-            key="active_filter_urgency"
-        )
-    with col2:
-        filter_time = st.selectbox(
-            "Filter by Time",
-            ["All", "Last 24 hours", "Last 7 days", "Last 30 days"],
-            key="active_filter_time"
-        )
-    
-    # Fetch active emergencies
-    query = """
-        SELECT e.id, e.title, e.description, e.created_at,
-               o.org_name, o.email as org_email
-        FROM emergencies e
-        JOIN organizations o ON e.organization_id = o.id
-        WHERE e.is_active = TRUE AND e.is_approved = TRUE
-    """
-    
-    if filter_time != "All":
-        if filter_time == "Last 24 hours":
-            query += " AND e.created_at >= NOW() - INTERVAL 1 DAY"
-        elif filter_time == "Last 7 days":
-            query += " AND e.created_at >= NOW() - INTERVAL 7 DAY"
-        elif filter_time == "Last 30 days":
-            query += " AND e.created_at >= NOW() - INTERVAL 30 DAY"
-    
-    query += " ORDER BY e.created_at DESC"
-    
-    cursor.execute(query)
-    active_emergencies = cursor.fetchall()
-
-    if active_emergencies:
-        for emergency in active_emergencies:
-            # Apply urgency filter
+                            if st.button("✅ Approve Emergency", key=f"approve_{emergency['id']}", 
+                                       use_container_width=True, type="primary"):
+                                cursor.execute("""
+                                    UPDATE emergencies
+                                    SET is_approved = TRUE
+                                    WHERE id = %s
+                                """, (emergency['id'],))
+                                conn.commit()
+                                invalidate("emergencies:active")
+                                st.success(f"Emergency #{emergency['id']} approved and activated!")
+                                st.rerun(scope="fragment")
+                            
+                            with st.popover("✖️ Reject with Feedback", use_container_width=True):
+                                feedback = st.text_area(
+                                    "Rejection reason (will be emailed to organization):",
+                                    key=f"feedback_{emergency['id']}",
+                                    height=100
+                                )
+                                if st.button("Confirm Rejection", key=f"confirm_reject_{emergency['id']}"):
+                                    cursor.execute("""
+                                        UPDATE emergencies
+                                        SET is_active = FALSE
+                                        WHERE id = %s
+                                    """, (emergency['id'],))
+                                    enqueue_email(conn, emergency['org_email'],
+                                                  f"Emergency alert not approved: {emergency['title']}",
+                                                  feedback or "Your emergency alert was not approved.")
+                                    conn.commit()
+                                    st.warning(f"Emergency #{emergency['id']} rejected. Organization notified.")
+                                    st.rerun(scope="fragment")
+                            
+                            with st.popover("🔄 Request More Info", use_container_width=True):
+                                info_request = st.text_area(
+                                    "What additional information do you need?",
+                                    key=f"info_request_{emergency['id']}",
+                                    height=100
+                                )
+                                if st.button("Send Request", key=f"send_info_{emergency['id']}", disabled=not info_request.strip()):
+                                    enqueue_email(conn, emergency['org_email'],
+                                                  f"More information needed: {emergency['title']}", info_request)
+                                    conn.commit()
+                                    st.info(f"Information request sent to {emergency['org_name']}")
+                                    st.rerun(scope="fragment")
+            else:
+                st.info("No pending emergency alerts requiring approval.")
+
+        with tab2:
+            st.markdown("### 🔴 Active Emergency Alerts")
+            
+            # Filter options
+            col1, col2 = st.columns(2)
+            with col1:
+                filter_urgency = st.selectbox(
+                    "Filter by Urgency",
+                    ["All"] + EMERGENCY_URGENCY_LEVELS[::-1],
+                    key="active_filter_urgency"
+                )
+            with col2:
+                filter_time = st.selectbox(
+                    "Filter by Time",
+                    ["All", "Last 24 hours", "Last 7 days", "Last 30 days"],
+                    key="active_filter_time"
+                )
+            
+            # Fetch active emergencies
+            query = """
+                SELECT e.id, e.title, e.description, e.created_at,
+                       e.emergency_type, e.location, e.affected_radius, e.urgency,
+                       o.org_name, o.email as org_email
+                FROM emergencies e
+                JOIN organizations o ON e.organization_id = o.id
+                WHERE e.is_active = TRUE AND e.is_approved = TRUE
+            """
+            
+            if filter_time != "All":
+                if filter_time == "Last 24 hours":
+                    query += " AND e.created_at >= NOW() - INTERVAL 1 DAY"
+                elif filter_time == "Last 7 days":
+                    query += " AND e.created_at >= NOW() - INTERVAL 7 DAY"
+                elif filter_time == "Last 30 days":
+                    query += " AND e.created_at >= NOW() - INTERVAL 30 DAY"
+            
+            params = []
+            
             if filter_urgency != "All":
-                if not emergency['description'] or f"**Urgency:** {filter_urgency}" not in emergency['description']:
-                    continue
+                query += " AND e.urgency = %s"
+                params.append(filter_urgency)
             
-            with st.container(border=True):
-                cols = st.columns([0.7, 0.3])
-                with cols[0]:
-                    st.markdown(f"#### {emergency['title']}")
-                    st.caption(f"Organization: {emergency['org_name']}")
-                    st.write(f"**Activated:** {emergency['created_at'].strftime('%Y-%m-%d %H:%M')}")
-                    
-                    # Parse description for metadata
-                    if emergency['description'] and '**Type:**' in emergency['description']:
-                        desc_lines = emergency['description'].split('\n')
-                        metadata = {}
-                        for line in desc_lines:
-                            if line.startswith("**") and ":**" in line:
-                                key = line.split("**")[1].split(":**")[0]
-                                val = line.split(":**")[1].strip()
-                                metadata[key] = val
-                        
-                        if 'Type' in metadata:
-                            st.write(f"**Type:** {metadata['Type']}")
-                        if 'Location' in metadata:
-                            st.write(f"**Location:** {metadata['Location']}")
-                        if 'Urgency' in metadata:
-                            urgency_color = {
-                                "Critical": "red",
-                                "High": "orange",
-                                "Medium": "blue",
-                                "Low": "green"
-                            }.get(metadata['Urgency'], "gray")
-                            st.write(f"**Urgency:** :{urgency_color}[{metadata['Urgency']}]")
-                
-                with cols[1]:
-                    st.write("### Admin Controls")
-                    
-                    if st.button("🟢 Mark as Resolved", key=f"resolve_{emergency['id']}", 
-                               use_container_width=True, type="primary"):
-                        cursor.execute("""
-                            UPDATE emergencies
-                            SET is_active = FALSE
-                            WHERE id = %s
-                        """, (emergency['id'],))
-                        conn.commit()
-                        st.success(f"Emergency #{emergency['id']} marked as resolved!")
-                        st.rerun()
-                    
-                    if st.button("📝 Edit Details", key=f"edit_{emergency['id']}", 
-                               use_container_width=True):
-                        st.session_state.editing_emergency = emergency['id']
-                        st.rerun()
-                    
-                    if st.button("📢 Broadcast Update", key=f"broadcast_{emergency['id']}", 
-                               use_container_width=True):
-                        update_message = st.text_area(
-                            "Send update to all donors:",
-                            key=f"update_{emergency['id']}",
-                            height=100
-                        )
-                        if st.button("Send Broadcast", key=f"send_broadcast_{emergency['id']}"):
-                            # In a real app, you would send this to all relevant donors
-                            st.success(f"Update sent regarding {emergency['title']}!")
-                            st.rerun()
-    else:
-        st.info("No active emergency alerts currently.")
-
-with tab3:
-    st.markdown("### 📈 Emergency Analytics Dashboard")
-    
-    # Fetch stats
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total_emergencies,
-            SUM(is_approved = 1 AND is_active = 1) as active_emergencies,
-            SUM(is_approved = 1 AND is_active = 0) as resolved_emergencies,
-            SUM(is_approved = 0) as pending_emergencies,
-            MIN(created_at) as first_emergency,
-            MAX(created_at) as last_emergency
-        FROM emergencies
-    """)
-    stats = cursor.fetchone()
-    
-    # Convert numeric values to integers, leave datetimes as is
-    processed_stats = {}
-    for k, v in stats.items():
-        if k in ['first_emergency', 'last_emergency']:
-            processed_stats[k] = v  # Keep datetime values as-is
-        else:
-            processed_stats[k] = int(v) if v is not None else 0
-    
-    # Key metrics
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric("Total Emergencies", processed_stats['total_emergencies'])
-    with col2:
-        st.metric("Active Now", processed_stats['active_emergencies'])
-    with col3:
-        st.metric("Resolved", processed_stats['resolved_emergencies'])
-    with col4:
-        st.metric("Pending Review", processed_stats['pending_emergencies'])
-    
-    # Display first and last emergency dates
-    st.write(f"**First Emergency:** {processed_stats['first_emergency'].strftime('%Y-%m-%d') if processed_stats['first_emergency'] else 'N/A'}")
-    st.write(f"**Most Recent Emergency:** {processed_stats['last_emergency'].strftime('%Y-%m-%d') if processed_stats['last_emergency'] else 'N/A'}")
-    
-    # Emergency frequency chart
-    cursor.execute("""
-        SELECT DATE(created_at) as date, COUNT(*) as count
-        FROM emergencies
-        GROUP BY DATE(created_at)
-        ORDER BY date
-    """)
-    freq_data = cursor.fetchall()
-    
-    if freq_data:
-        df_freq = pd.DataFrame(freq_data)
-        st.markdown("#### Emergency Frequency Over Time")
-        st.area_chart(df_freq.set_index('date'))
-    
-    # Urgency breakdown
-    cursor.execute("""
-        SELECT 
-            SUM(description LIKE '%**Urgency:** Critical%') as critical,
-            SUM(description LIKE '%**Urgency:** High%') as high,
-            SUM(description LIKE '%**Urgency:** Medium%') as medium,
-            SUM(description LIKE '%**Urgency:** Low%') as low
-        FROM emergencies
-    """)
-    urgency_stats = cursor.fetchone()
-    
-    # Convert all numeric values to integers
-    urgency_stats = {k: int(v) if v is not None else 0 for k, v in urgency_stats.items()}
-    
-    st.markdown("#### Emergency Urgency Breakdown")
-    urgency_df = pd.DataFrame({
-        "Urgency Level": ["Critical", "High", "Medium", "Low"],
-        "Count": [
-            urgency_stats['critical'],
-            urgency_stats['high'],
-            urgency_stats['medium'],
-            urgency_stats['low']
-        ]
-    })
-    st.bar_chart(urgency_df.set_index('Urgency Level'))
-
-st.divider()
+            active_filters = (filter_urgency, filter_time)
+            after = current_cursor("active_emergencies_page", active_filters)
+            active_emergencies, next_cursor = fetch_page(cursor, query, params, "e.created_at", "e.id", after)
 
-# **Organization Management Dashboard**
-st.subheader("🏢 Organization Management")
-
-# Check and add columns if they don't exist (more robust approach)
-try:
-    # First check if columns exist
-    cursor.execute("""
-        SELECT COUNT(*) as column_exists 
-        FROM information_schema.columns 
-        WHERE table_name = 'organizations' AND column_name = 'is_active'
-    """)
-    if cursor.fetchone()['column_exists'] == 0:
-        cursor.execute("ALTER TABLE organizations ADD COLUMN is_active BOOLEAN DEFAULT TRUE")
-    
-    cursor.execute("""
-        SELECT COUNT(*) as column_exists 
-        FROM information_schema.columns 
-        WHERE table_name = 'organizations' AND column_name = 'is_approved'
-    """)
-    if cursor.fetchone()['column_exists'] == 0:
-        cursor.execute("ALTER TABLE organizations ADD COLUMN is_approved BOOLEAN DEFAULT FALSE")
-    
-    conn.commit()
-except Exception as e:
-    st.warning(f"Could not modify table structure: {str(e)}")
-    # Initialize variables to prevent errors
-    is_active_exists = False
-    is_approved_exists = False
-else:
-    is_active_exists = True
-    is_approved_exists = True
-
-# Tabbed interface for different management functions
-tab1, tab2, tab3 = st.tabs(["🆕 Approval Queue", "✅ Active Organizations", "📊 Organization Stats"])
-
-with tab1:
-    st.markdown("### ⏳ Organizations Pending Approval")
-    
-    # Modified query to work even if columns don't exist
-    if is_approved_exists:
-        query = """
-            SELECT id, org_name, email, phone, description, address, gov_id_type, gov_id_number
-            FROM organizations
-            WHERE is_approved = FALSE
-            ORDER BY id DESC
-        """
-    else:
-        query = """
-            SELECT id, org_name, email, phone, description, address, gov_id_type, gov_id_number
-            FROM organizations
-            ORDER BY id DESC
-            LIMIT 0  # Return nothing if column doesn't exist
-        """
-    
-    cursor.execute(query)
-    pending_orgs = cursor.fetchall()
-
-    if pending_orgs:
-        for org in pending_orgs:
-            with st.container(border=True):
-                cols = st.columns([0.7, 0.3])
-                with cols[0]:
-                    st.markdown(f"#### {org['org_name']}")
-                    st.write(f"**Email:** {org['email']}")
-                    st.write(f"**Phone:** {org['phone']}")
-                    
-                    with st.expander("View Full Details"):
-                        st.write(f"**Description:** {org['description'] or 'Not provided'}")
-                        st.write(f"**Address:** {org['address'] or 'Not provided'}")
-                        st.write(f"**Government ID Type:** {org['gov_id_type'] or 'Not provided'}")
-                        if org['gov_id_number']:
-                            st.write(f"**Government ID:** `{org['gov_id_number']}`")
-                
-                with cols[1]:
-                    st.write("### Admin Actions")
-                    
-                    if is_approved_exists:
-                        if st.button("✅ Approve Organization", key=f"approve_{org['id']}", 
-                                   use_container_width=True, type="primary"):
-                            cursor.execute("""
-                                UPDATE organizations
-                                SET is_approved = TRUE, is_active = TRUE
-                                WHERE id = %s
-                            """, (org['id'],))
-                            conn.commit()
-                            st.success(f"Approved {org['org_name']}!")
-                            st.rerun()
-                    
-                    if st.button("✖️ Reject with Feedback", key=f"reject_{org['id']}", 
-                               use_container_width=True, type="secondary"):
-                        feedback = st.text_area(
-                            "Reason for rejection (will be emailed to organization):",
-                            key=f"feedback_{org['id']}",
-                            height=100
-                        )
-                        if st.button("Confirm Rejection", key=f"confirm_reject_{org['id']}"):
-                            cursor.execute("DELETE FROM organizations WHERE id = %s", (org['id'],))
-                            conn.commit()
-                            st.warning(f"{org['org_name']} rejected and removed from system.")
-                            st.rerun()
-                    
-                    if st.button("🔄 Request More Info", key=f"info_{org['id']}", 
-                               use_container_width=True):
-                        info_request = st.text_area(
-                            "What additional information do you need?",
-                            key=f"info_request_{org['id']}",
-                            height=100
-                        )
-                        if st.button("Send Request", key=f"send_info_{org['id']}"):
-                            st.info(f"Information request sent to {org['org_name']}")
-                            st.rerun()
-    else:
-        st.info("No organizations pending approval.")
-
-with tab2:
-    st.markdown("### ✅ Active Organizations")
-    
-    # Filter options
-    col1, col2 = st.columns(2)
-    with col1:
-        search_term = st.text_input("Search by name or email:")
-    with col2:
-        if is_active_exists:
-            show_inactive = st.checkbox("Show inactive organizations")
-        else:
-            show_inactive = False
-            st.write("")  # Spacer
-    
-    # Build query based on filters
-    if is_approved_exists and is_active_exists:
-        query = """
-            SELECT id, org_name, email, phone, description, is_active
-            FROM organizations
-            WHERE is_approved = TRUE
-        """
-    else:
-        query = """
-            SELECT id, org_name, email, phone, description, TRUE as is_active
-            FROM organizations
-            WHERE 1=1
-        """
-    
-    params = []
-    
-    if search_term:
-        query += " AND (org_name LIKE %s OR email LIKE %s)"
-        params.extend([f"%{search_term}%", f"%{search_term}%"])
-    
-    if is_active_exists and not show_inactive:
-        query += " AND is_active = TRUE"
-    
-    query += " ORDER BY org_name ASC"
-    
-    cursor.execute(query, params)
-    active_orgs = cursor.fetchall()
-
-    if active_orgs:
-        for org in active_orgs:
-            with st.container(border=True):
-                cols = st.columns([0.7, 0.3])
-                with cols[0]:
-                    if is_active_exists:
-                        status = "🟢 Active" if org['is_active'] else "🔴 Inactive"
-                        st.markdown(f"#### {org['org_name']} {status}")
-                    else:
-                        st.markdown(f"#### {org['org_name']}")
-                    st.write(f"**Email:** {org['email']}")
-                    st.write(f"**Phone:** {org['phone']}")
-                    
-                    with st.expander("View Description"):
-                        st.write(org['description'] or "No description provided")
-                
-                with cols[1]:
-                    st.write("### Admin Controls")
-                    
-                    if is_active_exists:
-                        if org['is_active']:
-                            if st.button("⏸️ Deactivate", key=f"deactivate_{org['id']}", 
-                                       use_container_width=True):
+            if active_emergencies:
+                for emergency in active_emergencies:
+                    with st.container(border=True):
+                        cols = st.columns([0.7, 0.3])
+                        with cols[0]:
+                            st.markdown(f"#### {emergency['title']}")
+                            st.caption(f"Organization: {emergency['org_name']}")
+                            st.write(f"**Activated:** {emergency['created_at'].strftime('%Y-%m-%d %H:%M')}")
+                            
+                            if emergency['emergency_type']:
+                                st.write(f"**Type:** {emergency['emergency_type']}")
+                            if emergency['location']:
+                                radius = f" ({emergency['affected_radius']})" if emergency['affected_radius'] else ""
+                                st.write(f"**Location:** {emergency['location']}{radius}")
+                            if emergency['urgency']:
+                                st.write(f"**Urgency:** {urgency_badge(emergency['urgency'], EMERGENCY_URGENCY_COLORS)}")
+                        
+                        with cols[1]:
+                            st.write("### Admin Controls")
+                            
+                            if st.button("🟢 Mark as Resolved", key=f"resolve_{emergency['id']}", 
+                                       use_container_width=True, type="primary"):
                                 cursor.execute("""
-                                    UPDATE organizations
+                                    UPDATE emergencies
                                     SET is_active = FALSE
                                     WHERE id = %s
-                                """, (org['id'],))
+                                """, (emergency['id'],))
                                 conn.commit()
-                                st.warning(f"{org['org_name']} deactivated")
-                                st.rerun()
-                        else:
-                            if st.button("▶️ Activate", key=f"activate_{org['id']}", 
+                                invalidate("emergencies:active")
+                                st.success(f"Emergency #{emergency['id']} marked as resolved!")
+                                st.rerun(scope="fragment")
+                            
+                            if st.button("📝 Edit Details", key=f"edit_{emergency['id']}", 
+                                       use_container_width=True):
+                                st.session_state.editing_emergency = emergency['id']
+                                st.rerun(scope="fragment")
+                            
+                            with st.popover("📢 Broadcast Update", use_container_width=True):
+                                update_message = st.text_area(
+                                    "Send update to all donors:",
+                                    key=f"update_{emergency['id']}",
+                                    height=100
+                                )
+                                if st.button("Send Broadcast", key=f"send_broadcast_{emergency['id']}",
+                                             disabled=not update_message.strip()):
+                                    # The worker resolves the organization's donors
+                                    enqueue(conn, "emergency_broadcast",
+                                            {"emergency_id": emergency['id'], "message": update_message})
+                                    conn.commit()
+                                    st.success(f"Update queued for all donors of {emergency['title']}!")
+                                    st.rerun(scope="fragment")
+                pager("active_emergencies_page", next_cursor)
+            elif active_filters != ("All", "All"):
+                st.info("No active emergency alerts match your filters.")
+            else:
+                st.info("No active emergency alerts currently.")
+
+        with tab3:
+            st.markdown("### 📈 Emergency Analytics Dashboard")
+            
+            # Fetch stats
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_emergencies,
+                    SUM(is_approved = 1 AND is_active = 1) as active_emergencies,
+                    SUM(is_approved = 1 AND is_active = 0) as resolved_emergencies,
+                    SUM(is_approved = 0) as pending_emergencies,
+                    MIN(created_at) as first_emergency,
+                    MAX(created_at) as last_emergency
+                FROM emergencies
+            """)
+            stats = cursor.fetchone()
+            
+            # Convert numeric values to integers, leave datetimes as is
+            processed_stats = {}
+            for k, v in stats.items():
+                if k in ['first_emergency', 'last_emergency']:
+                    processed_stats[k] = v  # Keep datetime values as-is
+                else:
+                    processed_stats[k] = int(v) if v is not None else 0
+            
+            # Key metrics
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Emergencies", processed_stats['total_emergencies'])
+            with col2:
+                st.metric("Active Now", processed_stats['active_emergencies'])
+            with col3:
+                st.metric("Resolved", processed_stats['resolved_emergencies'])
+            with col4:
+                st.metric("Pending Review", processed_stats['pending_emergencies'])
+            
+            # Display first and last emergency dates
+            st.write(f"**First Emergency:** {processed_stats['first_emergency'].strftime('%Y-%m-%d') if processed_stats['first_emergency'] else 'N/A'}")
+            st.write(f"**Most Recent Emergency:** {processed_stats['last_emergency'].strftime('%Y-%m-%d') if processed_stats['last_emergency'] else 'N/A'}")
+            
+            # Emergency frequency chart
+            df_freq = profiler.frame(read_columns(conn, """
+                SELECT DATE(created_at) as date, COUNT(*) as count
+                FROM emergencies
+                GROUP BY DATE(created_at)
+                ORDER BY date
+            """))
+            
+            if len(df_freq):
+                st.markdown("#### Emergency Frequency Over Time")
+                st.area_chart(df_freq.set_index('date'))
+            
+            # Urgency breakdown (index-only scan of idx_emergencies_urgency)
+            cursor.execute("""
+                SELECT urgency, COUNT(*) as count
+                FROM emergencies
+                WHERE urgency IS NOT NULL
+                GROUP BY urgency
+            """)
+            urgency_stats = {row['urgency']: row['count'] for row in cursor.fetchall()}
+            
+            st.markdown("#### Emergency Urgency Breakdown")
+            levels = EMERGENCY_URGENCY_LEVELS[::-1]
+            urgency_df = profiler.frame({
+                "Urgency Level": levels,
+                "Count": [urgency_stats.get(level, 0) for level in levels]
+            })
+            st.bar_chart(urgency_df.set_index('Urgency Level'))
+
+        st.divider()
+
+
+profiler.section("Emergency Management")
+emergency_management()
+
+
+# **Organization Management Dashboard**
+@st.fragment
+@profiler.fragment("Organization Management")
+def organization_management():
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+
+        st.subheader("🏢 Organization Management")
+
+        # Tabbed interface for different management functions
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(["🆕 Approval Queue", "✅ Active Organizations",
+                                                "📊 Organization Stats", "📥 Bulk Import", "🗂️ Batch Review"])
+
+        with tab1:
+            st.markdown("### ⏳ Organizations Pending Approval")
+            
+            cursor.execute("""
+                SELECT id, org_name, email, phone, description, address, gov_id_type, gov_id_number
+                FROM organizations
+                WHERE is_approved = FALSE
+                ORDER BY id DESC
+            """)
+            pending_orgs = cursor.fetchall()
+
+            if pending_orgs:
+                # Bulk review: one statement and one commit for the whole selection
+                with st.container(border=True):
+                    pending_names = {org['id']: f"{org['org_name']} ({org['email']})" for org in pending_orgs}
+                    if st.button(f"☑️ Select all {len(pending_orgs)} pending", key="select_all_pending"):
+                        st.session_state.bulk_pending = list(pending_names)
+                    selected = st.multiselect("Selected organizations", list(pending_names),
+                                              format_func=pending_names.get, key="bulk_pending")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if st.button(f"✅ Approve Selected ({len(selected)})", disabled=not selected,
+                                     use_container_width=True, type="primary"):
+                            changed = apply_action(conn, "approve", selected)
+                            st.session_state.pop("bulk_pending", None)
+                            st.success(f"Approved {len(changed)} organization(s)")
+                            st.rerun(scope="fragment")
+                    with col2:
+                        with st.popover(f"✖️ Reject Selected ({len(selected)})", use_container_width=True,
+                                        disabled=not selected):
+                            bulk_feedback = st.text_area("Reason for rejection (emailed to every organization):",
+                                                         key="bulk_reject_feedback", height=100)
+                            if st.button("Confirm Rejection", key="confirm_bulk_reject"):
+                                changed = apply_action(conn, "reject", selected, note=bulk_feedback or None)
+                                st.session_state.pop("bulk_pending", None)
+                                st.warning(f"Rejected {len(changed)} organization(s)")
+                                st.rerun(scope="fragment")
+
+                for org in pending_orgs:
+                    with st.container(border=True):
+                        cols = st.columns([0.7, 0.3])
+                        with cols[0]:
+                            st.markdown(f"#### {org['org_name']}")
+                            st.write(f"**Email:** {org['email']}")
+                            st.write(f"**Phone:** {org['phone']}")
+                            
+                            with st.expander("View Full Details"):
+                                st.write(f"**Description:** {org['description'] or 'Not provided'}")
+                                st.write(f"**Address:** {org['address'] or 'Not provided'}")
+                                st.write(f"**Government ID Type:** {org['gov_id_type'] or 'Not provided'}")
+                                if org['gov_id_number']:
+                                    st.write(f"**Government ID:** `{org['gov_id_number']}`")
+                        
+                        with cols[1]:
+                            st.write("### Admin Actions")
+                            
+                            if st.button("✅ Approve Organization", key=f"approve_{org['id']}", 
                                        use_container_width=True, type="primary"):
-                                cursor.execute("""
-                                    UPDATE organizations
-                                    SET is_active = TRUE
-                                    WHERE id = %s
-                                """, (org['id'],))
-                                conn.commit()
-                                st.success(f"{org['org_name']} activated")
-                                st.rerun()
-                    
-                    if st.button("📝 Edit", key=f"edit_{org['id']}", 
-                               use_container_width=True):
-                        st.session_state.editing_org = org['id']
-                        st.rerun()
-                    
-                    if st.button("🗑️ Delete", key=f"delete_{org['id']}", 
-                               use_container_width=True, type="secondary"):
-                        if st.checkbox(f"Confirm permanent deletion of {org['org_name']}"):
-                            cursor.execute("DELETE FROM organizations WHERE id = %s", (org['id'],))
-                            conn.commit()
-                            st.error(f"{org['org_name']} permanently deleted")
-                            st.rerun()
-    else:
-        st.info("No organizations match your filters.")
-
-with tab3:
-    st.markdown("### 📊 Organization Statistics")
-    
-    # Fetch basic counts (no date-based queries since created_at doesn't exist)
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total_orgs,
-            SUM(is_approved = 1) as approved_orgs,
-            SUM(is_approved = 0) as pending_orgs,
-            SUM(is_active = 1) as active_orgs,
-            MIN(id) as oldest_org_id,
-            MAX(id) as newest_org_id
-        FROM organizations
-    """)
-    stats = cursor.fetchone()
-    
-    # Convert all numeric values to integers
-    stats = {
-        'total_orgs': int(stats['total_orgs']),
-        'approved_orgs': int(stats['approved_orgs']),
-        'pending_orgs': int(stats['pending_orgs']),
-        'active_orgs': int(stats['active_orgs']),
-        'oldest_org_id': stats['oldest_org_id'],
-        'newest_org_id': stats['newest_org_id']
-    }
-    
-    # Get oldest and newest org names
-    oldest_name = "None"
-    newest_name = "None"
-    if stats['oldest_org_id']:
-        cursor.execute("SELECT org_name FROM organizations WHERE id = %s", (stats['oldest_org_id'],))
-        result = cursor.fetchone()
-        oldest_name = result['org_name'] if result else "None"
-    if stats['newest_org_id']:
-        cursor.execute("SELECT org_name FROM organizations WHERE id = %s", (stats['newest_org_id'],))
-        result = cursor.fetchone()
-        newest_name = result['org_name'] if result else "None"
-    
-    # Display metrics
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Total Organizations", stats['total_orgs'])
-    with col2:
-        st.metric("Approved Organizations", stats['approved_orgs'])
-    with col3:
-        st.metric("Active Organizations", stats['active_orgs'])
-    
-    st.markdown("---")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric("Oldest Organization", oldest_name)
-    with col2:
-        st.metric("Newest Organization", newest_name)
-    
-    # Since we don't have created_at, we'll use ID-based timeline as a proxy
-    st.markdown("#### Organization Registration Timeline (by ID)")
-    cursor.execute("SELECT id, org_name FROM organizations ORDER BY id")
-    orgs = cursor.fetchall()
-    if orgs:
-        df_orgs = pd.DataFrame(orgs)
-        st.line_chart(df_orgs.set_index('id')['org_name'].value_counts().sort_index())
-
-# Closing DB connection
-conn.close()
\ No newline at end of file
+                                apply_action(conn, "approve", [org['id']])
+                                st.success(f"Approved {org['org_name']}!")
+                                st.rerun(scope="fragment")
+                            
+                            with st.popover("✖️ Reject with Feedback", use_container_width=True):
+                                feedback = st.text_area(
+                                    "Reason for rejection (will be emailed to organization):",
+                                    key=f"feedback_{org['id']}",
+                                    height=100
+                                )
+                                if st.button("Confirm Rejection", key=f"confirm_reject_{org['id']}"):
+                                    apply_action(conn, "reject", [org['id']], note=feedback or None)
+                                    st.warning(f"{org['org_name']} rejected and removed from system.")
+                                    st.rerun(scope="fragment")
+                            
+                            with st.popover("🔄 Request More Info", use_container_width=True):
+                                info_request = st.text_area(
+                                    "What additional information do you need?",
+                                    key=f"info_request_{org['id']}",
+                                    height=100
+                                )
+                                if st.button("Send Request", key=f"send_info_{org['id']}", disabled=not info_request.strip()):
+                                    enqueue_email(conn, org['email'], "More information needed for your GiveBack registration",
+                                                  info_request)
+                                    conn.commit()
+                                    st.info(f"Information request sent to {org['org_name']}")
+                                    st.rerun(scope="fragment")
+            else:
+                st.info("No organizations pending approval.")
+
+        with tab2:
+            st.markdown("### ✅ Active Organizations")
+            
+            # Filter options
+            col1, col2 = st.columns(2)
+            with col1:
+                search_term = st.text_input("Search by name or email:")
+            with col2:
+                show_inactive = st.checkbox("Show inactive organizations")
+            
+            # Build query based on filters
+            query = """
+                SELECT id, org_name, email, phone, description, is_active
+                FROM organizations
+                WHERE is_approved = TRUE
+            """
+            
+            params = []
+            
+            if search_term:
+                query += " AND (org_name LIKE %s OR email LIKE %s)"
+                params.extend([f"%{search_term}%", f"%{search_term}%"])
+            
+            if not show_inactive:
+                query += " AND is_active = TRUE"
+            
+            query += " ORDER BY org_name ASC"
+            
+            cursor.execute(query, params)
+            active_orgs = cursor.fetchall()
+
+            if active_orgs:
+                # Bulk controls: one statement and one commit for the whole selection
+                with st.container(border=True):
+                    org_names = {org['id']: f"{org['org_name']} ({org['email']})" for org in active_orgs}
+                    selected = st.multiselect("Selected organizations", list(org_names),
+                                              format_func=org_names.get, key="bulk_active")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if st.button(f"⏸️ Deactivate Selected ({len(selected)})", disabled=not selected,
+                                     use_container_width=True):
+                            changed = apply_action(conn, "deactivate", selected)
+                            st.session_state.pop("bulk_active", None)
+                            st.warning(f"Deactivated {len(changed)} organization(s)")
+                            st.rerun(scope="fragment")
+                    with col2:
+                        if st.button(f"▶️ Activate Selected ({len(selected)})", disabled=not selected,
+                                     use_container_width=True, type="primary"):
+                            changed = apply_action(conn, "activate", selected)
+                            st.session_state.pop("bulk_active", None)
+                            st.success(f"Activated {len(changed)} organization(s)")
+                            st.rerun(scope="fragment")
+
+                for org in active_orgs:
+                    with st.container(border=True):
+                        cols = st.columns([0.7, 0.3])
+                        with cols[0]:
+                            status = "🟢 Active" if org['is_active'] else "🔴 Inactive"
+                            st.markdown(f"#### {org['org_name']} {status}")
+                            st.write(f"**Email:** {org['email']}")
+                            st.write(f"**Phone:** {org['phone']}")
+                            
+                            with st.expander("View Description"):
+                                st.write(org['description'] or "No description provided")
+                        
+                        with cols[1]:
+                            st.write("### Admin Controls")
+                            
+                            if org['is_active']:
+                                if st.button("⏸️ Deactivate", key=f"deactivate_{org['id']}", 
+                                           use_container_width=True):
+                                    apply_action(conn, "deactivate", [org['id']])
+                                    st.warning(f"{org['org_name']} deactivated")
+                                    st.rerun(scope="fragment")
+                            else:
+                                if st.button("▶️ Activate", key=f"activate_{org['id']}", 
+                                           use_container_width=True, type="primary"):
+                                    apply_action(conn, "activate", [org['id']])
+                                    st.success(f"{org['org_name']} activated")
+                                    st.rerun(scope="fragment")
+                            
+                            if st.button("📝 Edit", key=f"edit_{org['id']}", 
+                                       use_container_width=True):
+                                st.session_state.editing_org = org['id']
+                                st.rerun(scope="fragment")
+                            
+                            if st.button("🗑️ Delete", key=f"delete_{org['id']}", 
+                                       use_container_width=True, type="secondary"):
+                                if st.checkbox(f"Confirm permanent deletion of {org['org_name']}"):
+                                    apply_action(conn, "delete", [org['id']])
+                                    st.error(f"{org['org_name']} permanently deleted")
+                                    st.rerun(scope="fragment")
+            else:
+                st.info("No organizations match your filters.")
+
+        with tab3:
+            st.markdown("### 📊 Organization Statistics")
+            
+            # Fetch basic counts (no date-based queries since created_at doesn't exist)
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_orgs,
+                    SUM(is_approved = 1) as approved_orgs,
+                    SUM(is_approved = 0) as pending_orgs,
+                    SUM(is_active = 1) as active_orgs,
+                    MIN(id) as oldest_org_id,
+                    MAX(id) as newest_org_id
+                FROM organizations
+            """)
+            stats = cursor.fetchone()
+            
+            # Convert all numeric values to integers
+            stats = {
+                'total_orgs': int(stats['total_orgs']),
+                'approved_orgs': int(stats['approved_orgs']),
+                'pending_orgs': int(stats['pending_orgs']),
+                'active_orgs': int(stats['active_orgs']),
+                'oldest_org_id': stats['oldest_org_id'],
+                'newest_org_id': stats['newest_org_id']
+            }
+            
+            # Get oldest and newest org names
+            oldest_name = "None"
+            newest_name = "None"
+            if stats['oldest_org_id']:
+                cursor.execute("SELECT org_name FROM organizations WHERE id = %s", (stats['oldest_org_id'],))
+                result = cursor.fetchone()
+                oldest_name = result['org_name'] if result else "None"
+            if stats['newest_org_id']:
+                cursor.execute("SELECT org_name FROM organizations WHERE id = %s", (stats['newest_org_id'],))
+                result = cursor.fetchone()
+                newest_name = result['org_name'] if result else "None"
+            
+            # Display metrics
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Organizations", stats['total_orgs'])
+            with col2:
+                st.metric("Approved Organizations", stats['approved_orgs'])
+            with col3:
+                st.metric("Active Organizations", stats['active_orgs'])
+            
+            st.markdown("---")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Oldest Organization", oldest_name)
+            with col2:
+                st.metric("Newest Organization", newest_name)
+            
+            # Since we don't have created_at, we'll use ID-based timeline as a proxy
+            st.markdown("#### Organization Registration Timeline (by ID)")
+            df_orgs = profiler.frame(read_columns(conn, "SELECT id, org_name FROM organizations ORDER BY id"))
+            if len(df_orgs):
+                st.line_chart(df_orgs.set_index('id')['org_name'].value_counts().sort_index())
+
+        with tab4:
+            st.markdown("### 📥 Import Partner Organizations")
+            st.caption(f"CSV with a header row. Columns: {', '.join(ORGANIZATION_COLUMNS)}. "
+                       "Each organization gets a temporary password and must choose a new one at first login.")
+
+            upload = st.file_uploader("Organizations CSV", type=["csv"], key="org_import_file")
+            approve_imported = st.checkbox("Approve imported organizations immediately", value=False)
+            if upload and st.button("📥 Import Organizations", type="primary"):
+                try:
+                    rows = read_organizations_csv(upload.getvalue().decode("utf-8-sig"))
+                except (ValueError, UnicodeDecodeError) as e:
+                    st.error(f"Could not read the file: {e}")
+                else:
+                    created, errors = import_organizations(conn, rows, approve=approve_imported)
+                    st.session_state.org_import_result = (created, errors)
+
+            if st.session_state.get("org_import_result"):
+                created, errors = st.session_state.org_import_result
+                st.success(f"Imported {len(created)} organization(s); {len(errors)} row(s) skipped")
+                if errors:
+                    st.dataframe(profiler.frame([{"Line": line, "Email": email, "Error": error}
+                                                 for line, email, error in errors]),
+                                 hide_index=True, use_container_width=True)
+                if created:
+                    credentials = profiler.frame([{"org_name": row["org_name"], "email": row["email"],
+                                                   "temporary_password": row["temporary_password"]}
+                                                  for row in created])
+                    st.download_button("🔑 Download Temporary Credentials", credentials.to_csv(index=False),
+                                       file_name="organization_credentials.csv", mime="text/csv")
+
+        with tab5:
+            st.markdown("### 🗂️ Batch Review")
+            st.caption(f"CSV with a header row. Columns: {', '.join(REVIEW_COLUMNS)}. "
+                       "Actions: approve, reject, activate, deactivate, delete. "
+                       "Rejection notes are emailed to the organization.")
+
+            review_file = st.file_uploader("Review CSV", type=["csv"], key="org_review_file")
+            if review_file and st.button("🗂️ Apply Review", type="primary"):
+                try:
+                    rows = read_review_csv(review_file.getvalue().decode("utf-8-sig"))
+                except (ValueError, UnicodeDecodeError) as e:
+                    st.error(f"Could not read the file: {e}")
+                else:
+                    st.session_state.org_review_result = apply_review(conn, rows, source=f"csv:{review_file.name}")
+
+            if st.session_state.get("org_review_result"):
+                counts, errors = st.session_state.org_review_result
+                st.success(", ".join(f"{action}: {count}" for action, count in counts.items()) or "No changes applied")
+                if errors:
+                    st.dataframe(profiler.frame([{"Line": line, "Email": email, "Error": error}
+                                                 for line, email, error in errors]),
+                                 hide_index=True, use_container_width=True)
+
+            st.markdown("#### Recent Admin Actions")
+            audit = profiler.frame(recent_audit(conn))
+            if len(audit):
+                st.dataframe(audit, hide_index=True, use_container_width=True)
+            else:
+                st.info("No admin actions recorded yet.")
+
+        st.divider()
+
+
+profiler.section("Organization Management")
+organization_management()
+
+
+# **System Health**
+@st.fragment
+@profiler.fragment("System Health")
+def system_health():
+    with connection() as conn:
+        st.subheader("⚙️ System Health")
+
+        # Process-wide switch; takes effect on every page's next rerun
+        profile_pages = st.toggle("⏱️ Profile dashboard pages", value=profiling_enabled(),
+                                  help="Show a per-section timing breakdown at the bottom of each dashboard")
+        if profile_pages != profiling_enabled():
+            set_profiling(profile_pages)
+            st.rerun(scope="app")
+
+        with st.expander("🔌 Database Connection Pool", expanded=False):
+            pool = pool_stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("In Use", f"{pool['in_use']} / {pool['size']}")
+            with col2:
+                st.metric("Idle", pool['idle'])
+            with col3:
+                st.metric("Waiting", pool['waiters'])
+            with col4:
+                st.metric("Borrow Timeouts", pool['timeouts'])
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Avg Wait", f"{pool['avg_wait_time'] * 1000:.1f} ms")
+            with col2:
+                st.metric("Max Wait", f"{pool['max_wait_time'] * 1000:.1f} ms")
+            with col3:
+                st.metric("Connections Opened", pool['created'])
+            with col4:
+                st.metric("Reclaimed / Discarded", f"{pool['reclaimed']} / {pool['discarded']}")
+
+            st.caption(f"{pool['borrows']:,} borrows served, "
+                       f"{pool['health_check_failures']} failed health checks")
+
+        with st.expander("🗃️ Query Cache", expanded=False):
+            cache_stats = query_cache.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Entries", f"{cache_stats['entries']} / {cache_stats['max_entries']}")
+            with col2:
+                st.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+            with col3:
+                st.metric("Evictions", cache_stats['evictions'])
+            with col4:
+                st.metric("Invalidations", cache_stats['invalidations'])
+
+            if st.button("🧹 Clear Query Cache"):
+                query_cache.clear()
+                st.rerun(scope="fragment")
+
+        with st.expander("📮 Outbox", expanded=False):
+            queue = outbox_stats(conn)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Pending", queue['pending'])
+            with col2:
+                st.metric("Sending", queue['sending'])
+            with col3:
+                st.metric("Sent", queue['sent'])
+            with col4:
+                st.metric("Failed", queue['failed'])
+
+        with st.expander("🔐 Login Protection", expanded=False):
+            limits = login_limiter.snapshot()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Attempts Allowed", limits['allowed'])
+            with col2:
+                st.metric("Attempts Rejected", limits['rejected'])
+            with col3:
+                st.metric("Failed Logins", limits['failures'])
+            with col4:
+                st.metric("Active Lockouts", len(limits['lockouts_active']))
+            st.caption(f"Counters since this process started; limits stored in {limits['backend']}")
+
+            if limits['lockouts_active']:
+                st.dataframe(
+                    profiler.frame([{"Locked": key, "Minutes Left": remaining / 60}
+                                    for key, remaining in sorted(limits['lockouts_active'].items())]),
+                    column_config={"Minutes Left": st.column_config.NumberColumn(format="%.1f")},
+                    hide_index=True,
+                    use_container_width=True
+                )
+                col1, col2 = st.columns([0.7, 0.3])
+                with col1:
+                    locked_key = st.selectbox("Lift lockout", sorted(limits['lockouts_active']),
+                                              label_visibility="collapsed")
+                with col2:
+                    if st.button("🔓 Unlock", use_container_width=True):
+                        login_limiter.unlock(locked_key)
+                        st.rerun(scope="fragment")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Busiest Clients**")
+                for key, count in limits['busiest_clients'][:10]:
+                    st.write(f"{key[len('client:'):]} - {count} attempts")
+            with col2:
+                st.markdown("**Failing Emails**")
+                for key, count in limits['failing_emails'][:10]:
+                    st.write(f"{key[len('email:'):]} - {count} failures")
+
+        with st.expander("🔎 Query Performance", expanded=False):
+            ensure_background_capture()
+            entries, recommendations = build_report()
+            tracked = query_stats.stats()
+            st.caption(f"{tracked['fingerprints']} statement fingerprints tracked in this process"
+                       + (f", {tracked['dropped']} executions not tracked (table full)" if tracked['dropped'] else ""))
+
+            if entries:
+                st.dataframe(
+                    profiler.frame([{
+                        "Query": entry['fingerprint'],
+                        "Calls": entry['count'],
+                        "p50 (ms)": entry['p50'] * 1000,
+                        "p95 (ms)": entry['p95'] * 1000,
+                        "p99 (ms)": entry['p99'] * 1000,
+                        "Avg Rows": entry['avg_rows'],
+                        "Plan": ", ".join(sorted({str(row.get('type')) for row in entry['explain']}))
+                                if entry['explain'] else "",
+                    } for entry in entries[:25]]),
+                    column_config={
+                        "p50 (ms)": st.column_config.NumberColumn(format="%.1f"),
+                        "p95 (ms)": st.column_config.NumberColumn(format="%.1f"),
+                        "p99 (ms)": st.column_config.NumberColumn(format="%.1f"),
+                        "Avg Rows": st.column_config.NumberColumn(format="%.1f"),
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+
+            st.markdown("#### Recommended Indexes")
+            if recommendations:
+                for rec in recommendations:
+                    st.write(f"**{rec['table']}({', '.join(rec['columns'])})** - {rec['reason']}, "
+                             f"~{rec['rows_examined']} rows examined by {len(rec['queries'])} "
+                             f"quer{'y' if len(rec['queries']) == 1 else 'ies'}")
+                    st.code(rec['statement'] + ";", language="sql")
+            else:
+                st.info("No missing indexes found in the captured plans.")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("🧪 Capture EXPLAIN Now", use_container_width=True):
+                    capture_explains()
+                    st.rerun(scope="fragment")
+            with col2:
+                st.download_button("📄 Download Report", format_report(entries, recommendations),
+                                   file_name="query_report.txt", use_container_width=True)
+
+
+profiler.section("System Health")
+system_health()
+
+profiler.finish()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import streamlit as st
+
+# Keyset (seek) pagination. Lists are ordered newest first on a
+# (timestamp, id) pair and a page starts strictly after the last row of the
+# previous one, so every page is a bounded index range scan no matter how
+# deep the history goes. The navigation widgets rerun only the enclosing
+# st.fragment, so they must be rendered inside one.
+PAGE_SIZE = 20
+
+
+# Append the keyset predicate, ordering and limit to a query that already
+# has a WHERE clause. One extra row is fetched to detect a following page.
+def keyset_query(sql, params, time_col, id_col, after=None, page_size=PAGE_SIZE):
+    params = list(params)
+    if after is not None:
+        sql += f" AND ({time_col} < %s OR ({time_col} = %s AND {id_col} < %s))"
+        params += [after[0], after[0], after[1]]
+    sql += f" ORDER BY {time_col} DESC, {id_col} DESC LIMIT %s"
+    params.append(page_size + 1)
+    return sql, params
+
+
+# Trim the probe row of a keyset page; returns (rows, next cursor or None)
+def split_page(rows, page_size, time_key, id_key):
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (rows[-1][time_key], rows[-1][id_key])
+
+
+# Run a keyset page query; returns (rows, cursor for the next page or None)
+def fetch_page(cursor, sql, params, time_col, id_col, after=None,
+               page_size=PAGE_SIZE, time_key=None, id_key=None):
+    time_key = time_key or time_col.split(".")[-1]
+    id_key = id_key or id_col.split(".")[-1]
+
+    sql, params = keyset_query(sql, params, time_col, id_col, after, page_size)
+    cursor.execute(sql, params)
+    return split_page(cursor.fetchall(), page_size, time_key, id_key)
+
+
+# Cursor of the page currently shown for a paginated list. The page stack
+# lives in session state and resets whenever the filters change.
+def current_cursor(state_key, filters=None):
+    state = st.session_state.setdefault(state_key, {"filters": filters, "stack": []})
+    if state["filters"] != filters:
+        state["filters"] = filters
+        state["stack"] = []
+    return state["stack"][-1] if state["stack"] else None
+
+
+# Newer / Older navigation for a list paginated with current_cursor()
+def pager(state_key, next_cursor):
+    state = st.session_state[state_key]
+    col1, col2, col3 = st.columns([0.25, 0.5, 0.25])
+    with col1:
+        if state["stack"] and st.button("← Newer", key=f"{state_key}_newer", use_container_width=True):
+            state["stack"].pop()
+            st.rerun(scope="fragment")
+    with col2:
+        st.caption(f"Page {len(state['stack']) + 1}")
+    with col3:
+        if next_cursor and st.button("Older →", key=f"{state_key}_older", use_container_width=True):
+            state["stack"].append(next_cursor)
+            st.rerun(scope="fragment")
+
+
+# Cursors of the pages loaded so far in a "Show more" feed. The first page
+# always starts from the top (None); every click appends the next cursor.
+def loaded_cursors(state_key):
+    return st.session_state.setdefault(state_key, [None])
+
+
+def show_more(state_key, next_cursor, label):
+    if next_cursor and st.button(label, key=f"{state_key}_more"):
+        st.session_state[state_key].append(next_cursor)
+        st.rerun(scope="fragment")
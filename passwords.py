@@ -0,0 +1,153 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Salted PBKDF2-HMAC-SHA256 password hashes, stored as
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# The iteration count is the cost knob; pick it for this hardware with
+# `python passwords.py --calibrate`. Rows still holding a plaintext password
+# or an outdated cost are rehashed after their next successful login.
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = int(os.environ.get("GIVEBACK_PBKDF2_ITERATIONS", "600000"))
+SALT_BYTES = 16
+
+# Hashing holds a CPU core for the whole derivation (hashlib releases the
+# GIL meanwhile), so it runs on a small dedicated pool. Callers beyond the
+# pool and its queue wait at most VERIFY_TIMEOUT before being turned away.
+VERIFY_WORKERS = int(os.environ.get("GIVEBACK_PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+VERIFY_QUEUE = int(os.environ.get("GIVEBACK_PASSWORD_QUEUE", "32"))
+VERIFY_TIMEOUT = float(os.environ.get("GIVEBACK_PASSWORD_TIMEOUT", "5"))
+
+
+class HasherBusy(Exception):
+    pass
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _derive(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+def make_hash(password, iterations=None):
+    iterations = iterations or ITERATIONS
+    salt = secrets.token_bytes(SALT_BYTES)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(_derive(password, salt, iterations))}"
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(ALGORITHM + "$")
+
+
+# Check a password against a stored value; returns (matches, needs_rehash).
+# Values not in the hash format are legacy plaintext passwords.
+def check(password, stored):
+    if not is_hashed(stored):
+        matches = hmac.compare_digest(password.encode("utf-8"), (stored or "").encode("utf-8"))
+        return matches, matches
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        iterations = int(iterations)
+        salt, expected = _unb64(salt), _unb64(expected)
+    except ValueError:
+        return False, False
+    matches = hmac.compare_digest(_derive(password, salt, iterations), expected)
+    return matches, matches and iterations != ITERATIONS
+
+
+_pool = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="password-hash")
+_slots = threading.BoundedSemaphore(VERIFY_WORKERS + VERIFY_QUEUE)
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=VERIFY_TIMEOUT):
+        raise HasherBusy("Too many logins in progress, please try again in a moment")
+    try:
+        future = _pool.submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+
+def hash_password(password):
+    return _run(make_hash, password)
+
+
+def verify_password(password, stored):
+    return _run(check, password, stored)
+
+
+# Hash many passwords through the pool, `concurrency` at a time, so that
+# logins keep the remaining workers
+def hash_passwords(passwords, concurrency=max(1, VERIFY_WORKERS // 2)):
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        return list(callers.map(hash_password, passwords))
+
+
+# Burn the same work as a real verification when the account does not
+# exist, so response times do not reveal which emails are registered
+_DUMMY_HASH = None
+
+
+def verify_missing(password):
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = make_hash(secrets.token_hex(8))
+    verify_password(password, _DUMMY_HASH)
+    return False
+
+
+# Time derivations on this machine and return the iteration count whose
+# verification takes about target_ms
+def calibrate(target_ms, probe_iterations=100000, rounds=5):
+    salt = secrets.token_bytes(SALT_BYTES)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _derive("calibration-password", salt, probe_iterations)
+        timings.append(time.perf_counter() - start)
+    per_iteration = sorted(timings)[len(timings) // 2] / probe_iterations
+    return max(10000, int(target_ms / 1000 / per_iteration) // 1000 * 1000)
+
+
+# Verifications per second through the pool with `concurrency` callers
+def measure_throughput(iterations, concurrency, total):
+    stored = make_hash("benchmark-password", iterations)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        list(callers.map(lambda _: verify_password("benchmark-password", stored), range(total)))
+    return total / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the password hashing cost")
+    parser.add_argument("--calibrate", action="store_true", help="suggest GIVEBACK_PBKDF2_ITERATIONS")
+    parser.add_argument("--target-ms", type=float, default=250, help="target verify latency")
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous logins to simulate")
+    args = parser.parse_args()
+
+    iterations = calibrate(args.target_ms) if args.calibrate else ITERATIONS
+    start = time.perf_counter()
+    check("benchmark-password", make_hash("benchmark-password", iterations))
+    single_ms = (time.perf_counter() - start) * 1000 / 2
+    rate = measure_throughput(iterations, args.concurrency, args.concurrency * 4)
+
+    print(f"iterations:       {iterations}")
+    print(f"single verify:    {single_ms:.0f} ms")
+    print(f"pool throughput:  {rate:.1f} verifies/s with {VERIFY_WORKERS} workers, {args.concurrency} callers")
+    if args.calibrate:
+        print(f"\nexport GIVEBACK_PBKDF2_ITERATIONS={iterations}")
@@ -0,0 +1,130 @@
+from collections import namedtuple
+
+import streamlit as st
+
+from cache import cached_query, invalidate, query_cache
+from db import connection
+from money import to_minor
+from rate_limit import TRUST_PROXY
+from rollups import REFRESH_INTERVAL
+
+# The logged-in principal. Session state only holds its (kind, id) key;
+# the compact record below is resolved through the shared query cache on
+# every rerun and dropped by invalidate_principal() whenever an admin
+# changes the account, so a deactivated or deleted organization is logged
+# out on its next rerun without a per-rerun database query.
+Principal = namedtuple("Principal", "kind id name email is_approved is_active")
+
+USER = "user"
+ORGANIZATION = "organization"
+PRINCIPAL_TTL = 30
+
+_SESSION_KEY = "principal"
+
+
+def _tag(kind, principal_id):
+    return f"principal:{kind}:{principal_id}"
+
+
+def _load(kind, principal_id):
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        if kind == USER:
+            cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (principal_id,))
+            row = cursor.fetchone()
+            return row and Principal(USER, row["id"], row["name"], row["email"], True, True)
+        cursor.execute("""
+            SELECT id, org_name, email, is_approved, is_active
+            FROM organizations WHERE id = %s
+        """, (principal_id,))
+        row = cursor.fetchone()
+        return row and Principal(ORGANIZATION, row["id"], row["org_name"], row["email"],
+                                 bool(row["is_approved"]), bool(row["is_active"]))
+
+
+def get_principal(kind, principal_id):
+    return query_cache.get_or_load(
+        ("principal", kind, principal_id), lambda: _load(kind, principal_id),
+        ttl=PRINCIPAL_TTL, tags=(_tag(kind, principal_id),)
+    )
+
+
+# Call after any change to a user or organization account
+def invalidate_principal(kind, principal_id):
+    invalidate(_tag(kind, principal_id))
+
+
+# Address of the browser, used to rate limit logins and sign-up checks
+# per client
+def client_address():
+    if TRUST_PROXY:
+        forwarded = st.context.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return getattr(st.context, "ip_address", None) or "unknown"
+
+
+def login(kind, principal_id):
+    st.session_state[_SESSION_KEY] = (kind, principal_id)
+
+
+def logout():
+    st.session_state.clear()
+
+
+# The session's principal, or None. Organizations that are no longer
+# approved and active, and accounts that were deleted, are logged out.
+def current_principal():
+    key = st.session_state.get(_SESSION_KEY)
+    if key is None:
+        return None
+    principal = get_principal(*key)
+    if principal is None or not (principal.is_approved and principal.is_active):
+        logout()
+        st.session_state.logged_out_reason = (
+            "Your account no longer exists." if principal is None
+            else "Your organization account has been deactivated."
+        )
+        return None
+    return principal
+
+
+# Page guard: the current principal of the given kind, or stop the page
+def require_principal(kind, message):
+    principal = current_principal()
+    if principal is None or principal.kind != kind:
+        reason = st.session_state.pop("logged_out_reason", None)
+        if reason:
+            st.warning(reason)
+        st.error(message)
+        st.stop()
+    return principal
+
+
+# Donation totals by type for a principal, from the monthly rollup:
+# {type: {donation_count, described_count, counts, amounts}} where counts
+# and amounts are per currency, amounts in minor units. The rows are shared
+# across sessions and kept for one rollup refresh interval. Pass the
+# caller's connection, if it holds one, as conn.
+def donation_totals(principal, conn=None):
+    column = "user_id" if principal.kind == USER else "organization_id"
+    rows = cached_query(f"""
+        SELECT donation_type, currency,
+               SUM(donation_count) as donation_count,
+               SUM(described_count) as described_count,
+               SUM(amount_total) as amount_total
+        FROM donation_monthly_rollup
+        WHERE {column} = %s
+        GROUP BY donation_type, currency
+    """, (principal.id,), ttl=REFRESH_INTERVAL, tags=(_tag(principal.kind, principal.id),), conn=conn)
+
+    totals = {}
+    for row in rows:
+        entry = totals.setdefault(row["donation_type"], {
+            "donation_count": 0, "described_count": 0, "counts": {}, "amounts": {}
+        })
+        entry["donation_count"] += int(row["donation_count"])
+        entry["described_count"] += int(row["described_count"])
+        entry["counts"][row["currency"]] = int(row["donation_count"])
+        entry["amounts"][row["currency"]] = to_minor(row["amount_total"])
+    return totals
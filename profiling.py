@@ -0,0 +1,185 @@
+import functools
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from query_stats import set_thread_listener
+
+# Opt-in per-rerun profiling for the dashboard pages. A page starts a
+# profiler, marks where each of its sections begins and finishes at the
+# bottom; every section gets its wall time, DB round trips and rows (via
+# query_stats) and the time spent building DataFrames. Fragments that
+# rerun on their own are profiled too (PageProfiler.fragment). Enabled with
+# GIVEBACK_PROFILE=1 or from the Admin Dashboard.
+ENABLED = os.environ.get("GIVEBACK_PROFILE", "0") == "1"
+# JSON lines file every finished profile is appended to (unset: none)
+LOG_PATH = os.environ.get("GIVEBACK_PROFILE_LOG")
+# Profiles kept per session for the download button
+SESSION_HISTORY = 50
+
+_enabled = ENABLED
+_log_lock = threading.Lock()
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+class PageProfiler:
+    def __init__(self, page):
+        self.page = page
+        self._start()
+        self.section("Setup")
+
+    def _start(self):
+        self.started = time.perf_counter()
+        self.sections = []
+        self._current = None
+        self.finished = False
+        set_thread_listener(self)
+
+    # Decorator for the page's fragments, applied under @st.fragment. On a
+    # full run it only calls the fragment; a fragment rerunning on its own
+    # comes after finish(), so it gets a profile of its own, recorded like
+    # a page run and summarised in a caption inside the fragment.
+    def fragment(self, name):
+        def decorate(fn):
+            @functools.wraps(fn)
+            def run(*args, **kwargs):
+                if not self.finished:
+                    return fn(*args, **kwargs)
+                self._start()
+                self.section(name)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    record = self._record(fragment=name)
+                    section = record["sections"][0]
+                    st.caption(f"⏱️ Fragment rerun: {record['total_time'] * 1000:,.0f} ms, "
+                               f"{section['queries']} queries, {section['rows']:,} rows")
+            return run
+        return decorate
+
+    # Close the running section and start timing the next one
+    def section(self, name):
+        now = time.perf_counter()
+        self._close(now)
+        self._current = {
+            "section": name,
+            "started": now,
+            "queries": 0,
+            "query_time": 0.0,
+            "rows": 0,
+            "dataframes": 0,
+            "dataframe_time": 0.0,
+        }
+
+    def _close(self, now):
+        if self._current is not None:
+            self._current["time"] = now - self._current.pop("started")
+            self.sections.append(self._current)
+            self._current = None
+
+    def on_query(self, elapsed):
+        if self._current is not None:
+            self._current["queries"] += 1
+            self._current["query_time"] += elapsed
+
+    def on_rows(self, rows):
+        if self._current is not None:
+            self._current["rows"] += rows
+
+    # pd.DataFrame, timed against the running section
+    def frame(self, *args, **kwargs):
+        started = time.perf_counter()
+        df = pd.DataFrame(*args, **kwargs)
+        if self._current is not None:
+            self._current["dataframes"] += 1
+            self._current["dataframe_time"] += time.perf_counter() - started
+        return df
+
+    # Close the last section and keep the profile in the session history
+    # and the log; fragment is the fragment name for fragment-only reruns
+    def _record(self, fragment=None):
+        now = time.perf_counter()
+        self._close(now)
+        set_thread_listener(None)
+        self.finished = True
+
+        record = {
+            "page": self.page,
+            "fragment": fragment,
+            "timestamp": time.time(),
+            "total_time": now - self.started,
+            "sections": self.sections,
+        }
+        history = st.session_state.setdefault("profiles", [])
+        history.append(record)
+        del history[:-SESSION_HISTORY]
+        if LOG_PATH:
+            with _log_lock, open(LOG_PATH, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def finish(self):
+        record = self._record()
+        render(record, st.session_state["profiles"])
+        return record
+
+
+# Stand-in used while profiling is off
+class NullProfiler:
+    def section(self, name):
+        pass
+
+    def frame(self, *args, **kwargs):
+        return pd.DataFrame(*args, **kwargs)
+
+    def fragment(self, name):
+        return lambda fn: fn
+
+    def finish(self):
+        return None
+
+
+def start_page(page):
+    if _enabled:
+        return PageProfiler(page)
+    set_thread_listener(None)
+    return NullProfiler()
+
+
+def render(record, history):
+    with st.expander(f"⏱️ Page profile: {record['total_time'] * 1000:,.0f} ms", expanded=False):
+        st.dataframe(
+            pd.DataFrame([{
+                "Section": section["section"],
+                "Time (ms)": section["time"] * 1000,
+                "Queries": section["queries"],
+                "Query Time (ms)": section["query_time"] * 1000,
+                "Rows": section["rows"],
+                "DataFrames": section["dataframes"],
+                "DataFrame Time (ms)": section["dataframe_time"] * 1000,
+            } for section in record["sections"]]),
+            column_config={
+                column: st.column_config.NumberColumn(format="%.1f")
+                for column in ("Time (ms)", "Query Time (ms)", "DataFrame Time (ms)")
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.download_button(
+            "📄 Download Session Profiles (JSON lines)",
+            "".join(json.dumps(item) + "\n" for item in history),
+            file_name="profiles.jsonl",
+            key=f"download_profiles_{record['page']}"
+        )
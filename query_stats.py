@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+# Per-statement query metrics. Every cursor handed out by the connection
+# pool is wrapped in an InstrumentedCursor, which times each statement and
+# files it under its fingerprint (the SQL with literals and placeholders
+# replaced by "?"). index_advisor.py adds EXPLAIN plans and index advice.
+ENABLED = os.environ.get("GIVEBACK_QUERY_STATS", "1") != "0"
+# Latencies kept per fingerprint for the percentiles
+SAMPLE_SIZE = 1000
+MAX_FINGERPRINTS = 500
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDERS = re.compile(r"%s|%\(\w+\)s")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+# Normalized statement text; statements differing only in their values
+# share a fingerprint
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    normalized = _COMMENTS.sub(" ", sql)
+    normalized = _STRINGS.sub("?", normalized)
+    normalized = _PLACEHOLDERS.sub("?", normalized)
+    normalized = _NUMBERS.sub("?", normalized)
+    normalized = _LISTS.sub("(?+)", normalized)
+    return _SPACE.sub(" ", normalized).strip().lower()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class QueryStats:
+    def __init__(self, sample_size=SAMPLE_SIZE, max_fingerprints=MAX_FINGERPRINTS):
+        self.sample_size = sample_size
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dropped = 0
+
+    # Returns the fingerprint's entry, or None once the table is full
+    def record(self, sql, params, elapsed):
+        fp = fingerprint(sql)
+        if fp.startswith("explain"):
+            return None
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    self._dropped += 1
+                    return None
+                entry = self._entries[fp] = {
+                    "fingerprint": fp,
+                    "count": 0,
+                    "rows": 0,
+                    "total_time": 0.0,
+                    "latencies": deque(maxlen=self.sample_size),
+                    "explain": None,
+                    "explained_at": None,
+                }
+            entry["count"] += 1
+            entry["total_time"] += elapsed
+            entry["latencies"].append(elapsed)
+            # The slowest execution is the one worth explaining. Only SELECTs
+            # are explained, so no other statement keeps its bound values
+            # (password hashes, emails) in memory.
+            if fp.startswith("select") and elapsed >= entry.get("sample_time", 0.0):
+                entry["sample_sql"], entry["sample_params"], entry["sample_time"] = sql, params, elapsed
+        return entry
+
+    def add_rows(self, entry, rows):
+        if entry is not None:
+            with self._lock:
+                entry["rows"] += rows
+
+    def set_explain(self, fp, plan):
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is not None:
+                entry["explain"] = plan
+                entry["explained_at"] = time.time()
+
+    # Plain-dict copy of every fingerprint with latency percentiles, slowest
+    # p95 first
+    def snapshot(self):
+        with self._lock:
+            entries = [dict(entry, latencies=sorted(entry["latencies"])) for entry in self._entries.values()]
+        for entry in entries:
+            latencies = entry.pop("latencies")
+            entry["p50"] = percentile(latencies, 0.50)
+            entry["p95"] = percentile(latencies, 0.95)
+            entry["p99"] = percentile(latencies, 0.99)
+            entry["avg_rows"] = entry["rows"] / entry["count"]
+        return sorted(entries, key=lambda entry: entry["p95"], reverse=True)
+
+    def slowest(self, limit):
+        return self.snapshot()[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {"fingerprints": len(self._entries), "dropped": self._dropped}
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._dropped = 0
+
+
+query_stats = QueryStats()
+
+_local = threading.local()
+
+
+# Observer for the statements run on the current thread (a page profiler);
+# it gets on_query(elapsed) and on_rows(count) calls. None to stop.
+def set_thread_listener(listener):
+    _local.listener = listener
+
+
+# Cursor proxy that reports to a QueryStats. Rows are counted as they are
+# fetched, so they are attributed to the statement that produced them.
+class InstrumentedCursor:
+    def __init__(self, cursor, stats=query_stats):
+        self._cursor = cursor
+        self._stats = stats
+        self._entry = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._add_rows(1)
+            yield row
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._record(operation, params, time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._record(operation, None, time.perf_counter() - started)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._add_rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._add_rows(len(rows))
+        return rows
+
+    def _record(self, operation, params, elapsed):
+        self._entry = self._stats.record(operation, params, elapsed)
+        listener = getattr(_local, "listener", None)
+        if listener is not None:
+            listener.on_query(elapsed)
+
+    def _add_rows(self, rows):
+        self._stats.add_rows(self._entry, rows)
+        listener = getattr(_local, "listener", None)
+        if listener is not None:
+            listener.on_rows(rows)
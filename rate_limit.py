@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# Sliding-window limits for login attempts, checked before any database
+# work. Every client address may try CLIENT_LIMIT logins per CLIENT_WINDOW;
+# an email that fails EMAIL_FAILURE_LIMIT times within EMAIL_WINDOW is
+# locked for LOCKOUT_SECONDS. Counters live in process memory, or in Redis
+# when GIVEBACK_RATE_LIMIT_REDIS_URL is set so that every server process
+# shares them.
+CLIENT_LIMIT = int(os.environ.get("GIVEBACK_LOGIN_CLIENT_LIMIT", "20"))
+CLIENT_WINDOW = float(os.environ.get("GIVEBACK_LOGIN_CLIENT_WINDOW", "60"))
+EMAIL_FAILURE_LIMIT = int(os.environ.get("GIVEBACK_LOGIN_FAILURE_LIMIT", "5"))
+EMAIL_WINDOW = float(os.environ.get("GIVEBACK_LOGIN_FAILURE_WINDOW", "900"))
+LOCKOUT_SECONDS = float(os.environ.get("GIVEBACK_LOGIN_LOCKOUT", "900"))
+# Live email availability checks on the sign-up page allowed per client,
+# so the check cannot be used to enumerate registered emails
+EMAIL_CHECK_LIMIT = int(os.environ.get("GIVEBACK_EMAIL_CHECK_LIMIT", "10"))
+EMAIL_CHECK_WINDOW = float(os.environ.get("GIVEBACK_EMAIL_CHECK_WINDOW", "300"))
+REDIS_URL = os.environ.get("GIVEBACK_RATE_LIMIT_REDIS_URL")
+# Only trust X-Forwarded-For when the app sits behind a proxy that sets it
+TRUST_PROXY = os.environ.get("GIVEBACK_TRUST_PROXY", "0") == "1"
+# Keys tracked by the in-memory backend; least recently used are dropped
+MAX_KEYS = 100000
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_keys=MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._hits = OrderedDict()  # key -> deque of timestamps
+        self._locks = {}  # key -> locked until
+
+    # Record a hit and return the number of hits within the window
+    def hit(self, key, window, now):
+        with self._lock:
+            hits = self._hits.pop(key, None) or deque()
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            hits.append(now)
+            self._hits[key] = hits
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+            return len(hits)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def lock(self, key, until):
+        with self._lock:
+            self._locks[key] = until
+
+    def unlock(self, key):
+        with self._lock:
+            self._locks.pop(key, None)
+
+    def locked_until(self, key, now):
+        with self._lock:
+            until = self._locks.get(key)
+            if until is not None and until <= now:
+                del self._locks[key]
+                until = None
+            return until
+
+    def lockouts(self, now):
+        with self._lock:
+            for key in [key for key, until in self._locks.items() if until <= now]:
+                del self._locks[key]
+            return dict(self._locks)
+
+    # Keys with the most hits within their window, most active first
+    def busiest(self, window, now, limit):
+        with self._lock:
+            counts = {key: sum(1 for t in hits if t > now - window) for key, hits in self._hits.items()}
+        counts = {key: count for key, count in counts.items() if count}
+        return sorted(counts.items(), key=lambda item: -item[1])[:limit]
+
+
+# Sorted set of hit timestamps per key, plus one expiring string per lock
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url, prefix="giveback:login:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def hit(self, key, window, now):
+        name = self.prefix + "hits:" + key
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(name, 0, now - window)
+        pipe.zadd(name, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+        pipe.zcard(name)
+        pipe.expire(name, int(window) + 1)
+        return pipe.execute()[2]
+
+    def reset(self, key):
+        self._redis.delete(self.prefix + "hits:" + key)
+
+    def lock(self, key, until):
+        self._redis.set(self.prefix + "lock:" + key, until, ex=max(1, int(until - time.time()) + 1))
+
+    def unlock(self, key):
+        self._redis.delete(self.prefix + "lock:" + key)
+
+    def locked_until(self, key, now):
+        until = self._redis.get(self.prefix + "lock:" + key)
+        return float(until) if until is not None and float(until) > now else None
+
+    def lockouts(self, now):
+        found = {}
+        for name in self._redis.scan_iter(match=self.prefix + "lock:*", count=500):
+            until = self._redis.get(name)
+            if until is not None and float(until) > now:
+                found[name[len(self.prefix + "lock:"):]] = float(until)
+        return found
+
+    def busiest(self, window, now, limit):
+        counts = {}
+        for name in self._redis.scan_iter(match=self.prefix + "hits:*", count=500):
+            count = self._redis.zcount(name, now - window, "+inf")
+            if count:
+                counts[name[len(self.prefix + "hits:"):]] = count
+        return sorted(counts.items(), key=lambda item: -item[1])[:limit]
+
+
+def email_key(email):
+    return "email:" + (email or "").strip().lower()
+
+
+def client_key(client):
+    return "client:" + (client or "unknown")
+
+
+class LoginLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "rejected": 0, "failures": 0, "lockouts": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # Seconds the caller must wait before trying again, or 0 if the attempt
+    # may go ahead. Only needs the limiter's backend, never the database.
+    def check(self, email, client):
+        now = time.time()
+        for key in (email_key(email), client_key(client)):
+            until = self.backend.locked_until(key, now)
+            if until:
+                self._count("rejected")
+                return until - now
+
+        if self.backend.hit(client_key(client), CLIENT_WINDOW, now) > CLIENT_LIMIT:
+            self.backend.lock(client_key(client), now + CLIENT_WINDOW)
+            self._count("rejected")
+            return CLIENT_WINDOW
+
+        self._count("allowed")
+        return 0
+
+    def failure(self, email):
+        now = time.time()
+        self._count("failures")
+        key = email_key(email)
+        if self.backend.hit(key, EMAIL_WINDOW, now) >= EMAIL_FAILURE_LIMIT:
+            self.backend.lock(key, now + LOCKOUT_SECONDS)
+            self.backend.reset(key)
+            self._count("lockouts")
+
+    def success(self, email):
+        self.backend.reset(email_key(email))
+
+    def unlock(self, key):
+        self.backend.unlock(key)
+        self.backend.reset(key)
+
+    def snapshot(self, limit=20):
+        now = time.time()
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = self.backend.name
+        stats["lockouts_active"] = {key: until - now for key, until in self.backend.lockouts(now).items()}
+        stats["busiest_clients"] = [
+            (key, count) for key, count in self.backend.busiest(CLIENT_WINDOW, now, limit * 2)
+            if key.startswith("client:")
+        ][:limit]
+        stats["failing_emails"] = [
+            (key, count) for key, count in self.backend.busiest(EMAIL_WINDOW, now, limit * 2)
+            if key.startswith("email:")
+        ][:limit]
+        return stats
+
+
+# A plain sliding-window limit per client, on the same backend as logins
+class ClientThrottle:
+    def __init__(self, backend, name, limit, window):
+        self.backend = backend
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def allow(self, client):
+        return self.backend.hit(f"{self.name}:{client or 'unknown'}", self.window, time.time()) <= self.limit
+
+
+_backend = RedisBackend(REDIS_URL) if REDIS_URL else MemoryBackend()
+login_limiter = LoginLimiter(_backend)
+email_check_throttle = ClientThrottle(_backend, "email-check", EMAIL_CHECK_LIMIT, EMAIL_CHECK_WINDOW)
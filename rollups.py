@@ -0,0 +1,199 @@
+import argparse
+import datetime
+import threading
+import time
+
+from db import connection
+
+# Pre-aggregated donation totals per (user, organization, day|month, type,
+# currency).
+# A watermark on donations.id records how far the rollups have been applied,
+# so each refresh only reads the donations inserted since the last one.
+# Dashboards read these tables instead of aggregating full histories.
+#
+# The watermark alone misses donations that commit after a higher id has
+# been applied (a slow scheduler batch) and never subtracts deleted ones,
+# so reconcile() periodically recomputes the trailing days (and the months
+# they fall in) from scratch. Older corrections need a --rebuild.
+
+WATERMARK = "donation_rollups"
+BATCH_SIZE = 5000
+REFRESH_INTERVAL = 15
+# Donations younger than this are left for the next refresh, so that rows
+# from transactions still in flight cannot slip behind the watermark. A
+# batch stops at the first unsettled id: everything up to the watermark is
+# applied, so nothing after an unsettled row may be applied before it.
+SETTLE_SECONDS = 10
+RECONCILE_DAYS = 3
+RECONCILE_INTERVAL = 3600
+
+ROLLUP_TABLES = (
+    ("donation_daily_rollup", "day", "DATE(date)"),
+    ("donation_monthly_rollup", "month", "DATE(date) - INTERVAL (DAY(date) - 1) DAY"),
+)
+
+
+# Apply all settled donations past the watermark; returns rows applied
+def refresh(conn, batch_size=BATCH_SIZE):
+    cursor = conn.cursor()
+    cursor.execute("INSERT IGNORE INTO rollup_watermarks (name, last_id) VALUES (%s, 0)", (WATERMARK,))
+    conn.commit()
+
+    applied = 0
+    while True:
+        conn.start_transaction()
+        # Row lock serializes concurrent refreshers; a second one simply
+        # waits and then finds nothing left to do
+        cursor.execute("SELECT last_id FROM rollup_watermarks WHERE name = %s FOR UPDATE", (WATERMARK,))
+        last_id = cursor.fetchone()[0]
+
+        cursor.execute("""
+            SELECT MIN(id) FROM donations
+            WHERE id > %s AND date > NOW() - INTERVAL %s SECOND
+        """, (last_id, SETTLE_SECONDS))
+        unsettled_id = cursor.fetchone()[0]
+        if unsettled_id is None:
+            bound, params = "", (last_id, batch_size)
+        else:
+            bound, params = "AND id < %s", (last_id, unsettled_id, batch_size)
+
+        cursor.execute(f"""
+            SELECT MAX(id), COUNT(*) FROM (
+                SELECT id FROM donations
+                WHERE id > %s {bound}
+                ORDER BY id
+                LIMIT %s
+            ) batch
+        """, params)
+        upper_id, count = cursor.fetchone()
+        if not upper_id:
+            conn.commit()
+            break
+
+        for table, bucket_col, bucket_expr in ROLLUP_TABLES:
+            cursor.execute(f"""
+                INSERT INTO {table}
+                    (user_id, organization_id, {bucket_col}, donation_type, currency,
+                     donation_count, described_count, amount_total)
+                SELECT COALESCE(user_id, 0), COALESCE(organization_id, 0), {bucket_expr},
+                       donation_type, currency, COUNT(*), COUNT(item_description), COALESCE(SUM(amount), 0)
+                FROM donations
+                WHERE id > %s AND id <= %s
+                GROUP BY 1, 2, 3, 4, 5
+                ON DUPLICATE KEY UPDATE
+                    donation_count = donation_count + VALUES(donation_count),
+                    described_count = described_count + VALUES(described_count),
+                    amount_total = amount_total + VALUES(amount_total)
+            """, (last_id, upper_id))
+
+        cursor.execute("UPDATE rollup_watermarks SET last_id = %s WHERE name = %s", (upper_id, WATERMARK))
+        conn.commit()
+        applied += count
+
+    return applied
+
+
+# Recompute the rollups of the last `days` days, and of the whole months
+# they fall in, from the donations up to the watermark. Donations past it
+# are still left to refresh(). Returns the donations re-aggregated.
+def reconcile(conn, days=RECONCILE_DAYS, today=None):
+    start = (today or datetime.date.today()) - datetime.timedelta(days=days - 1)
+    starts = {"day": start, "month": start.replace(day=1)}
+    cursor = conn.cursor()
+
+    conn.start_transaction()
+    try:
+        # Holding the watermark keeps refresh() from applying rows meanwhile
+        cursor.execute("SELECT last_id FROM rollup_watermarks WHERE name = %s FOR UPDATE", (WATERMARK,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.commit()
+            return 0
+        last_id = row[0]
+
+        for table, bucket_col, bucket_expr in ROLLUP_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE {bucket_col} >= %s", (starts[bucket_col],))
+            # Served by idx_donations_date
+            cursor.execute(f"""
+                INSERT INTO {table}
+                    (user_id, organization_id, {bucket_col}, donation_type, currency,
+                     donation_count, described_count, amount_total)
+                SELECT COALESCE(user_id, 0), COALESCE(organization_id, 0), {bucket_expr},
+                       donation_type, currency, COUNT(*), COUNT(item_description), COALESCE(SUM(amount), 0)
+                FROM donations
+                WHERE date >= %s AND id <= %s
+                GROUP BY 1, 2, 3, 4, 5
+            """, (starts[bucket_col], last_id))
+
+        cursor.execute("SELECT COUNT(*) FROM donations WHERE date >= %s AND id <= %s", (starts["month"], last_id))
+        count = cursor.fetchone()[0]
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Drop and recompute every rollup from scratch (after a schema change or a
+# manual correction to donations)
+def rebuild(conn):
+    cursor = conn.cursor()
+    for table, _, _ in ROLLUP_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute("DELETE FROM rollup_watermarks WHERE name = %s", (WATERMARK,))
+    conn.commit()
+    return refresh(conn)
+
+
+def run_forever(interval=REFRESH_INTERVAL, reconcile_interval=RECONCILE_INTERVAL):
+    reconciled_at = 0.0
+    while True:
+        try:
+            with connection() as conn:
+                applied = refresh(conn)
+                if time.monotonic() - reconciled_at >= reconcile_interval:
+                    reconcile(conn)
+                    reconciled_at = time.monotonic()
+            if applied:
+                print(f"Applied {applied} donations to rollups")
+        except Exception as e:
+            print(f"Rollup refresh failed: {e}")
+        time.sleep(interval)
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+# Keep the rollups current from inside the Streamlit server when no separate
+# `python rollups.py` worker is deployed. Starts at most one thread per process.
+def ensure_background_refresh(interval=REFRESH_INTERVAL):
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(
+                target=run_forever, args=(interval,), name="rollup-refresh", daemon=True
+            )
+            _refresher.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain donation rollup tables")
+    parser.add_argument("--once", action="store_true", help="apply pending donations and exit")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from scratch")
+    parser.add_argument("--reconcile", type=int, metavar="DAYS",
+                        help="recompute the rollups of the last DAYS days and exit")
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL, help="seconds between refreshes")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        with connection() as conn:
+            print(f"Rebuilt rollups from {rebuild(conn)} donations")
+    elif args.reconcile:
+        with connection() as conn:
+            print(f"Reconciled rollups from {reconcile(conn, args.reconcile)} donations")
+    elif args.once:
+        with connection() as conn:
+            print(f"Applied {refresh(conn)} donations to rollups")
+    else:
+        run_forever(args.interval)
@@ -0,0 +1,130 @@
+import argparse
+import calendar
+import datetime
+import time
+
+from db import connection
+
+# Executes due recurring donations. Each batch claims due schedules with
+# FOR UPDATE SKIP LOCKED, so any number of workers can run side by side
+# without charging the same schedule twice, then inserts the donations and
+# advances the schedules in the same transaction. The unique index on
+# donations (recurring_donation_id, scheduled_for) makes a replayed batch
+# a no-op, so restarts are idempotent as well.
+#     python scheduler.py            # run forever
+#     python scheduler.py --once     # drain everything due and exit
+
+BATCH_SIZE = 500
+POLL_INTERVAL = 60
+FREQUENCIES = ["weekly", "monthly", "yearly"]
+
+
+# Next payment after `current`. Monthly and yearly schedules keep their
+# anchor day where the month has one and fall back to its last day
+# otherwise (Jan 31 -> Feb 28 -> Mar 31, Feb 29 -> Feb 28 next year).
+def next_payment_date(current, frequency, anchor_day=None):
+    if frequency == "weekly":
+        return current + datetime.timedelta(days=7)
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency: {frequency}")
+
+    month_index = current.month - 1 + (1 if frequency == "monthly" else 12)
+    year, month = current.year + month_index // 12, month_index % 12 + 1
+    day = min(anchor_day or current.day, calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
+
+
+# Claim and execute one batch of due schedules; returns the number claimed.
+# A schedule that fell behind is charged once for its oldest due date and
+# then moved to its first payment date after `today`; missed periods are
+# not back-charged.
+def process_batch(conn, batch_size=BATCH_SIZE, today=None):
+    today = today or datetime.date.today()
+    cursor = conn.cursor(dictionary=True)
+
+    conn.start_transaction()
+    try:
+        # Served by idx_recurring_donations_due (is_active, next_payment_date)
+        cursor.execute("""
+            SELECT id, user_id, organization_id, amount, currency, frequency, next_payment_date, anchor_day
+            FROM recurring_donations
+            WHERE is_active = TRUE AND next_payment_date <= %s
+            ORDER BY next_payment_date, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (today, batch_size))
+        due = cursor.fetchall()
+        if not due:
+            conn.commit()
+            return 0
+
+        # Only a replayed (schedule, date) pair is skipped; INSERT IGNORE
+        # would also turn bad rows into warnings and advance their schedules
+        cursor.executemany("""
+            INSERT INTO donations
+            (user_id, organization_id, amount, currency, donation_type, recurring_donation_id, scheduled_for)
+            VALUES (%s, %s, %s, %s, 'money', %s, %s)
+            ON DUPLICATE KEY UPDATE id = id
+        """, [(row["user_id"], row["organization_id"], row["amount"], row["currency"], row["id"],
+               row["next_payment_date"]) for row in due])
+
+        advanced = []
+        for row in due:
+            anchor_day = row["anchor_day"] or row["next_payment_date"].day
+            next_date = next_payment_date(row["next_payment_date"], row["frequency"], anchor_day)
+            while next_date <= today:
+                next_date = next_payment_date(next_date, row["frequency"], anchor_day)
+            advanced.append((next_date, anchor_day, row["id"]))
+        cursor.executemany("""
+            UPDATE recurring_donations
+            SET next_payment_date = %s, anchor_day = %s
+            WHERE id = %s
+        """, advanced)
+
+        conn.commit()
+        return len(due)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Process batches until nothing is due; returns (rows, seconds)
+def run_once(batch_size=BATCH_SIZE):
+    started = time.perf_counter()
+    processed = 0
+    with connection() as conn:
+        while True:
+            claimed = process_batch(conn, batch_size)
+            processed += claimed
+            if claimed < batch_size:
+                break
+    return processed, time.perf_counter() - started
+
+
+def report(processed, elapsed):
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {processed} recurring donations in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+
+def run_forever(batch_size=BATCH_SIZE, interval=POLL_INTERVAL):
+    while True:
+        try:
+            processed, elapsed = run_once(batch_size)
+            if processed:
+                report(processed, elapsed)
+        except Exception as e:
+            print(f"Recurring donation run failed: {e}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Execute due recurring donations")
+    parser.add_argument("--once", action="store_true", help="process everything due and exit")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="schedules claimed per transaction")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    args = parser.parse_args()
+
+    if args.once:
+        report(*run_once(args.batch_size))
+    else:
+        run_forever(args.batch_size, args.interval)
@@ -0,0 +1,210 @@
+import csv
+import io
+import re
+import secrets
+
+from mysql.connector import errorcode
+from mysql.connector.errors import IntegrityError
+
+from cache import QueryCache, invalidate
+from db import connection
+from passwords import hash_password, hash_passwords
+from principal import ORGANIZATION, USER
+from rate_limit import email_check_throttle
+
+# Account creation for users and organizations. Duplicate emails are
+# detected through the unique email indexes (migration 11): a duplicate-key
+# error (ER_DUP_ENTRY) on insert means the email is taken, so nothing has
+# to check for the email first or parse error messages.
+
+MIN_PASSWORD_LENGTH = 8
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+GOV_ID_TYPES = ["Aadhaar Card", "PAN Card", "Passport", "Driver's License",
+                "Voter ID", "Business Registration", "Other"]
+
+REQUIRED_FIELDS = {
+    USER: {"name": "Full Name", "email": "Email", "password": "Password"},
+    ORGANIZATION: {"org_name": "Organization Name", "email": "Email", "password": "Password",
+                   "address": "Organization Address", "phone": "Contact Phone",
+                   "gov_id_number": "Government ID Number"},
+}
+ORGANIZATION_COLUMNS = ["org_name", "email", "description", "address", "phone", "gov_id_type", "gov_id_number"]
+
+EMAIL_CHECK_TTL = 30
+_email_checks = QueryCache(max_entries=2048, default_ttl=EMAIL_CHECK_TTL)
+
+
+class EmailTaken(Exception):
+    pass
+
+
+class TooManyEmailChecks(Exception):
+    pass
+
+
+def _table(kind):
+    return "users" if kind == USER else "organizations"
+
+
+def valid_email(email):
+    return bool(EMAIL_PATTERN.match(email.strip()))
+
+
+def _email_tag(kind, email):
+    return f"signup:{kind}:{email.strip().lower()}"
+
+
+# Error messages for a sign-up form (or an imported row); empty when valid
+def validate(kind, fields, require_password=True):
+    errors = []
+    missing = [label for key, label in REQUIRED_FIELDS[kind].items()
+               if (key != "password" or require_password) and not str(fields.get(key) or "").strip()]
+    if missing:
+        errors.append(f"Please fill in all required fields: {', '.join(missing)}")
+
+    email = (fields.get("email") or "").strip()
+    if email and not valid_email(email):
+        errors.append("Please enter a valid email address")
+    password = fields.get("password") or ""
+    if require_password and password and len(password) < MIN_PASSWORD_LENGTH:
+        errors.append(f"Password must be at least {MIN_PASSWORD_LENGTH} characters")
+    if kind == ORGANIZATION and fields.get("gov_id_type") and fields["gov_id_type"] not in GOV_ID_TYPES:
+        errors.append(f"Government ID type must be one of: {', '.join(GOV_ID_TYPES)}")
+    return errors
+
+
+# Whether an email is still free, for the check shown while the form is
+# being filled in. Each client gets EMAIL_CHECK_LIMIT answers per window,
+# cached or not, and TooManyEmailChecks after that, so the check cannot
+# enumerate registered emails. Recent answers come from a small bounded
+# cache; the unique index remains the authority when the account is created.
+def email_available(kind, email, client):
+    if not email_check_throttle.allow(client):
+        raise TooManyEmailChecks("Email availability will be checked when you sign up")
+    email = email.strip()
+
+    def load():
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT 1 FROM {_table(kind)} WHERE email = %s", (email,))
+            return cursor.fetchone() is None
+
+    return _email_checks.get_or_load((kind, email.lower()), load, tags=(_email_tag(kind, email),))
+
+
+# Returns False when the email is already registered. A failed statement
+# does not end the surrounding transaction.
+def _insert(conn, kind, fields, password_hash):
+    try:
+        _execute_insert(conn.cursor(), kind, fields, password_hash)
+    except IntegrityError as e:
+        if e.errno != errorcode.ER_DUP_ENTRY:
+            raise
+        return False
+    return True
+
+
+def _execute_insert(cursor, kind, fields, password_hash):
+    if kind == USER:
+        cursor.execute("""
+            INSERT INTO users (name, email, password, address, phone)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (fields["name"].strip(), fields["email"].strip(), password_hash,
+              fields.get("address"), fields.get("phone")))
+    else:
+        cursor.execute("""
+            INSERT INTO organizations
+            (org_name, email, password, description, address, phone, gov_id_type, gov_id_number, is_approved,
+             must_change_password)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (fields["org_name"].strip(), fields["email"].strip(), password_hash,
+              fields.get("description"), fields.get("address"), fields.get("phone"),
+              fields.get("gov_id_type"), fields.get("gov_id_number"), bool(fields.get("is_approved")),
+              bool(fields.get("must_change_password"))))
+
+
+# Create an account from validated form fields; raises EmailTaken
+def create_account(kind, fields):
+    # Hash before borrowing a connection; derivation is slow by design
+    password_hash = hash_password(fields["password"])
+    with connection() as conn:
+        created = _insert(conn, kind, fields, password_hash)
+        conn.commit()
+
+    _email_checks.invalidate(_email_tag(kind, fields["email"]))
+    if not created:
+        raise EmailTaken("This email is already registered. Please use a different email.")
+    if kind == ORGANIZATION:
+        invalidate("organizations")
+
+
+# Read an organizations CSV; returns [(line number, fields)]
+def read_organizations_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in ("org_name", "email") if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    return [(reader.line_num, {column: (row.get(column) or "").strip() or None for column in ORGANIZATION_COLUMNS})
+            for row in reader]
+
+
+# Insert many organizations in one transaction. Invalid rows, emails that
+# repeat within the file and emails already registered are skipped and
+# reported; everything else is committed together. Imported organizations
+# get random temporary passwords, hashed at full cost before the
+# transaction starts, and must change them at first login. Returns
+# (created rows with their temporary passwords, [(line, email, error)]).
+def import_organizations(conn, rows, approve=False, chunk_size=1000):
+    errors = []
+    valid = []
+    seen = set()
+    for line, fields in rows:
+        problems = validate(ORGANIZATION, fields, require_password=False)
+        email = (fields.get("email") or "").lower()
+        if not problems and email in seen:
+            problems = ["Email appears more than once in this file"]
+        if problems:
+            errors.append((line, fields.get("email"), "; ".join(problems)))
+            continue
+        seen.add(email)
+        valid.append((line, fields))
+
+    passwords = [secrets.token_urlsafe(12) for _ in valid]
+    hashes = hash_passwords(passwords)
+
+    cursor = conn.cursor()
+    conn.commit()
+    conn.start_transaction()
+    try:
+        taken = set()
+        emails = [fields["email"] for _, fields in valid]
+        for start in range(0, len(emails), chunk_size):
+            chunk = emails[start:start + chunk_size]
+            cursor.execute(f"""
+                SELECT LOWER(email) FROM organizations
+                WHERE email IN ({", ".join(["%s"] * len(chunk))})
+                FOR UPDATE
+            """, chunk)
+            taken.update(row[0] for row in cursor.fetchall())
+
+        created = []
+        for (line, fields), password, password_hash in zip(valid, passwords, hashes):
+            if fields["email"].lower() in taken:
+                errors.append((line, fields["email"], "Email is already registered"))
+                continue
+            fields = dict(fields, gov_id_type=fields.get("gov_id_type") or "Other", is_approved=approve,
+                          must_change_password=True)
+            if _insert(conn, ORGANIZATION, fields, password_hash):
+                created.append(dict(fields, line=line, temporary_password=password))
+            else:
+                errors.append((line, fields["email"], "Email is already registered"))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for row in created:
+        _email_checks.invalidate(_email_tag(ORGANIZATION, row["email"]))
+    if created:
+        invalidate("organizations")
+    return created, sorted(errors)